@@ -0,0 +1,33 @@
+"""Add cds_decision_cache table (and merge the two existing heads)
+
+Revision ID: 20261017_decision_cache
+Revises: 3290f6f5f984, 20260324_add_decisions
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_decision_cache'
+down_revision = ('3290f6f5f984', '20260324_add_decisions')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Persisted rule-engine outputs keyed on canonical input + rule-set version
+    op.create_table(
+        'cds_decision_cache',
+        sa.Column('cache_key', sa.String(length=64), primary_key=True),
+        sa.Column('ruleset_version', sa.String(), nullable=False),
+        sa.Column('engine_output', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index('ix_cds_decision_cache_ruleset_version', 'cds_decision_cache', ['ruleset_version'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cds_decision_cache_ruleset_version', table_name='cds_decision_cache')
+    op.drop_table('cds_decision_cache')
@@ -0,0 +1,36 @@
+"""Add cds_explanation_cache table
+
+Revision ID: 20261017_explanation_cache
+Revises: 20261017_decision_cache
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_explanation_cache'
+down_revision = '20261017_decision_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Persisted AI explanations keyed on decision content + patient-context bucket
+    op.create_table(
+        'cds_explanation_cache',
+        sa.Column('cache_key', sa.String(length=64), primary_key=True),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('explanation', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index('ix_cds_explanation_cache_prompt_version', 'cds_explanation_cache', ['prompt_version'])
+    op.create_index('ix_cds_explanation_cache_created_at', 'cds_explanation_cache', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cds_explanation_cache_created_at', table_name='cds_explanation_cache')
+    op.drop_index('ix_cds_explanation_cache_prompt_version', table_name='cds_explanation_cache')
+    op.drop_table('cds_explanation_cache')
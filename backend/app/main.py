@@ -1,3 +1,6 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,15 +13,44 @@ from .routes import test_result as test_result_routes
 from .routes import prescription as prescription_routes
 from .routes import appointment as appointment_routes
 from .routes import recommendation as recommendation_routes
+from .services.drools_integration import get_drools_service
+from .services.explanation_orchestrator import ai_readiness, start_ai_warm_up
 from database.session import get_db, DATABASE_URL
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the Groq/Qdrant clients and the embedding model in the background so the
+    # first /evaluate never waits on them; explanations degrade until they are warm.
+    ai_enabled = os.getenv("ENABLE_AI_EXPLANATION", "").strip().lower() == "true"
+    if ai_enabled and os.getenv("AI_WARMUP_ON_STARTUP", "true").strip().lower() == "true":
+        start_ai_warm_up()
+
+    # Start the Drools engine (worker JVMs / embedded JVM + KieBase) before serving, so the
+    # first /evaluate does not pay for it. A failure is logged; the engine then starts lazily.
+    drools = get_drools_service()
+    if os.getenv("DROOLS_WARMUP_ON_STARTUP", "true").strip().lower() == "true":
+        try:
+            warmed = await asyncio.to_thread(drools.warm_up)
+            logger.info("Drools engine warm (%s) in %ss", warmed["engine_mode"], warmed["seconds"])
+        except Exception as e:
+            logger.warning("Drools engine warm-up failed, starting on first request: %s", e)
+    try:
+        yield
+    finally:
+        drools.shutdown()
+
+
 # Create FastAPI application
 app = FastAPI(
     title="Clinical Decision Support System API",
     description="AI-Assisted CDS for NCD Management in Rwanda - Hypertension Module",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -58,6 +90,16 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: the API serves as soon as it starts; `ai` shows which AI resources are warm."""
+    ai = ai_readiness()
+    return {
+        "status": "ready",
+        "ai_ready": bool(ai.get("ready")),
+        "ai": ai,
+    }
+
 @app.get("/health/db")
 async def health_db(db: AsyncSession = Depends(get_db)):
     """Diagnostic endpoint to check database connection and verify data persistence"""
@@ -156,6 +156,24 @@ class AIExplanationOut(BaseModel):
     sources: List[str] = []
 
 
+class RuleFiring(BaseModel):
+    """Activation/firing counts and consequence time for one Drools rule."""
+    rule: str
+    package: Optional[str] = None
+    activations: int = 0
+    cancelled: int = 0
+    fired: int = 0
+    time_ms: float = 0.0
+
+
+class RuleTrace(BaseModel):
+    """Which rules fired for this evaluation, as recorded by the engine's agenda listener."""
+    rules_fired: int = 0
+    fire_all_rules_ms: Optional[float] = None
+    cached: bool = False  # trace recorded when the cached decision was first computed
+    rules: List[RuleFiring] = []
+
+
 class CDSResponse(BaseModel):
     success: bool
     message: str
@@ -163,6 +181,10 @@ class CDSResponse(BaseModel):
     patient_data: PatientData
     execution_time_ms: Optional[float] = None
     explanations: Optional[List[Optional[AIExplanationOut]]] = None  # one per decision when AI enabled
+    rule_trace: Optional[RuleTrace] = None
+    # Rule-set version label (CDS_RULES_DIR subdirectory, or "bundled") and DRL content hash
+    ruleset_version: Optional[str] = None
+    ruleset_hash: Optional[str] = None
 
 
 class ExplainRequest(BaseModel):
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
 import os
 import time
 import logging
@@ -14,15 +17,23 @@ from ..models.patient_models import (
     ExplainRequest,
     ExplainResponse,
 )
-from ..services.drools_integration import DroolsIntegrationService
+from ..services.drools_integration import get_drools_service, recommendation_source
 from ..services.eml_formulary_filter import filter_decisions_for_facility
+from ..services.explanation_orchestrator import (
+    explain_decisions,
+    generate_explanation_cached,
+    get_explanation_cache,
+    scheduler_stats,
+    single_flight_stats,
+    stream_explanation_cached,
+)
 from database.session import get_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/cds", tags=["Clinical Decision Support"])
 
 # Initialize the Drools service
-drools_service = DroolsIntegrationService()
+drools_service = get_drools_service()
 
 
 def _decision_to_dict(d: ClinicalDecision) -> dict:
@@ -50,45 +61,22 @@ def _patient_context_from_patient_data(patient_data: PatientData) -> dict:
     }
 
 
-def _fetch_explanations_for_decisions(
+async def _fetch_explanations_for_decisions(
     clinical_decisions: List[ClinicalDecision],
     patient_data: PatientData,
 ) -> List[Optional[AIExplanationOut]]:
     """
     Call AI explanation for each decision when ENABLE_AI_EXPLANATION is true.
-    Non-blocking: failures are logged and that decision gets None explanation.
+    Decisions are explained concurrently; failures are logged and that decision gets None.
     """
     if os.getenv("ENABLE_AI_EXPLANATION", "").strip().lower() != "true":
         return []
-    try:
-        import sys
-        # Ensure backend root is on path so llm_service can be imported
-        backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        if backend_dir not in sys.path:
-            sys.path.insert(0, backend_dir)
-        import llm_service
-    except Exception as e:
-        logger.warning("AI explanation skipped: could not import llm_service: %s", e)
-        return []
 
-    patient_ctx = _patient_context_from_patient_data(patient_data)
-    out: List[Optional[AIExplanationOut]] = []
-    for d in clinical_decisions or []:
-        try:
-            raw = llm_service.generate_explanation(_decision_to_dict(d), patient_ctx)
-            out.append(
-                AIExplanationOut(
-                    clinician_summary=raw.get("clinician_summary") or "",
-                    clinician_explanation=raw.get("clinician_explanation") or "",
-                    patient_summary=raw.get("patient_summary") or "",
-                    patient_explanation=raw.get("patient_explanation") or "",
-                    sources=raw.get("sources") or [],
-                )
-            )
-        except Exception as e:
-            logger.warning("AI explanation failed for one decision: %s", e)
-            out.append(None)
-    return out
+    payloads = await explain_decisions(
+        [_decision_to_dict(d) for d in clinical_decisions or []],
+        _patient_context_from_patient_data(patient_data),
+    )
+    return [AIExplanationOut(**payload) if payload else None for payload in payloads]
 
 @router.get("/health", response_model=HealthCheck)
 async def health_check():
@@ -99,6 +87,43 @@ async def health_check():
     )
 
 
+@router.get("/engine/stats")
+async def engine_stats():
+    """Rule-engine pool saturation, queue depth and per-worker latency."""
+    return drools_service.engine_stats()
+
+
+@router.post("/engine/reload")
+async def reload_rules():
+    """Swap in the current CDS_RULES_DIR rule-set version now instead of at the next poll."""
+    return await asyncio.to_thread(drools_service.reload_rules)
+
+
+@router.get("/explanations/cache/stats")
+async def explanation_cache_stats():
+    """Explanation cache hit rate, size, prompt version/model and in-flight coalescing counts."""
+    cache = get_explanation_cache()
+    stats = cache.stats() if cache is not None else {"enabled": False}
+    stats["single_flight"] = single_flight_stats()
+    return stats
+
+
+@router.get("/explanations/scheduler/stats")
+async def explanation_scheduler_stats():
+    """Groq call scheduler: queue depth, rate-limit budget, retries and waits."""
+    return scheduler_stats()
+
+
+@router.delete("/explanations/cache")
+async def invalidate_explanation_cache(everything: bool = False):
+    """Drop cached explanations from other prompt versions (or all of them with ?everything=true)."""
+    cache = get_explanation_cache()
+    if cache is None:
+        return {"enabled": False}
+    await cache.invalidate(everything=everything)
+    return cache.stats()
+
+
 @router.post("/explain", response_model=ExplainResponse)
 async def explain_decision(body: ExplainRequest):
     """
@@ -108,12 +133,7 @@ async def explain_decision(body: ExplainRequest):
     if os.getenv("ENABLE_AI_EXPLANATION", "").strip().lower() != "true":
         return ExplainResponse(ai_enabled=False)
     try:
-        backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        import sys
-        if backend_dir not in sys.path:
-            sys.path.insert(0, backend_dir)
-        import llm_service
-        raw = llm_service.generate_explanation(body.decision, body.patient)
+        raw = await generate_explanation_cached(body.decision, body.patient)
         return ExplainResponse(
             clinician_explanation=raw.get("clinician_explanation") or "",
             clinician_summary=raw.get("clinician_summary") or "",
@@ -129,6 +149,42 @@ async def explain_decision(body: ExplainRequest):
         raise HTTPException(status_code=503, detail=f"AI explanation unavailable: {e}")
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/explain/stream")
+async def explain_decision_stream(body: ExplainRequest):
+    """
+    Streaming /explain as server-sent events, so text appears while Groq generates it.
+
+    Events: `sources`, `delta` (incremental text tagged with its section: clinician,
+    patient, clinician_summary, patient_summary), `section` (a section's full text),
+    then `result` with the same payload as /explain — or `error`. The finished result
+    is cached like /explain, even if the client disconnects early.
+    """
+    if os.getenv("ENABLE_AI_EXPLANATION", "").strip().lower() != "true":
+        async def disabled():
+            yield _sse("result", ExplainResponse(ai_enabled=False).dict())
+        return StreamingResponse(disabled(), media_type="text/event-stream")
+
+    async def events():
+        try:
+            async for event, data in stream_explanation_cached(body.decision, body.patient):
+                if event == "result":
+                    data = ExplainResponse(**data).dict()
+                yield _sse(event, data)
+        except Exception as e:
+            logger.warning("Explain stream failed: %s", e)
+            yield _sse("error", {"detail": f"AI explanation unavailable: {e}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/evaluate", response_model=CDSResponse)
 async def evaluate_patient(request: CDSRequest, db: AsyncSession = Depends(get_db)):
     """
@@ -137,7 +193,7 @@ async def evaluate_patient(request: CDSRequest, db: AsyncSession = Depends(get_d
     Saves recommendations to database. AI explanation is additive (non-blocking).
     """
     try:
-        response = drools_service.evaluate_patient(request.patient_data)
+        response = await drools_service.evaluate_patient_async(request.patient_data)
         response.clinical_decisions, formulary_summary = filter_decisions_for_facility(
             response.clinical_decisions or [], request.patient_data
         )
@@ -145,7 +201,7 @@ async def evaluate_patient(request: CDSRequest, db: AsyncSession = Depends(get_d
         # AI explanation is additive — failure never blocks clinical decision
         explanations: List[Optional[AIExplanationOut]] = []
         if response.success and response.clinical_decisions:
-            explanations = _fetch_explanations_for_decisions(
+            explanations = await _fetch_explanations_for_decisions(
                 response.clinical_decisions,
                 request.patient_data,
             )
@@ -174,7 +230,7 @@ async def evaluate_patient(request: CDSRequest, db: AsyncSession = Depends(get_d
                     f" | EML filter: {formulary_summary.get('filtered_count', 0)} option(s) filtered"
                     f" at {formulary_summary.get('facility_level', 'unknown')}"
                 ),
-                source="DROOLS",
+                source=recommendation_source(response, "DROOLS"),
                 explanations=[e.dict() if e else None for e in explanations] if explanations else None,
             )
         else:
@@ -196,6 +252,9 @@ async def evaluate_patient(request: CDSRequest, db: AsyncSession = Depends(get_d
             patient_data=response.patient_data,
             execution_time_ms=response.execution_time_ms,
             explanations=explanations if explanations else None,
+            rule_trace=response.rule_trace,
+            ruleset_version=response.ruleset_version,
+            ruleset_hash=response.ruleset_hash,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -208,7 +267,7 @@ async def evaluate_patient_direct(patient_data: PatientData):
     AI explanation is additive (non-blocking).
     """
     try:
-        response = drools_service.evaluate_patient(patient_data)
+        response = await drools_service.evaluate_patient_async(patient_data)
         response.clinical_decisions, formulary_summary = filter_decisions_for_facility(
             response.clinical_decisions or [], patient_data
         )
@@ -216,7 +275,7 @@ async def evaluate_patient_direct(patient_data: PatientData):
         # AI explanation is additive — failure never blocks clinical decision
         explanations: List[Optional[AIExplanationOut]] = []
         if response.clinical_decisions:
-            explanations = _fetch_explanations_for_decisions(
+            explanations = await _fetch_explanations_for_decisions(
                 response.clinical_decisions,
                 patient_data,
             )
@@ -232,6 +291,36 @@ async def evaluate_patient_direct(patient_data: PatientData):
             patient_data=response.patient_data,
             execution_time_ms=response.execution_time_ms,
             explanations=explanations if explanations else None,
+            rule_trace=response.rule_trace,
+            ruleset_version=response.ruleset_version,
+            ruleset_hash=response.ruleset_hash,
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/evaluate-batch", response_model=List[CDSResponse])
+async def evaluate_patients_batch(patients: List[PatientData]):
+    """
+    Bulk evaluation for screening campaigns and nightly re-evaluation.
+    Returns one CDSResponse per patient in request order; a failing patient gets
+    success=False without affecting the others. No AI explanations, nothing persisted.
+    """
+    max_patients = int(os.getenv("CDS_BATCH_MAX_PATIENTS", 1000))
+    if len(patients) > max_patients:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(patients)} patients exceeds CDS_BATCH_MAX_PATIENTS={max_patients}",
+        )
+
+    responses = await drools_service.batch_evaluate_patients_async(patients)
+    for patient_data, response in zip(patients, responses):
+        if response.success:
+            response.clinical_decisions, formulary_summary = filter_decisions_for_facility(
+                response.clinical_decisions or [], patient_data
+            )
+            response.message = (
+                f"{response.message} "
+                f"(EML filter at {formulary_summary.get('facility_level', 'unknown')}: "
+                f"{formulary_summary.get('filtered_count', 0)} option(s) removed)"
+            )
+    return responses
@@ -9,6 +9,7 @@ from ..schemas.cds_recommendation import CDSRecommendationCreate, CDSRecommendat
 from ..crud import cds_recommendation as recommendation_crud
 from ..crud import visit as visit_crud
 from ..crud import patient as patient_crud
+from ..services.explanation_orchestrator import explain_decisions
 from database.session import get_db
 
 logger = logging.getLogger(__name__)
@@ -82,22 +83,14 @@ async def read_recommendations_by_visit(visit_id: str, db: AsyncSession = Depend
                         "diastolic": visit.diastole or 0,
                     }
                     
-                    # Import llm_service
-                    import sys
-                    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-                    if backend_dir not in sys.path:
-                        sys.path.insert(0, backend_dir)
-                    import llm_service
-                    
-                    # Generate explanations for each decision
+                    # Generate explanations for all decisions concurrently (aligned by index)
                     explanations = []
                     if rec.decisions:
                         logger.info(f"Generating explanations for {len(rec.decisions)} decision(s) in recommendation {rec.id}")
-                        for i, decision in enumerate(rec.decisions):
-                            logger.info(f"  Processing decision {i}: {decision.get('diagnosis', 'Unknown')}")
-                            # Normalize decision keys to match llm_service expectations
-                            # Handle both snake_case and camelCase variations
-                            normalized_decision = {
+                        # Normalize decision keys to match llm_service expectations
+                        # Handle both snake_case and camelCase variations
+                        normalized_decisions = [
+                            {
                                 "diagnosis": decision.get("diagnosis") or "",
                                 "stage": decision.get("stage") or "",
                                 "medications": decision.get("medications") or decision.get("meds") or [],
@@ -106,21 +99,15 @@ async def read_recommendations_by_visit(visit_id: str, db: AsyncSession = Depend
                                 "referralReason": decision.get("referralReason") or decision.get("referral_reason"),
                                 "confidenceLevel": decision.get("confidenceLevel") or decision.get("confidence_level"),
                             }
-                            
-                            raw = llm_service.generate_explanation(normalized_decision, patient_ctx)
-                            explanations.append({
-                                "clinician_summary": raw.get("clinician_summary") or "",
-                                "clinician_explanation": raw.get("clinician_explanation") or "",
-                                "patient_summary": raw.get("patient_summary") or "",
-                                "patient_explanation": raw.get("patient_explanation") or "",
-                                "sources": raw.get("sources") or [],
-                            })
-                            logger.info(f"  Explanation {i} generated: {len(raw.get('clinician_summary', ''))} chars clinician text")
+                            for decision in rec.decisions
+                        ]
+                        explanations = await explain_decisions(normalized_decisions, patient_ctx)
                     else:
                         logger.warning(f"No decisions found in recommendation {rec.id}")
                     
                     # Update the recommendation with explanations
-                    if explanations:
+                    # Keep the list empty when every decision failed so the next read retries
+                    if any(explanations):
                         rec.explanations = explanations
                         await db.commit()
                         logger.info(f"Generated {len(explanations)} explanations for recommendation {rec.id}")
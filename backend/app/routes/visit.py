@@ -9,8 +9,9 @@ from ..crud import visit as visit_crud
 from ..crud import patient as patient_crud
 from ..crud import test_result as test_crud
 from ..crud import cds_recommendation as recommendation_crud
-from ..services.drools_integration import DroolsIntegrationService
+from ..services.drools_integration import get_drools_service, recommendation_source
 from ..services import cds_recommendation_service
+from ..services.explanation_orchestrator import explain_decisions
 from ..models import patient_models
 from database.models import Visit, CDSRecommendation
 from database.session import get_db, async_session
@@ -22,7 +23,7 @@ router = APIRouter(
 )
 
 # Initialize Drools service once
-drools_service = DroolsIntegrationService()
+drools_service = get_drools_service()
 
 # Create visit
 @router.post("/", response_model=VisitOut, status_code=status.HTTP_201_CREATED)
@@ -218,35 +219,12 @@ def _build_patient_context(patient_data):
     }
 
 
-def _generate_explanations_sync(decisions, patient_ctx, logger):
+async def _generate_explanations(decisions, patient_ctx):
     """
-    Generate AI explanations synchronously (blocking).
-    Returns list aligned by decisions index.
+    Generate AI explanations for all decisions concurrently.
+    Returns list aligned by decisions index (None for a decision that failed).
     """
-    import os
-    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    import sys
-    if backend_dir not in sys.path:
-        sys.path.insert(0, backend_dir)
-    import llm_service
-
-    explanations_payload = []
-    logger.info("AI explanation generation started for %s decision(s)", len(decisions or []))
-    for d in decisions:
-        try:
-            raw = llm_service.generate_explanation(_decision_to_dict_for_llm(d), patient_ctx)
-            explanations_payload.append({
-                "clinician_summary": raw.get("clinician_summary") or "",
-                "clinician_explanation": raw.get("clinician_explanation") or "",
-                "patient_summary": raw.get("patient_summary") or "",
-                "patient_explanation": raw.get("patient_explanation") or "",
-                "sources": raw.get("sources") or [],
-            })
-        except Exception as e:
-            logger.warning("AI explanation failed for one decision: %s", e)
-            explanations_payload.append(None)
-    logger.info("AI explanation generation finished")
-    return explanations_payload
+    return await explain_decisions([_decision_to_dict_for_llm(d) for d in decisions or []], patient_ctx)
 
 
 async def _run_async_ai_for_recommendation(recommendation_id: str, decisions, patient_ctx):
@@ -257,7 +235,10 @@ async def _run_async_ai_for_recommendation(recommendation_id: str, decisions, pa
     logger = logging.getLogger(__name__)
     try:
         logger.info("AI async job started for recommendation %s", recommendation_id)
-        explanations_payload = _generate_explanations_sync(decisions, patient_ctx, logger)
+        explanations_payload = await _generate_explanations(decisions, patient_ctx)
+        # Keep the list empty when every decision failed (or AI was warming up) so the next read retries
+        if not any(explanations_payload):
+            explanations_payload = []
         async with async_session() as bg_db:
             await bg_db.execute(
                 sa_update(CDSRecommendation)
@@ -296,7 +277,7 @@ async def evaluate_visit_cds(visit_id: str, db: AsyncSession = Depends(get_db)):
 
     patient_data = await _assemble_patient_data(db, visit_obj)
 
-    response = drools_service.evaluate_patient(patient_data)
+    response = await drools_service.evaluate_patient_async(patient_data)
     decisions = _dict_from_decisions(response.clinical_decisions)
 
     # AI explanations can be very slow (external LLM + RAG).
@@ -309,7 +290,7 @@ async def evaluate_visit_cds(visit_id: str, db: AsyncSession = Depends(get_db)):
 
     if enable_ai and enable_sync_visit_ai and decisions:
         try:
-            explanations_payload = _generate_explanations_sync(decisions, patient_ctx, logger)
+            explanations_payload = await _generate_explanations(decisions, patient_ctx)
             ai_status = "ready"
         except Exception as e:
             logger.warning("AI explanation skipped in visit cds-evaluate: %s", e)
@@ -334,7 +315,7 @@ async def evaluate_visit_cds(visit_id: str, db: AsyncSession = Depends(get_db)):
         decisions=decisions,
         risk_classification=None,
         notes=response.message,
-        source="drools",
+        source=recommendation_source(response),
         explanations=explanations_payload,
     )
 
@@ -357,6 +338,7 @@ async def evaluate_visit_cds(visit_id: str, db: AsyncSession = Depends(get_db)):
         "success": response.success,
         "message": response.message,
         "execution_time_ms": response.execution_time_ms,
+        "ruleset_version": response.ruleset_version,
         "clinical_decisions": decisions,
         "recommendation_id": recommendation.id,
         "visit_id": str(visit_obj.id),
@@ -0,0 +1,190 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database.models import CDSDecisionCache
+from database.session import async_session
+
+logger = logging.getLogger(__name__)
+
+# Identity/location fields the DRL never reads; dropping them lets re-evaluations of
+# the same clinical picture share one cache entry.
+_IGNORED_FIELDS = {
+    "demographics": ("patientId", "upid", "fullName", "province", "district", "sector", "cell", "village"),
+    "consultation": ("practitionerName",),
+}
+
+
+def canonical_input(java_input: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of the engine input with fields that cannot affect rule outcomes removed."""
+    canonical = copy.deepcopy(java_input)
+    for section, fields in _IGNORED_FIELDS.items():
+        block = canonical.get(section)
+        if isinstance(block, dict):
+            for field in fields:
+                block.pop(field, None)
+    return canonical
+
+
+def make_cache_key(java_input: Dict[str, Any], ruleset_version: str) -> str:
+    payload = json.dumps(
+        {"ruleset": ruleset_version, "input": canonical_input(java_input)},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DecisionCache:
+    """
+    LRU cache of rule-engine outputs with optional Postgres persistence.
+
+    The Drools rules are pure functions of the engine input, so an output can be reused
+    for the same canonical input and rule-set version. The rule-set version is the DRL
+    content hash reported by the engine. Cached entries are only trusted while that
+    version has been confirmed within `version_recheck_seconds`, either by a real
+    evaluation or by the engine's cheap ping/reload reply (see `confirm_version`); when
+    the engine reports a new hash the memory cache is cleared (and stale rows are purged
+    from Postgres), so cache entries never outlive the rules that produced them.
+    """
+
+    def __init__(self, max_entries: int = 2048, persist: bool = False, version_recheck_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.persist = persist
+        self.version_recheck_seconds = version_recheck_seconds
+
+        self.ruleset_version: Optional[str] = None
+        self._version_confirmed_at = 0.0
+        self._purge_stale_rows = False
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version_is_current(self) -> bool:
+        """Whether the rule-set version was confirmed by the engine recently enough to trust."""
+        if self.ruleset_version is None:
+            return False
+        return time.time() - self._version_confirmed_at <= self.version_recheck_seconds
+
+    def lookup_key(self, java_input: Dict[str, Any]) -> Optional[str]:
+        """Key to look up, or None when the rule-set version needs reconfirming by the engine."""
+        if not self.version_is_current():
+            return None
+        return make_cache_key(java_input, self.ruleset_version)
+
+    def get(self, key: Optional[str], record_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """Memory-only lookup (sync call sites)."""
+        with self._lock:
+            if key is not None and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._entries[key])
+            if record_miss:
+                self.misses += 1
+        return None
+
+    async def aget(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Memory lookup, then Postgres when persistence is enabled."""
+        cached = self.get(key, record_miss=not self.persist)
+        if cached is not None or not self.persist:
+            return cached
+        if key is not None:
+            try:
+                async with async_session() as db:
+                    row = await db.get(CDSDecisionCache, key)
+                if row is not None and row.ruleset_version == self.ruleset_version:
+                    self._remember(key, row.engine_output)
+                    with self._lock:
+                        self.persistent_hits += 1
+                    return copy.deepcopy(row.engine_output)
+            except Exception as e:
+                logger.warning("Decision cache lookup in Postgres failed: %s", e)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def confirm_version(self, version: Optional[str]) -> Optional[str]:
+        """Record the rule-set hash the engine reports as active; clear the cache when it changed."""
+        if not version:
+            return None
+        with self._lock:
+            if version != self.ruleset_version:
+                if self.ruleset_version is not None:
+                    logger.info("Rule set changed (%s -> %s); clearing decision cache", self.ruleset_version[:12], version[:12])
+                    self.invalidations += 1
+                    self._purge_stale_rows = True
+                self._entries.clear()
+                self.ruleset_version = version
+            self._version_confirmed_at = time.time()
+        return version
+
+    def _observe(self, java_output: Dict[str, Any]) -> Optional[str]:
+        return self.confirm_version(java_output.get("rulesetHash"))
+
+    def _remember(self, key: str, java_output: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = copy.deepcopy(java_output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, java_input: Dict[str, Any], java_output: Dict[str, Any]) -> Optional[str]:
+        version = self._observe(java_output)
+        if version is None or not java_output.get("success", True):
+            return None
+        key = make_cache_key(java_input, version)
+        self._remember(key, java_output)
+        return key
+
+    async def aput(self, java_input: Dict[str, Any], java_output: Dict[str, Any]) -> None:
+        key = self.put(java_input, java_output)
+        if key is None or not self.persist:
+            return
+        try:
+            async with async_session() as db:
+                if self._purge_stale_rows:
+                    self._purge_stale_rows = False
+                    await db.execute(
+                        delete(CDSDecisionCache).where(CDSDecisionCache.ruleset_version != self.ruleset_version)
+                    )
+                await db.execute(
+                    pg_insert(CDSDecisionCache)
+                    .values(cache_key=key, ruleset_version=self.ruleset_version, engine_output=java_output)
+                    .on_conflict_do_nothing(index_elements=["cache_key"])
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Decision cache write to Postgres failed: %s", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.ruleset_version = None
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persist": self.persist,
+            "ruleset_version": self.ruleset_version,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.persistent_hits) / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
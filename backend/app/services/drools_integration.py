@@ -1,14 +1,72 @@
 import subprocess
+import io
 import json
+import logging
 import tempfile
 import os
-from typing import Dict, Any, List
+import atexit
+import asyncio
+from functools import lru_cache
+import threading
+from typing import Dict, Any, List, Optional, Union
 import time
-from ..models.patient_models import PatientData, ClinicalDecision, CDSResponse
+from collections import deque
+from ..models.patient_models import PatientData, ClinicalDecision, CDSResponse, RuleTrace, RuleFiring
+from .drools_pool import DroolsWorkerPool
+from .drools_jpype import JPypeRuleEngine, default_classpath
+from .decision_cache import DecisionCache
+from .drools_wire import WIRE_FORMATS, encode_message, read_message
+from .rule_metrics import RuleMetrics
+
+logger = logging.getLogger(__name__)
+
+# "worker" keeps a pool of warm JVMs answering NDJSON requests; "jpype" evaluates
+# in an embedded JVM inside this process; "subprocess" launches `java -jar` per
+# evaluation (the original behaviour, useful for debugging).
+ENGINE_MODES = ("worker", "jpype", "subprocess")
+
+# How "subprocess" mode talks to the JVM: "pipe" streams the request over stdin/stdout
+# (`--stdio`), "tempfile" keeps the original input/output file hand-off for debugging.
+TRANSPORTS = ("pipe", "tempfile")
+
 
 class DroolsIntegrationService:
-    def __init__(self, drools_jar_path: str = None):
+    def __init__(self, drools_jar_path: str = None, engine_mode: str = None):
         self.drools_jar_path = drools_jar_path or self._find_drools_jar()
+        self.engine_mode = (engine_mode or os.getenv("DROOLS_ENGINE_MODE", "worker")).strip().lower()
+        if self.engine_mode not in ENGINE_MODES:
+            raise ValueError(f"Unknown DROOLS_ENGINE_MODE '{self.engine_mode}', expected one of {ENGINE_MODES}")
+        self.request_timeout = float(os.getenv("DROOLS_REQUEST_TIMEOUT", 30))
+        self.batch_timeout = float(os.getenv("DROOLS_BATCH_TIMEOUT", 600))
+        self.wire_format = os.getenv("DROOLS_WIRE_FORMAT", "json").strip().lower()
+        if self.wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown DROOLS_WIRE_FORMAT '{self.wire_format}', expected one of {WIRE_FORMATS}")
+        self.transport = os.getenv("DROOLS_TRANSPORT", "pipe").strip().lower()
+        if self.transport not in TRANSPORTS:
+            raise ValueError(f"Unknown DROOLS_TRANSPORT '{self.transport}', expected one of {TRANSPORTS}")
+
+        self.rule_metrics = RuleMetrics()
+        self.decision_cache = None
+        if os.getenv("DECISION_CACHE_ENABLED", "true").strip().lower() == "true":
+            self.decision_cache = DecisionCache(
+                max_entries=int(os.getenv("DECISION_CACHE_SIZE", 2048)),
+                persist=os.getenv("DECISION_CACHE_PERSIST", "false").strip().lower() == "true",
+                version_recheck_seconds=float(os.getenv("DECISION_CACHE_VERSION_RECHECK_SECONDS", 30)),
+            )
+
+        self._pool = None
+        self._jpype = None
+        if self.engine_mode == "jpype":
+            self._jpype = JPypeRuleEngine(default_classpath(self.drools_jar_path))
+        elif self.engine_mode == "worker":
+            self._pool = DroolsWorkerPool(
+                self.drools_jar_path,
+                size=int(os.getenv("DROOLS_WORKER_POOL_SIZE", 2)),
+                startup_timeout=float(os.getenv("DROOLS_WORKER_STARTUP_TIMEOUT", 120)),
+                request_timeout=self.request_timeout,
+                wire_format=self.wire_format,
+            )
+            atexit.register(self.shutdown)
     
     def _find_drools_jar(self) -> str:
         """Find the Drools JAR file in the project structure"""
@@ -157,14 +215,27 @@ class DroolsIntegrationService:
         
         return decisions
     
-    def evaluate_patient(self, patient_data: PatientData) -> CDSResponse:
-        """Evaluate patient data using Drools rules engine"""
-        start_time = time.time()
-        
+    def _run_subprocess(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one `java -jar` evaluation over the configured transport."""
+        if self.transport == "tempfile":
+            return self._run_subprocess_tempfile(java_input)
+
+        result = subprocess.run(
+            ["java", "-jar", self.drools_jar_path, "--stdio", "--format", self.wire_format],
+            input=encode_message(java_input, self.wire_format),
+            capture_output=True,
+            timeout=self.request_timeout,
+        )
+        if result.returncode != 0:
+            raise Exception(f"Java execution failed: {result.stderr.decode('utf-8', 'replace')}")
+        java_output = read_message(io.BytesIO(result.stdout), self.wire_format)
+        if java_output is None:
+            raise Exception("Java execution produced no output")
+        return java_output
+
+    def _run_subprocess_tempfile(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one `java -jar` evaluation through temporary input/output files."""
         try:
-            # Convert to Java-compatible input
-            java_input = self._convert_to_java_input(patient_data)
-            
             # Create temporary input file
             with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as input_file:
                 json.dump(java_input, input_file, indent=2)
@@ -188,7 +259,7 @@ class DroolsIntegrationService:
                 java_command,
                 capture_output=True,
                 text=True,
-                timeout=30  # 30 second timeout
+                timeout=self.request_timeout
             )
             
             if result.returncode != 0:
@@ -196,30 +267,7 @@ class DroolsIntegrationService:
             
             # Read and parse output
             with open(output_file_path, 'r') as f:
-                java_output = json.load(f)
-            
-            # Convert back to Python objects
-            decisions = self._convert_from_java_output(java_output)
-            
-            execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-            
-            return CDSResponse(
-                success=True,
-                message="Clinical decision support evaluation completed successfully",
-                clinical_decisions=decisions,
-                patient_data=patient_data,
-                execution_time_ms=execution_time
-            )
-            
-        except Exception as e:
-            execution_time = (time.time() - start_time) * 1000
-            return CDSResponse(
-                success=False,
-                message=f"Error during evaluation: {str(e)}",
-                clinical_decisions=[],
-                patient_data=patient_data,
-                execution_time_ms=execution_time
-            )
+                return json.load(f)
         
         finally:
             # Clean up temporary files
@@ -231,6 +279,318 @@ class DroolsIntegrationService:
             except:
                 pass  # Ignore cleanup errors
 
+    def _run_subprocess_batch(self, java_inputs: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Evaluate many inputs in one `java -jar --batch` invocation (one KieBase build).
+        Output lines are streamed back in input order; if the engine dies part-way the
+        remaining items get an exception instead of a result.
+        """
+        outputs: List[Union[Dict[str, Any], Exception]] = []
+        process = subprocess.Popen(
+            ["java", "-jar", self.drools_jar_path, "--batch", "-", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        # Drained concurrently (a full stderr pipe would stall the engine); the tail is
+        # logged when the batch fails
+        stderr_tail = deque(maxlen=200)
+
+        def drain_stderr():
+            for line in process.stderr:
+                stderr_tail.append(line.decode("utf-8", "replace").rstrip())
+
+        def feed_stdin():
+            try:
+                for java_input in java_inputs:
+                    process.stdin.write(encode_message(java_input))
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass  # engine died; the missing results are reported below
+
+        writer = threading.Thread(target=feed_stdin, daemon=True)
+        writer.start()
+        stderr_reader = threading.Thread(target=drain_stderr, daemon=True)
+        stderr_reader.start()
+        watchdog = threading.Timer(self.batch_timeout, process.kill)
+        watchdog.start()
+        try:
+            while True:
+                java_output = read_message(process.stdout)
+                if java_output is None:
+                    break
+                outputs.append(java_output)
+            process.wait()
+        finally:
+            watchdog.cancel()
+            writer.join(timeout=5)
+            stderr_reader.join(timeout=5)
+
+        stderr_text = "\n".join(stderr_tail)
+        if process.returncode != 0:
+            logger.warning("Batch engine exited with code %s:\n%s", process.returncode, stderr_text)
+        if len(outputs) < len(java_inputs):
+            failure = Exception(
+                f"Batch engine stopped after {len(outputs)} of {len(java_inputs)} patient(s) "
+                f"(exit code {process.returncode}): {stderr_text[-2000:]}"
+            )
+            outputs.extend([failure] * (len(java_inputs) - len(outputs)))
+        return outputs
+
+    def _active_ruleset_hash(self) -> Optional[str]:
+        """Rule-set hash from the warm engine's ping/active-rule-set call, without an evaluation."""
+        if self._pool is not None:
+            return self._pool.ping_sync().get("rulesetHash")
+        if self._jpype is not None:
+            return self._jpype.active_ruleset().get("rulesetHash")
+        return None
+
+    async def _active_ruleset_hash_async(self) -> Optional[str]:
+        if self._pool is not None:
+            return (await self._pool.ping()).get("rulesetHash")
+        if self._jpype is not None:
+            return (await asyncio.to_thread(self._jpype.active_ruleset)).get("rulesetHash")
+        return None
+
+    def _cache_key(self, java_input: Dict[str, Any]) -> Optional[str]:
+        """
+        Decision-cache key for this input. A stale rule-set version is reconfirmed with the
+        warm engine's cheap ping; subprocess mode has no such call and treats it as a miss.
+        """
+        cache = self.decision_cache
+        if not cache.version_is_current() and self.engine_mode != "subprocess":
+            try:
+                cache.confirm_version(self._active_ruleset_hash())
+            except Exception as e:
+                logger.warning("Could not confirm the active rule-set version: %s", e)
+        return cache.lookup_key(java_input)
+
+    async def _cache_key_async(self, java_input: Dict[str, Any]) -> Optional[str]:
+        cache = self.decision_cache
+        if not cache.version_is_current() and self.engine_mode != "subprocess":
+            try:
+                cache.confirm_version(await self._active_ruleset_hash_async())
+            except Exception as e:
+                logger.warning("Could not confirm the active rule-set version: %s", e)
+        return cache.lookup_key(java_input)
+
+    def _run_engine(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Dispatch one evaluation to the configured engine mode and return the raw Java output."""
+        cache = self.decision_cache
+        if cache is not None:
+            cached = cache.get(self._cache_key(java_input))
+            if cached is not None:
+                cached["fromCache"] = True
+                return cached
+        java_output = self._run_engine_uncached(java_input)
+        self.rule_metrics.record(java_output.get("ruleTrace"))
+        if cache is not None:
+            cache.put(java_input, java_output)
+        return java_output
+
+    def _run_engine_uncached(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        if self._pool is not None:
+            return self._pool.evaluate_sync(java_input)
+        if self._jpype is not None:
+            return self._jpype.evaluate(java_input)
+        return self._run_subprocess(java_input)
+
+    async def _run_engine_async(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking variant of _run_engine for use from async routes."""
+        cache = self.decision_cache
+        if cache is not None:
+            cached = await cache.aget(await self._cache_key_async(java_input))
+            if cached is not None:
+                cached["fromCache"] = True
+                return cached
+        java_output = await self._run_engine_uncached_async(java_input)
+        self.rule_metrics.record(java_output.get("ruleTrace"))
+        if cache is not None:
+            await cache.aput(java_input, java_output)
+        return java_output
+
+    async def _run_engine_uncached_async(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        if self._pool is not None:
+            return await self._pool.evaluate(java_input)
+        if self._jpype is not None:
+            return await asyncio.to_thread(self._jpype.evaluate, java_input)
+        return await asyncio.to_thread(self._run_subprocess, java_input)
+
+    @staticmethod
+    def _rule_trace(java_output: Dict[str, Any]) -> Optional[RuleTrace]:
+        trace = java_output.get("ruleTrace")
+        if not trace:
+            return None
+        return RuleTrace(
+            rules_fired=trace.get("rulesFired", 0),
+            fire_all_rules_ms=trace.get("fireAllRulesMs"),
+            cached=bool(java_output.get("fromCache")),
+            rules=[
+                RuleFiring(
+                    rule=firing["rule"],
+                    package=firing.get("package"),
+                    activations=firing.get("activations", 0),
+                    cancelled=firing.get("cancelled", 0),
+                    fired=firing.get("fired", 0),
+                    time_ms=firing.get("timeMs", 0.0),
+                )
+                for firing in trace.get("rules") or []
+            ],
+        )
+
+    def _success_response(self, patient_data: PatientData, java_output: Dict[str, Any], start_time: float) -> CDSResponse:
+        # Convert back to Python objects
+        decisions = self._convert_from_java_output(java_output)
+        
+        execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+        
+        return CDSResponse(
+            success=True,
+            message="Clinical decision support evaluation completed successfully",
+            clinical_decisions=decisions,
+            patient_data=patient_data,
+            execution_time_ms=execution_time,
+            rule_trace=self._rule_trace(java_output),
+            ruleset_version=java_output.get("rulesetVersion"),
+            ruleset_hash=java_output.get("rulesetHash"),
+        )
+
+    def _error_response(self, patient_data: PatientData, error: Exception, start_time: float) -> CDSResponse:
+        execution_time = (time.time() - start_time) * 1000
+        return CDSResponse(
+            success=False,
+            message=f"Error during evaluation: {str(error)}",
+            clinical_decisions=[],
+            patient_data=patient_data,
+            execution_time_ms=execution_time
+        )
+
+    def evaluate_patient(self, patient_data: PatientData) -> CDSResponse:
+        """Evaluate patient data using Drools rules engine"""
+        start_time = time.time()
+        
+        try:
+            # Convert to Java-compatible input
+            java_input = self._convert_to_java_input(patient_data)
+            java_output = self._run_engine(java_input)
+            return self._success_response(patient_data, java_output, start_time)
+        except Exception as e:
+            return self._error_response(patient_data, e, start_time)
+
+    async def evaluate_patient_async(self, patient_data: PatientData) -> CDSResponse:
+        """Evaluate patient data without blocking the event loop (queues when all workers are busy)."""
+        start_time = time.time()
+        
+        try:
+            java_input = self._convert_to_java_input(patient_data)
+            java_output = await self._run_engine_async(java_input)
+            return self._success_response(patient_data, java_output, start_time)
+        except Exception as e:
+            return self._error_response(patient_data, e, start_time)
+
+    def _batch_responses(
+        self,
+        patient_list: List[PatientData],
+        outputs: List[Union[Dict[str, Any], Exception]],
+        start_time: float,
+    ) -> List[CDSResponse]:
+        """Map per-patient engine outputs to CDSResponses, isolating failures per item."""
+        responses = []
+        for patient, output in zip(patient_list, outputs):
+            if isinstance(output, Exception):
+                responses.append(self._error_response(patient, output, start_time))
+            elif not output.get("success", True):
+                responses.append(self._error_response(patient, Exception(output.get("error") or "Evaluation failed"), start_time))
+            else:
+                responses.append(self._success_response(patient, output, start_time))
+        return responses
+
+    def batch_evaluate_patients(self, patient_list: List[PatientData]) -> List[CDSResponse]:
+        """Evaluate multiple patients against one compiled rule base; failures are isolated per patient."""
+        start_time = time.time()
+        outputs: List[Union[Dict[str, Any], Exception]] = []
+        pending: Dict[int, Dict[str, Any]] = {}
+        for index, patient in enumerate(patient_list):
+            try:
+                pending[index] = self._convert_to_java_input(patient)
+                outputs.append(None)
+            except Exception as e:
+                outputs.append(e)
+
+        if self._pool is None and self._jpype is None:
+            results = self._run_subprocess_batch(list(pending.values())) if pending else []
+            for result in results:
+                if isinstance(result, dict):
+                    self.rule_metrics.record(result.get("ruleTrace"))
+        else:
+            # Warm engines already hold a compiled KieBase; evaluate item by item
+            results = []
+            for java_input in pending.values():
+                try:
+                    results.append(self._run_engine(java_input))
+                except Exception as e:
+                    results.append(e)
+
+        for index, result in zip(pending.keys(), results):
+            outputs[index] = result
+        return self._batch_responses(patient_list, outputs, start_time)
+
+    async def batch_evaluate_patients_async(self, patient_list: List[PatientData]) -> List[CDSResponse]:
+        """Async batch evaluation; with a worker pool the patients are spread across all workers."""
+        if self._pool is not None:
+            return list(await asyncio.gather(*(self.evaluate_patient_async(p) for p in patient_list)))
+        return await asyncio.to_thread(self.batch_evaluate_patients, patient_list)
+
+    def engine_stats(self) -> Dict[str, Any]:
+        """Engine mode, worker-pool saturation/latency, cache and per-rule firing metrics."""
+        stats: Dict[str, Any] = {"engine_mode": self.engine_mode, "rules": self.rule_metrics.stats()}
+        if self._pool is not None:
+            stats["pool"] = self._pool.stats()
+        if self.decision_cache is not None:
+            stats["decision_cache"] = self.decision_cache.stats()
+        return stats
+
+    def reload_rules(self) -> Dict[str, Any]:
+        """
+        Pick up the current CDS_RULES_DIR version now rather than at the next poll.
+        Warm engines build it in the background and swap atomically; subprocess mode
+        already loads the latest version on every evaluation.
+        """
+        if self._pool is not None:
+            workers = self._pool.reload()
+            self._confirm_cache_version(*(w.get("rulesetHash") for w in workers if w.get("success")))
+            return {"engine_mode": self.engine_mode, "workers": workers}
+        if self._jpype is not None:
+            info = self._jpype.reload()
+            self._confirm_cache_version(info.get("rulesetHash"))
+            return dict(info, engine_mode=self.engine_mode)
+        return {"engine_mode": self.engine_mode, "swapped": False}
+
+    def _confirm_cache_version(self, *hashes: Optional[str]) -> None:
+        """Feed the decision cache a rule-set hash reported by every warm engine, if they agree."""
+        reported = {h for h in hashes if h}
+        if self.decision_cache is not None and len(reported) == 1:
+            self.decision_cache.confirm_version(reported.pop())
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Start the warm engine now (worker JVMs or the embedded JVM, KieBase built) so the
+        first evaluation does not pay for it; subprocess mode has nothing to warm.
+        """
+        started = time.perf_counter()
+        if self._pool is not None:
+            self._pool.start()
+            self._confirm_cache_version(*(worker.ruleset_hash for worker in self._pool.workers))
+        elif self._jpype is not None:
+            self._jpype.start()
+            self._confirm_cache_version(self._jpype.active_ruleset().get("rulesetHash"))
+        return {"engine_mode": self.engine_mode, "seconds": round(time.perf_counter() - started, 2)}
+
+    def shutdown(self) -> None:
+        """Stop the warm worker processes, if any are running."""
+        if self._pool is not None:
+            self._pool.stop()
+
     def test_connection(self) -> bool:
         """Test if the Drools integration is working"""
         try:
@@ -246,10 +606,22 @@ class DroolsIntegrationService:
             print(f"Connection test failed: {e}")
             return False
 
-    def batch_evaluate_patients(self, patient_list: List[PatientData]) -> List[CDSResponse]:
-        """Evaluate multiple patients in batch"""
-        responses = []
-        for patient in patient_list:
-            response = self.evaluate_patient(patient)
-            responses.append(response)
-        return responses
\ No newline at end of file
+
+
+def recommendation_source(response: CDSResponse, engine: str = "drools") -> str:
+    """
+    Value stored in CDSRecommendation.source: the engine plus the rule-set version and
+    hash prefix that produced the decisions, e.g. "drools:2026-10-01@3f9a1c2b7d4e".
+    """
+    if not response.ruleset_version:
+        return engine
+    source = f"{engine}:{response.ruleset_version}"
+    if response.ruleset_hash:
+        source += f"@{response.ruleset_hash[:12]}"
+    return source
+
+
+@lru_cache(maxsize=1)
+def get_drools_service() -> DroolsIntegrationService:
+    """Process-wide service instance so all routers share one warm worker."""
+    return DroolsIntegrationService()
@@ -0,0 +1,76 @@
+import glob
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+RUNNER_CLASS = "com.rwanda.health.cds.DroolsJsonRunner"
+
+
+def default_classpath(drools_jar_path: str) -> List[str]:
+    """
+    Classpath for the embedded JVM.
+
+    The Spring Boot fat jar nests its dependencies under BOOT-INF/lib, which a plain
+    JVM classloader cannot read, so use the compiled classes plus the dependency jars
+    that `mvn package` copies to target/lib. DROOLS_CLASSPATH overrides this.
+    """
+    override = os.getenv("DROOLS_CLASSPATH")
+    if override:
+        return [p for p in override.split(os.pathsep) if p]
+    target_dir = os.path.dirname(os.path.abspath(drools_jar_path))
+    return [os.path.join(target_dir, "classes")] + sorted(glob.glob(os.path.join(target_dir, "lib", "*.jar")))
+
+
+class JPypeRuleEngine:
+    """
+    In-process Drools evaluation through JPype.
+
+    One JVM is embedded per Python process (i.e. per uvicorn worker) and one shared
+    KieContainer is built inside it; every evaluation gets its own short-lived KieSession.
+    Input/output use the same JSON shape as the subprocess and worker paths.
+    """
+
+    def __init__(self, classpath: List[str]):
+        self.classpath = classpath
+        self._runner = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._runner is not None:
+            return
+        with self._lock:
+            if self._runner is not None:
+                return
+            try:
+                import jpype
+            except ImportError:
+                raise RuntimeError("DROOLS_ENGINE_MODE=jpype requires the jpype1 package")
+
+            if not jpype.isJVMStarted():
+                logger.info("Starting embedded JVM (%s classpath entries)", len(self.classpath))
+                jpype.startJVM(classpath=self.classpath, convertStrings=True)
+            runner = jpype.JClass(RUNNER_CLASS)
+            runner.warmUp()
+            self._runner = runner
+
+    def evaluate(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Evaluate one patient (Java-shaped input dict) and return the Java output dict."""
+        self.start()
+        return json.loads(str(self._runner.evaluateJson(json.dumps(java_input, separators=(",", ":")))))
+
+    def active_ruleset(self) -> Dict[str, Any]:
+        """Version label and hash of the rule set serving evaluations (no evaluation needed)."""
+        self.start()
+        return json.loads(str(self._runner.activeRuleSetJson()))
+
+    def reload(self) -> Dict[str, Any]:
+        """Re-scan CDS_RULES_DIR now; returns the active rule-set version and whether it changed."""
+        self.start()
+        swapped = bool(self._runner.reloadRules())
+        info = self.active_ruleset()
+        info["swapped"] = swapped
+        return info
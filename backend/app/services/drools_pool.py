@@ -0,0 +1,164 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .drools_worker import DroolsWorker
+
+
+class WorkerStats:
+    """Rolling latency/usage counters for one pool worker."""
+
+    def __init__(self, window: int = 200):
+        self.requests = 0
+        self.errors = 0
+        self.last_ms: Optional[float] = None
+        self._latencies: deque = deque(maxlen=window)
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.last_ms = elapsed_ms
+        self._latencies.append(elapsed_ms)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class DroolsWorkerPool:
+    """
+    Fixed-size pool of warm Drools workers.
+
+    Async callers check out an idle worker from an asyncio queue (waiting in FIFO order
+    when every worker is busy) and run the blocking pipe round-trip in a thread, so the
+    event loop is never blocked by an evaluation. Sync callers are spread round-robin
+    and serialise on the per-worker lock.
+    """
+
+    def __init__(
+        self,
+        drools_jar_path: str,
+        size: int = 2,
+        startup_timeout: float = 120.0,
+        request_timeout: float = 30.0,
+        wire_format: str = "json",
+    ):
+        if size < 1:
+            raise ValueError("Drools worker pool size must be at least 1")
+        self.workers: List[DroolsWorker] = [
+            DroolsWorker(
+                drools_jar_path,
+                startup_timeout=startup_timeout,
+                request_timeout=request_timeout,
+                wire_format=wire_format,
+            )
+            for _ in range(size)
+        ]
+        self.worker_stats: List[WorkerStats] = [WorkerStats() for _ in range(size)]
+        self._round_robin = itertools.cycle(range(size))
+        self._idle: Optional[asyncio.Queue] = None
+        self._busy = 0
+        self._waiting = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.workers)
+
+    def _idle_queue(self) -> asyncio.Queue:
+        # Created lazily so the queue binds to the running (uvicorn) event loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for index in range(self.size):
+                self._idle.put_nowait(index)
+        return self._idle
+
+    def _call(self, index: int, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = self.workers[index].evaluate(java_input)
+            ok = True
+            return result
+        finally:
+            self.worker_stats[index].record((time.perf_counter() - started) * 1000, ok)
+
+    def evaluate_sync(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Blocking evaluation for scripts and sync call sites."""
+        return self._call(next(self._round_robin), java_input)
+
+    async def _on_idle_worker(self, call: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+        """Run `call(index)` in a thread on the next idle worker, queueing while all are busy."""
+        idle = self._idle_queue()
+        self._waiting += 1
+        try:
+            index = await idle.get()
+        finally:
+            self._waiting -= 1
+
+        self._busy += 1
+        try:
+            return await asyncio.to_thread(call, index)
+        finally:
+            self._busy -= 1
+            idle.put_nowait(index)
+
+    async def evaluate(self, java_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Evaluate on the next idle worker, queueing while all workers are busy."""
+        return await self._on_idle_worker(lambda index: self._call(index, java_input))
+
+    def ping_sync(self) -> Dict[str, Any]:
+        """Blocking ping of the next worker; the reply carries the active rule-set hash."""
+        return self.workers[next(self._round_robin)].ping()
+
+    async def ping(self) -> Dict[str, Any]:
+        """Ping the next idle worker without blocking the event loop."""
+        return await self._on_idle_worker(lambda index: self.workers[index].ping())
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool saturation, queue depth and per-worker latency."""
+        return {
+            "size": self.size,
+            "busy": self._busy,
+            "idle": self.size - self._busy,
+            "saturation": round(self._busy / self.size, 3),
+            "queue_depth": self._waiting,
+            "workers": [
+                {
+                    "index": index,
+                    "alive": worker.is_alive(),
+                    "restarts": worker.restarts,
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "last_ms": stats.last_ms,
+                    "p50_ms": stats.percentile(50),
+                    "p95_ms": stats.percentile(95),
+                }
+                for index, (worker, stats) in enumerate(zip(self.workers, self.worker_stats))
+            ],
+        }
+
+    def reload(self) -> List[Dict[str, Any]]:
+        """Make every worker pick up the current rule-set version now (blocking)."""
+        results = []
+        for index, worker in enumerate(self.workers):
+            try:
+                results.append(dict(worker.reload(), index=index))
+            except Exception as e:
+                results.append({"index": index, "success": False, "error": str(e)})
+        return results
+
+    def start(self) -> None:
+        """Start every worker in parallel and wait until all have built their KieContainer."""
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="drools-worker-start") as executor:
+            list(executor.map(lambda worker: worker.start(), self.workers))
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
@@ -0,0 +1,46 @@
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Optional
+
+# Must match WireCodec on the Java side:
+#   json — compact JSON, one message per line
+#   cbor — CBOR payload prefixed with a 4-byte big-endian length
+WIRE_FORMATS = ("json", "cbor")
+
+_LENGTH = struct.Struct(">I")
+
+
+def _cbor():
+    try:
+        import cbor2
+    except ImportError:
+        raise RuntimeError("DROOLS_WIRE_FORMAT=cbor requires the cbor2 package")
+    return cbor2
+
+
+def encode_message(message: Dict[str, Any], wire_format: str = "json") -> bytes:
+    if wire_format == "cbor":
+        payload = _cbor().dumps(message)
+        return _LENGTH.pack(len(payload)) + payload
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def read_message(stream: BinaryIO, wire_format: str = "json") -> Optional[Dict[str, Any]]:
+    """Read the next framed message; None at end of stream."""
+    if wire_format == "cbor":
+        header = stream.read(_LENGTH.size)
+        if len(header) < _LENGTH.size:
+            return None
+        (length,) = _LENGTH.unpack(header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            return None
+        return _cbor().loads(payload)
+
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if line:
+            return json.loads(line)
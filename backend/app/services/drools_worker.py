@@ -0,0 +1,181 @@
+import itertools
+import logging
+import queue
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .drools_wire import encode_message, read_message
+
+logger = logging.getLogger(__name__)
+
+# Sentinel pushed by the reader thread when the worker's stdout closes
+_EOF = object()
+
+
+class DroolsWorkerError(Exception):
+    """Raised when the Drools worker cannot start or answer a request."""
+
+
+class DroolsWorker:
+    """
+    Long-lived `DroolsJsonRunner --worker` process.
+
+    The JVM builds the KieContainer once and then answers framed requests over
+    stdin/stdout (compact NDJSON, or length-prefixed CBOR; see drools_wire). The worker
+    is started lazily on the first request, restarted if it has died, and killed if a
+    request exceeds its timeout.
+    """
+
+    def __init__(
+        self,
+        drools_jar_path: str,
+        startup_timeout: float = 120.0,
+        request_timeout: float = 30.0,
+        java_command: str = "java",
+        wire_format: str = "json",
+    ):
+        self.drools_jar_path = drools_jar_path
+        self.wire_format = wire_format
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.java_command = java_command
+
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self.restarts = 0
+        # Hash of the rule set the worker last reported as active (handshake, ping, reload)
+        self.ruleset_hash: Optional[str] = None
+
+    def _command(self) -> List[str]:
+        return [self.java_command, "-jar", self.drools_jar_path, "--worker", "--format", self.wire_format]
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        """Start the worker (if not already running) and wait for its ready line."""
+        with self._lock:
+            self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self.is_alive():
+            return
+        if self._process is not None:
+            self.restarts += 1
+            logger.warning(
+                "Drools worker exited with code %s — restarting (restart #%s)",
+                self._process.returncode,
+                self.restarts,
+            )
+
+        self._responses = queue.Queue()
+        self._process = subprocess.Popen(
+            self._command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        threading.Thread(
+            target=self._read_stdout, args=(self._process, self._responses, self.wire_format), daemon=True
+        ).start()
+        threading.Thread(target=self._drain_stderr, args=(self._process,), daemon=True).start()
+
+        started = time.time()
+        ready = self._next_message(self.startup_timeout)
+        if not ready.get("ready"):
+            self._kill()
+            raise DroolsWorkerError(f"Unexpected worker handshake: {ready}")
+        self.ruleset_hash = ready.get("rulesetHash")
+        logger.info("Drools worker ready in %.0f ms", (time.time() - started) * 1000)
+
+    @staticmethod
+    def _read_stdout(process: subprocess.Popen, responses: "queue.Queue[Any]", wire_format: str) -> None:
+        try:
+            while True:
+                message = read_message(process.stdout, wire_format)
+                if message is None:
+                    break
+                responses.put(message)
+        except Exception as e:
+            logger.warning("Drools worker sent an unreadable message: %s", e)
+        responses.put(_EOF)
+
+    @staticmethod
+    def _drain_stderr(process: subprocess.Popen) -> None:
+        for line in process.stderr:
+            logger.debug("drools-worker: %s", line.decode("utf-8", "replace").rstrip())
+
+    def _next_message(self, timeout: float) -> Dict[str, Any]:
+        try:
+            message = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            self._kill()
+            raise DroolsWorkerError(f"Drools worker did not respond within {timeout:.0f}s")
+        if message is _EOF:
+            self._kill()
+            raise DroolsWorkerError("Drools worker exited unexpectedly")
+        return message
+
+    def _kill(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._process.kill()
+            self._process.wait(timeout=5)
+        except Exception:
+            pass
+
+    def request(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send one request and block until its response arrives (or the timeout expires)."""
+        timeout = timeout if timeout is not None else self.request_timeout
+        with self._lock:
+            self._ensure_started()
+            request_id = next(self._request_ids)
+            message = dict(payload, id=request_id)
+            try:
+                self._process.stdin.write(encode_message(message, self.wire_format))
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self._kill()
+                raise DroolsWorkerError(f"Could not write to Drools worker: {e}")
+
+            deadline = time.time() + timeout
+            while True:
+                response = self._next_message(max(deadline - time.time(), 0.0))
+                if response.get("id") == request_id:
+                    return response
+                logger.debug("Discarding stale worker response: %s", response.get("id"))
+
+    def evaluate(self, java_input: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Evaluate one patient (Java-shaped input dict) and return the raw Java output dict."""
+        response = self.request({"input": java_input}, timeout=timeout)
+        if not response.get("success", False):
+            raise DroolsWorkerError(response.get("error") or "Drools worker evaluation failed")
+        return response
+
+    def ping(self) -> Dict[str, Any]:
+        """Cheap round trip reporting the active rule-set version and hash."""
+        response = self.request({"cmd": "ping"})
+        self.ruleset_hash = response.get("rulesetHash") or self.ruleset_hash
+        return response
+
+    def reload(self) -> Dict[str, Any]:
+        """Ask the worker to re-scan its rule-set directory; building can take as long as startup."""
+        response = self.request({"cmd": "reload"}, timeout=self.startup_timeout)
+        self.ruleset_hash = response.get("rulesetHash") or self.ruleset_hash
+        return response
+
+    def stop(self) -> None:
+        """Close stdin so the worker exits cleanly; kill it if it lingers."""
+        with self._lock:
+            if not self.is_alive():
+                return
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except Exception:
+                self._kill()
@@ -0,0 +1,271 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database.models import CDSExplanationCache
+from database.session import async_session
+
+logger = logging.getLogger(__name__)
+
+# Band edges follow the thresholds the prompt builders and guidelines use (e.g. the
+# >=180 systolic emergency flag), so every patient in a bucket gets identical prompt flags.
+_SYSTOLIC_BANDS = (120, 130, 140, 160, 180)
+_DIASTOLIC_BANDS = (80, 90, 100, 110)
+_AGE_BANDS = (18, 30, 40, 50, 60, 70, 80)
+
+
+def _band(value: Any, edges: Tuple[int, ...]) -> str:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return "unknown"
+    lower = None
+    for edge in edges:
+        if value < edge:
+            return f"<{edge}" if lower is None else f"{lower}-{edge - 1}"
+        lower = edge
+    return f">={edges[-1]}"
+
+
+def _normalize_list(values: Any) -> list:
+    return sorted({str(v).strip().casefold() for v in values or [] if str(v).strip()})
+
+
+def normalize_decision(decision: Dict[str, Any]) -> Dict[str, Any]:
+    """The decision fields the explanation prompts read, normalized for comparison."""
+    return {
+        "diagnosis": str(decision.get("diagnosis") or "").strip().casefold(),
+        "stage": str(decision.get("stage") or "").strip().casefold(),
+        "medications": _normalize_list(decision.get("medications")),
+        "tests": _normalize_list(decision.get("tests")),
+        "needsReferral": bool(decision.get("needsReferral")),
+    }
+
+
+def context_bucket(patient: Dict[str, Any]) -> Dict[str, str]:
+    """Coarse patient context: age band, sex and systolic/diastolic bands."""
+    return {
+        "age": _band(patient.get("age"), _AGE_BANDS),
+        "sex": str(patient.get("gender") or "unknown").strip().casefold(),
+        "systolic": _band(patient.get("systolic"), _SYSTOLIC_BANDS),
+        "diastolic": _band(patient.get("diastolic"), _DIASTOLIC_BANDS),
+    }
+
+
+def banded_vitals(patient: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Age and blood pressure written as the patient's bands, for llm_service's prompt
+    builders (`vitals`): an explanation shared across a cache bucket must not quote the
+    exact readings of the patient it was first generated for.
+    """
+    bucket = context_bucket(patient)
+    return {
+        "age": f"{bucket['age']} years (age band)" if bucket["age"] != "unknown" else "unknown",
+        "blood_pressure": f"systolic {bucket['systolic']} / diastolic {bucket['diastolic']} mmHg (reading band)",
+    }
+
+
+def make_explanation_key(decision: Dict[str, Any], patient: Dict[str, Any], prompt_version: str, model: str) -> str:
+    payload = json.dumps(
+        {
+            "decision": normalize_decision(decision),
+            "context": context_bucket(patient),
+            "prompt_version": prompt_version,
+            "model": model,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """
+    LRU cache of generate_explanation() results in front of a Postgres table.
+
+    Entries are keyed on the normalized decision, a coarse patient-context bucket, the
+    prompt version and the Groq model, and expire after `ttl_seconds`. Cached texts are
+    generated from banded_vitals(), never the exact readings, so they are true for every
+    patient in the bucket. Rows written under
+    another prompt version are purged the first time the cache touches Postgres (and on
+    explicit invalidation), so a prompt change never serves explanations from old prompts.
+    Failed or empty generations are never stored.
+    """
+
+    def __init__(
+        self,
+        prompt_version: str,
+        model: str,
+        max_entries: int = 1024,
+        ttl_seconds: float = 30 * 24 * 3600,
+        persist: bool = False,
+    ):
+        self.prompt_version = prompt_version
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged = False
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def key_for(self, decision: Dict[str, Any], patient: Dict[str, Any]) -> Optional[str]:
+        """Cache key, or None for requests that must not be cached (safety test flag)."""
+        if decision.get("_force_no_context"):
+            return None
+        return make_explanation_key(decision, patient, self.prompt_version, self.model)
+
+    @staticmethod
+    def cacheable(explanation: Dict[str, Any]) -> bool:
+        # Ungrounded text (Qdrant/embedder outage) is never pinned: the next request retries with guidelines
+        return bool(explanation.get("ai_enabled")) and bool(explanation.get("rag_grounded")) and bool(
+            explanation.get("clinician_explanation") and explanation.get("patient_explanation")
+        )
+
+    def get(self, key: Optional[str], record_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """Memory-only lookup."""
+        with self._lock:
+            if key is not None and key in self._entries:
+                stored_at, value = self._entries[key]
+                if time.time() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self.expired += 1
+            if record_miss:
+                self.misses += 1
+        return None
+
+    async def aget(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Memory lookup, then Postgres when persistence is enabled."""
+        cached = self.get(key, record_miss=not self.persist)
+        if cached is not None or not self.persist:
+            return cached
+        if key is not None:
+            try:
+                await self._purge_stale_once()
+                async with async_session() as db:
+                    row = await db.get(CDSExplanationCache, key)
+                if row is not None and row.prompt_version == self.prompt_version and not self._is_expired(row.created_at):
+                    age = (datetime.now(timezone.utc) - row.created_at).total_seconds() if row.created_at else 0.0
+                    self._remember(key, row.explanation, stored_at=time.time() - age)
+                    with self._lock:
+                        self.persistent_hits += 1
+                    return copy.deepcopy(row.explanation)
+            except Exception as e:
+                logger.warning("Explanation cache lookup in Postgres failed: %s", e)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _is_expired(self, created_at: Optional[datetime]) -> bool:
+        if created_at is None:
+            return False
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - created_at > timedelta(seconds=self.ttl_seconds)
+
+    def _remember(self, key: str, explanation: Dict[str, Any], stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at if stored_at is not None else time.time(), copy.deepcopy(explanation))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: Optional[str], explanation: Dict[str, Any]) -> bool:
+        if key is None or not self.cacheable(explanation):
+            return False
+        self._remember(key, explanation)
+        with self._lock:
+            self.stores += 1
+        return True
+
+    async def aput(self, key: Optional[str], explanation: Dict[str, Any]) -> None:
+        if not self.put(key, explanation) or not self.persist:
+            return
+        try:
+            await self._purge_stale_once()
+            async with async_session() as db:
+                await db.execute(
+                    pg_insert(CDSExplanationCache)
+                    .values(cache_key=key, prompt_version=self.prompt_version, model=self.model, explanation=explanation)
+                    .on_conflict_do_update(
+                        index_elements=["cache_key"],
+                        set_={"explanation": explanation, "created_at": datetime.now(timezone.utc)},
+                    )
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Explanation cache write to Postgres failed: %s", e)
+
+    async def _purge_stale_once(self) -> None:
+        if self._purged:
+            return
+        await self._purge(everything=False)
+        self._purged = True  # only once it committed: a failed purge is retried next time
+
+    async def _purge(self, everything: bool) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+        statement = delete(CDSExplanationCache)
+        if not everything:
+            statement = statement.where(
+                or_(
+                    CDSExplanationCache.prompt_version != self.prompt_version,
+                    CDSExplanationCache.created_at < cutoff,
+                )
+            )
+        async with async_session() as db:
+            result = await db.execute(statement)
+            await db.commit()
+        if result.rowcount:
+            logger.info("Purged %s explanation cache row(s)%s", result.rowcount, "" if everything else " (stale/expired)")
+
+    async def invalidate(self, everything: bool = False) -> None:
+        """
+        Drop the memory cache and purge Postgres rows from other prompt versions (or all
+        rows with everything=True). Call after editing prompts without restarting.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        if self.persist:
+            try:
+                await self._purge(everything=everything)
+            except Exception as e:
+                logger.warning("Explanation cache purge in Postgres failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persist": self.persist,
+            "ttl_seconds": self.ttl_seconds,
+            "prompt_version": self.prompt_version,
+            "model": self.model,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.persistent_hits) / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,309 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import sys
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .explanation_cache import ExplanationCache, banded_vitals, make_explanation_key
+
+logger = logging.getLogger(__name__)
+
+
+def _llm_service():
+    """Import the top-level llm_service module (lives next to app/, not inside it)."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    import llm_service
+    return llm_service
+
+
+def start_ai_warm_up() -> bool:
+    """Import llm_service and load its clients/embedder on a background thread."""
+    try:
+        _llm_service().start_warm_up()
+        return True
+    except Exception as e:
+        logger.warning("AI warm-up not started: could not import llm_service: %s", e)
+        return False
+
+
+def ai_readiness() -> Dict[str, Any]:
+    """Which llm_service resources are loaded; AI explanations are skipped until the LLM client is."""
+    try:
+        return _llm_service().resource_status()
+    except Exception as e:
+        return {"ai_enabled": False, "ready": False, "error": str(e)}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one in-flight task; every caller
+    gets (a copy of) the same result. The shared task is shielded, so a caller timing out
+    or disconnecting does not cancel the generation the others are waiting on.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.join(key)
+        if task is None:
+            task = self._track(key, asyncio.ensure_future(factory()))
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """The in-flight task for `key` (counted as coalesced), or None."""
+        task = self._in_flight.get(key)
+        if task is None or task.done():
+            return None
+        self.coalesced += 1
+        logger.info("Joining in-flight explanation %s", key[:12])
+        return task
+
+    def begin(self, key: str) -> asyncio.Future:
+        """Register a generation driven by the caller, who must resolve the returned future."""
+        return self._track(key, asyncio.get_running_loop().create_future())
+
+    def _track(self, key: str, task: asyncio.Future) -> asyncio.Future:
+        self._in_flight[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved; callers already saw it
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "generations": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / calls, 3) if calls else None,
+        }
+
+
+_single_flight = SingleFlight()
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    return _single_flight.stats()
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    """Groq call scheduler counters (queue depth, rate-limit budget, retries, waits)."""
+    return _llm_service().get_scheduler().stats()
+
+
+@lru_cache(maxsize=1)
+def get_explanation_cache() -> Optional[ExplanationCache]:
+    """Process-wide explanation cache, or None when EXPLANATION_CACHE_ENABLED is false."""
+    if os.getenv("EXPLANATION_CACHE_ENABLED", "true").strip().lower() != "true":
+        return None
+    llm_service = _llm_service()
+    return ExplanationCache(
+        prompt_version=llm_service.PROMPT_VERSION,
+        model=llm_service.GROQ_MODEL,
+        max_entries=int(os.getenv("EXPLANATION_CACHE_SIZE", 1024)),
+        ttl_seconds=float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+        persist=os.getenv("EXPLANATION_CACHE_PERSIST", "false").strip().lower() == "true",
+    )
+
+
+def _uncached_key(decision: Dict[str, Any], patient_ctx: Dict[str, Any]) -> str:
+    """
+    Single-flight key without the explanation cache: the text quotes the exact readings,
+    so only concurrent requests with the same readings share a generation.
+    """
+    llm_service = _llm_service()
+    key = make_explanation_key(decision, patient_ctx, llm_service.PROMPT_VERSION, llm_service.GROQ_MODEL)
+    vitals = json.dumps(llm_service.exact_vitals(patient_ctx), sort_keys=True, default=str)
+    return f"{key}:{hashlib.sha256(vitals.encode('utf-8')).hexdigest()[:16]}"
+
+
+async def generate_explanation_cached(decision: Dict[str, Any], patient_ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    llm_service.agenerate_explanation() behind the explanation cache, with concurrent
+    requests for the same cache key sharing one in-flight generation. The key buckets
+    the patient context, so text that goes into the cache is generated from
+    banded_vitals(); with the cache disabled it quotes the patient's exact readings.
+    """
+    llm_service = _llm_service()
+    if not llm_service.ENABLE_AI or decision.get("_force_no_context"):
+        return await llm_service.agenerate_explanation(decision, patient_ctx)
+
+    cache = get_explanation_cache()
+    if cache is None:
+        return await _single_flight.do(
+            _uncached_key(decision, patient_ctx), lambda: llm_service.agenerate_explanation(decision, patient_ctx)
+        )
+
+    key = cache.key_for(decision, patient_ctx)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached
+
+    async def generate_and_store():
+        raw = await llm_service.agenerate_explanation(decision, patient_ctx, banded_vitals(patient_ctx))
+        await cache.aput(key, raw)
+        return raw
+
+    return await _single_flight.do(key, generate_and_store)
+
+
+_background_streams: set = set()
+
+
+def _stream_finished(task: asyncio.Future) -> None:
+    _background_streams.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Streamed AI explanation failed: %s", task.exception())
+
+
+def _replay_events(raw: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Stream events for an already finished explanation (cache hit / joined generation)."""
+    events = [("sources", {
+        "sources": raw.get("sources") or [],
+        "rag_grounded": raw.get("rag_grounded", False),
+        "chunks_used": raw.get("chunks_used", 0),
+    })]
+    for section in ("clinician", "patient", "clinician_summary", "patient_summary"):
+        field = section if section.endswith("_summary") else f"{section}_explanation"
+        events.append(("section", {"section": section, "text": raw.get(field) or ""}))
+    events.append(("result", raw))
+    return events
+
+
+async def stream_explanation_cached(
+    decision: Dict[str, Any], patient_ctx: Dict[str, Any]
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    generate_explanation_cached() as llm_service.astream_explanation() events.
+
+    Cache hits and requests that join an in-flight generation replay the finished
+    sections. A new generation runs in its own task, so a client disconnecting
+    mid-stream does not stop it: the assembled result is still cached and handed to
+    any concurrent callers waiting on the same key.
+    """
+    llm_service = _llm_service()
+    if not llm_service.ENABLE_AI or decision.get("_force_no_context"):
+        async for event in llm_service.astream_explanation(decision, patient_ctx):
+            yield event
+        return
+
+    cache = get_explanation_cache()
+    if cache is not None:
+        key = cache.key_for(decision, patient_ctx)
+        finished = await cache.aget(key)
+    else:
+        key = _uncached_key(decision, patient_ctx)
+        finished = None
+    if finished is None:
+        in_flight = _single_flight.join(key)
+        if in_flight is not None:
+            finished = copy.deepcopy(await asyncio.shield(in_flight))
+    if finished is not None:
+        for event in _replay_events(finished):
+            yield event
+        return
+
+    events: asyncio.Queue = asyncio.Queue()
+    shared = _single_flight.begin(key)
+    vitals = banded_vitals(patient_ctx) if cache is not None else None
+
+    async def generate():
+        try:
+            result = None
+            async for event in llm_service.astream_explanation(decision, patient_ctx, vitals):
+                events.put_nowait(event)
+                if event[0] == "result":
+                    result = event[1]
+            if cache is not None and result is not None:
+                await cache.aput(key, result)
+            shared.set_result(result)
+        except BaseException as e:
+            if not shared.done():
+                shared.set_exception(e if isinstance(e, Exception) else RuntimeError("explanation stream cancelled"))
+            raise
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.ensure_future(generate())
+    _background_streams.add(task)
+    task.add_done_callback(_stream_finished)
+
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield event
+    await asyncio.shield(task)  # re-raises a failed generation
+
+
+def explanation_payload(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """The subset of a generate_explanation() result stored on recommendations."""
+    return {
+        "clinician_summary": raw.get("clinician_summary") or "",
+        "clinician_explanation": raw.get("clinician_explanation") or "",
+        "patient_summary": raw.get("patient_summary") or "",
+        "patient_explanation": raw.get("patient_explanation") or "",
+        "sources": raw.get("sources") or [],
+    }
+
+
+async def explain_decisions(
+    decisions: List[Dict[str, Any]],
+    patient_ctx: Dict[str, Any],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Generate explanations for every decision of a visit concurrently.
+
+    At most `concurrency` decisions (AI_EXPLANATION_CONCURRENCY, default 4) are in flight
+    at once, each bounded by `timeout` seconds (AI_EXPLANATION_TIMEOUT, default 120).
+    The result is aligned by decision index; a decision that fails or times out gets
+    None without affecting the others.
+    """
+    if not decisions:
+        return []
+    concurrency = concurrency or int(os.getenv("AI_EXPLANATION_CONCURRENCY", 4))
+    timeout = timeout or float(os.getenv("AI_EXPLANATION_TIMEOUT", 120))
+
+    try:
+        _llm_service()
+    except Exception as e:
+        logger.warning("AI explanation skipped: could not import llm_service: %s", e)
+        return [None] * len(decisions)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def explain_one(index: int, decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                raw = await asyncio.wait_for(generate_explanation_cached(decision, patient_ctx), timeout)
+                if not raw.get("ai_enabled"):
+                    return None  # still warming up: leave it for the next read to retry
+                return explanation_payload(raw)
+            except asyncio.TimeoutError:
+                logger.warning("AI explanation timed out after %.0fs for decision %s (%s)",
+                               timeout, index, decision.get("diagnosis"))
+            except Exception as e:
+                logger.warning("AI explanation failed for decision %s (%s): %s", index, decision.get("diagnosis"), e)
+            return None
+
+    logger.info("AI explanation generation started for %s decision(s), concurrency %s", len(decisions), concurrency)
+    results = await asyncio.gather(*(explain_one(i, d) for i, d in enumerate(decisions)))
+    logger.info("AI explanation generation finished: %s/%s succeeded",
+                sum(1 for r in results if r is not None), len(decisions))
+    return list(results)
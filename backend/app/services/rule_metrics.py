@@ -0,0 +1,73 @@
+import threading
+from typing import Any, Dict, Optional
+
+
+class RuleMetrics:
+    """
+    Aggregate per-rule firing frequency and consequence latency across evaluations.
+
+    Fed from the `ruleTrace` the engine attaches to each output; only real engine runs
+    are recorded, so decision-cache hits do not inflate the counts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.evaluations_without_firing = 0
+        self.fire_all_rules_ms_total = 0.0
+        self._rules: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, rule_trace: Optional[Dict[str, Any]]) -> None:
+        if not rule_trace:
+            return
+        with self._lock:
+            self.evaluations += 1
+            if not rule_trace.get("rulesFired"):
+                self.evaluations_without_firing += 1
+            self.fire_all_rules_ms_total += rule_trace.get("fireAllRulesMs") or 0.0
+            for firing in rule_trace.get("rules") or []:
+                stats = self._rules.setdefault(
+                    firing["rule"],
+                    {"package": firing.get("package"), "activations": 0, "fired": 0, "patients": 0,
+                     "time_ms_total": 0.0, "time_ms_max": 0.0},
+                )
+                fired = firing.get("fired", 0)
+                time_ms = firing.get("timeMs", 0.0)
+                stats["activations"] += firing.get("activations", 0)
+                stats["fired"] += fired
+                stats["time_ms_total"] += time_ms
+                if fired:
+                    stats["patients"] += 1
+                    stats["time_ms_max"] = max(stats["time_ms_max"], time_ms / fired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rules = []
+            for name, stats in self._rules.items():
+                fired = stats["fired"]
+                rules.append({
+                    "rule": name,
+                    "package": stats["package"],
+                    "activations": stats["activations"],
+                    "fired": fired,
+                    "fire_rate": round(stats["patients"] / self.evaluations, 3) if self.evaluations else None,
+                    "avg_ms": round(stats["time_ms_total"] / fired, 4) if fired else None,
+                    "max_ms": round(stats["time_ms_max"], 4),
+                    "total_ms": round(stats["time_ms_total"], 3),
+                })
+            rules.sort(key=lambda r: r["fired"], reverse=True)
+            return {
+                "evaluations": self.evaluations,
+                "evaluations_without_firing": self.evaluations_without_firing,
+                "avg_fire_all_rules_ms": (
+                    round(self.fire_all_rules_ms_total / self.evaluations, 3) if self.evaluations else None
+                ),
+                "rules": rules,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.evaluations = 0
+            self.evaluations_without_firing = 0
+            self.fire_all_rules_ms_total = 0.0
+            self._rules.clear()
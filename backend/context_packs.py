@@ -0,0 +1,116 @@
+# context_packs.py
+# Precomputed guideline context per retrieval query. For a fixed corpus the RAG
+# retrieval of a diagnosis/stage (embed, filtered + unfiltered Qdrant search,
+# dedup by source+page) always returns the same chunks, so they are computed once
+# for every pair the rules can emit and served from memory afterwards.
+#
+# A pack file records the corpus version it was built against plus the retrieval
+# parameters; it is only served while both still match the live collection.
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PACK_SCHEMA_VERSION = 1
+
+
+class ContextPacks:
+    """
+    query -> (chunks, sources) table persisted as one JSON file.
+
+    lookup() is a dict read; build() runs `retrieve` for every query and swaps the
+    whole table (and file) in at once, so readers never see a half-built set. An
+    exception from `retrieve` aborts the build and leaves the current packs in place.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._packs: Dict[str, dict] = {}
+        self.meta: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("schema_version") != PACK_SCHEMA_VERSION:
+                return
+            self._packs = data.get("packs", {})
+            self.meta = {k: v for k, v in data.items() if k != "packs"}
+        except Exception as e:
+            print(f"  Could not read context packs at {self.path}: {e}")
+
+    @property
+    def corpus_version(self) -> Optional[str]:
+        return self.meta.get("corpus_version")
+
+    def matches(self, corpus_version: Optional[str], params: dict) -> bool:
+        return (
+            bool(self._packs)
+            and corpus_version is not None
+            and self.meta.get("corpus_version") == corpus_version
+            and self.meta.get("params") == params
+        )
+
+    def lookup(self, query: str, params: dict) -> Optional[Tuple[List[str], List[str]]]:
+        """Chunks and source labels for `query`, or None (unseen query or other parameters)."""
+        pack = self._packs.get(query) if self.meta.get("params") == params else None
+        with self._lock:
+            if pack is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return list(pack["chunks"]), list(pack["sources"])
+
+    def build(
+        self,
+        queries: Iterable[str],
+        retrieve: Callable[[str], Tuple[List[str], List[str]]],
+        corpus_version: str,
+        params: dict,
+    ) -> int:
+        started = time.monotonic()
+        packs = {}
+        for query in sorted(set(queries)):
+            chunks, sources = retrieve(query)
+            packs[query] = {"chunks": chunks, "sources": sources}
+        meta = {
+            "schema_version": PACK_SCHEMA_VERSION,
+            "corpus_version": corpus_version,
+            "params": params,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "build_seconds": round(time.monotonic() - started, 2),
+        }
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Every worker builds at warm-up: a per-process temp file, last replace wins
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**meta, "packs": packs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        with self._lock:
+            self._packs, self.meta = packs, meta
+            self.builds += 1
+        return len(packs)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "packs": len(self._packs),
+            "corpus_version": self.meta.get("corpus_version"),
+            "built_at": self.meta.get("built_at"),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "builds": self.builds,
+            "path": self.path,
+        }
@@ -9,6 +9,8 @@ from .appointment       import Appointment, AppointmentStatus
 from .test_result       import TestResult, TestStatus
 from .prescription      import Prescription, PrescriptionStatus, PrescriptionSource
 from .cds_recommendation import CDSRecommendation
+from .decision_cache    import CDSDecisionCache
+from .explanation_cache import CDSExplanationCache
 
 __all__ = [
     "Base",
@@ -18,4 +20,6 @@ __all__ = [
     "TestResult", "TestStatus",
     "Prescription", "PrescriptionStatus", "PrescriptionSource",
     "CDSRecommendation",
+    "CDSDecisionCache",
+    "CDSExplanationCache",
 ]
\ No newline at end of file
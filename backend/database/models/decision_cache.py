@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, JSON, String, func
+
+from . import Base
+
+
+class CDSDecisionCache(Base):
+    """Persisted rule-engine outputs keyed on the canonical engine input and rule-set version."""
+
+    __tablename__ = "cds_decision_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 of canonical input + ruleset version
+    ruleset_version = Column(String, nullable=False, index=True)
+    engine_output = Column(JSON, nullable=False)  # raw DroolsJsonRunner output
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, JSON, String, func
+
+from . import Base
+
+
+class CDSExplanationCache(Base):
+    """Persisted AI explanations keyed on decision content, patient-context bucket, prompt version and model."""
+
+    __tablename__ = "cds_explanation_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 of normalized decision + context bucket + versions
+    prompt_version = Column(String, nullable=False, index=True)
+    model = Column(String, nullable=False)
+    explanation = Column(JSON, nullable=False)  # generate_explanation() result
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
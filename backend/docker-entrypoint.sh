@@ -0,0 +1,18 @@
+#!/bin/sh
+# Starts the shared embedding service next to uvicorn when EMBEDDING_SERVICE_SOCKET is
+# set, so all UVICORN_WORKERS use one model instead of loading a copy each. The
+# service is restarted whenever it exits (failed model load, crash); workers that
+# cannot reach it within EMBEDDING_SERVICE_WAIT_SECONDS load their own model.
+set -e
+
+if [ -n "$EMBEDDING_SERVICE_SOCKET" ]; then
+    (
+        while true; do
+            python embedding_service.py --socket "$EMBEDDING_SERVICE_SOCKET" || true
+            echo "embedding service exited; restarting in ${EMBEDDING_SERVICE_RESTART_SECONDS:-5}s" >&2
+            sleep "${EMBEDDING_SERVICE_RESTART_SECONDS:-5}"
+        done
+    ) &
+fi
+
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "${UVICORN_WORKERS:-1}"
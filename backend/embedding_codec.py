@@ -0,0 +1,97 @@
+# embedding_codec.py
+# Matryoshka truncation and quantization of nomic-embed-text-v1.5 vectors, shared by
+# indexing (scripts/index_corpus.py), the local index and query-time retrieval so all
+# three always agree on the representation.
+#
+#   dim           768 (full) or a Matryoshka size: 512, 256, 128, 64
+#   quantization  none   float32
+#                 int8   per-dimension symmetric scales (4x smaller)
+#                 binary sign bits for a fast Hamming first pass, shortlist rescored
+#                        with the int8 codes so scores stay on the cosine scale; it
+#                        stores both, so it speeds up search but is slightly larger
+#                        than int8 (see bytes_per_vector)
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+FULL_DIM = 768
+SUPPORTED_DIMS = (64, 128, 256, 512, 768)
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Binary first pass keeps this many candidates per requested hit for int8 rescoring
+BINARY_RESCORE_FACTOR = 4
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def validate(dim: int, quantization: str) -> Tuple[int, str]:
+    dim, quantization = int(dim), (quantization or "none").strip().lower()
+    if dim not in SUPPORTED_DIMS:
+        raise ValueError(f"embedding dim {dim} not supported (choose from {SUPPORTED_DIMS})")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"embedding quantization {quantization!r} not supported (choose from {QUANTIZATIONS})")
+    return dim, quantization
+
+
+def matryoshka(vectors, dim: int = FULL_DIM) -> np.ndarray:
+    """
+    L2-normalized vectors of `dim` dimensions. Below the full size this is the nomic
+    Matryoshka recipe (layer norm over the full vector, truncate, normalize); at full
+    size it is plain normalization, i.e. the cosine scale retrieval has always used.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    single = vectors.ndim == 1
+    vectors = np.atleast_2d(vectors)
+    if dim < vectors.shape[1]:
+        mean = vectors.mean(axis=1, keepdims=True)
+        var = vectors.var(axis=1, keepdims=True)
+        vectors = ((vectors - mean) / np.sqrt(var + 1e-5))[:, :dim]
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors[0] if single else vectors
+
+
+def int8_scales(vectors: np.ndarray) -> np.ndarray:
+    """Per-dimension factors mapping the observed range onto [-127, 127]."""
+    return (127.0 / np.maximum(np.abs(vectors).max(axis=0), 1e-6)).astype(np.float32)
+
+
+def to_int8(vectors: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(vectors * scales), -127, 127).astype(np.int8)
+
+
+def to_bits(vectors: np.ndarray) -> np.ndarray:
+    return np.packbits(np.atleast_2d(vectors) > 0, axis=-1)
+
+
+def encode_documents(vectors, dim: int, quantization: str) -> Dict[str, np.ndarray]:
+    """Arrays to store for a corpus: `vectors` (float32 or int8), plus `scales` / `bits` as needed."""
+    dim, quantization = validate(dim, quantization)
+    vectors = matryoshka(vectors, dim)
+    if quantization == "none":
+        return {"vectors": vectors}
+    scales = int8_scales(vectors)
+    arrays = {"vectors": to_int8(vectors, scales), "scales": scales}
+    if quantization == "binary":
+        arrays["bits"] = to_bits(vectors)
+    return arrays
+
+
+def scores(arrays: Dict[str, np.ndarray], query: np.ndarray, rows=None) -> np.ndarray:
+    """Cosine-scale similarity of a prepared (matryoshka) query with `rows` (default: all)."""
+    vectors = arrays["vectors"] if rows is None else arrays["vectors"][rows]
+    if "scales" not in arrays:
+        return vectors @ query
+    # int8 codes: fold the dequantization into the query instead of the matrix
+    return vectors.astype(np.float32) @ (query / arrays["scales"])
+
+
+def hamming(arrays: Dict[str, np.ndarray], query: np.ndarray, rows) -> np.ndarray:
+    """Hamming distance between the query's sign bits and the stored bits of `rows`."""
+    return _POPCOUNT[np.bitwise_xor(arrays["bits"][rows], to_bits(query)[0])].sum(axis=1, dtype=np.int32)
+
+
+def bytes_per_vector(dim: int, quantization: str) -> int:
+    if quantization == "none":
+        return dim * 4
+    return dim + (dim // 8 if quantization == "binary" else 0)
@@ -0,0 +1,328 @@
+# embedding_memo.py
+# Memoized query embeddings for RAG retrieval: a process-level LRU in front of an
+# on-disk, memory-mapped vector store. The retrieval query only depends on the
+# decision's diagnosis and stage, and the rules can only emit a small, fixed set of
+# those — rule_diagnosis_stages() enumerates them from the DRL setDiagnosis/setStage
+# calls so the store can be prefilled and steady-state retrieval never encodes.
+
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, the store is only safe with a single worker there
+    fcntl = None
+
+STORE_SCHEMA_VERSION = 1
+
+_RULE_BLOCK = re.compile(r'^\s*rule\s+"[^"]*"(.*?)^\s*end\b', re.S | re.M)
+_SET_CALL = re.compile(r"\.set(Diagnosis|Stage)\((.*?)\);")
+_ASSIGNMENT = re.compile(r'\b([A-Za-z_]\w*)\s*=\s*"((?:[^"\\]|\\.)*)"\s*;')
+_LHS_DIAGNOSIS = re.compile(r'\bdiagnosis\s*==\s*"((?:[^"\\]|\\.)*)"')
+_EXPRESSION_TOKEN = re.compile(r'\s*(?:"((?:[^"\\]|\\.)*)"|([A-Za-z_]\w*)|(\+))\s*')
+
+
+def _expand(expression: str, assignments: dict) -> List[str]:
+    """
+    Every value of a Java string expression built from literals and local variables
+    joined with + (variables expand to each literal assigned to them in the rule).
+    Empty when the expression is not statically known.
+    """
+    values, position = [""], 0
+    while position < len(expression):
+        match = _EXPRESSION_TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            return []
+        literal, name, plus = match.groups()
+        position = match.end()
+        if plus:
+            continue
+        if literal is not None:
+            options = [literal]
+        elif name in assignments:
+            options = sorted(assignments[name])
+        else:
+            return []
+        values = [value + option for value in values for option in options]
+    return values
+
+
+def rule_diagnosis_stages(paths: Iterable[str]) -> Set[Tuple[str, str]]:
+    """(diagnosis, stage) pairs the rules in `paths` can produce, over-approximated per rule."""
+    pairs: Set[Tuple[str, str]] = set()
+    all_diagnoses: Set[str] = set()
+    orphan_stages: Set[str] = set()  # stages set on a decision matched without a literal diagnosis
+
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        for block in _RULE_BLOCK.findall(source):
+            assignments: dict = {}
+            for name, value in _ASSIGNMENT.findall(block):
+                assignments.setdefault(name, set()).add(value)
+            diagnoses, stages = set(_LHS_DIAGNOSIS.findall(block)), set()
+            for field, expression in _SET_CALL.findall(block):
+                (diagnoses if field == "Diagnosis" else stages).update(_expand(expression, assignments))
+            all_diagnoses.update(diagnoses)
+            if diagnoses:
+                pairs.update((d, s) for d in diagnoses for s in (stages or {""}))
+            else:
+                orphan_stages.update(stages)
+
+    pairs.update((d, s) for d in all_diagnoses for s in orphan_stages)
+    return pairs
+
+
+def rule_files() -> List[str]:
+    """DRL files of the bundled rules (source or built classes) and of every CDS_RULES_DIR version."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    roots = [
+        os.path.join(backend_dir, "..", "drools-engine", "src", "main", "resources"),
+        os.path.join(backend_dir, "drools-engine", "target", "classes"),
+        os.path.join(backend_dir, "..", "drools-engine", "target", "classes"),
+    ]
+    if os.getenv("CDS_RULES_DIR"):
+        roots.append(os.getenv("CDS_RULES_DIR"))
+    files = set()
+    for root in roots:
+        files.update(os.path.realpath(p) for p in glob.glob(os.path.join(root, "**", "*.drl"), recursive=True))
+    return sorted(files)
+
+
+class EmbeddingMemo:
+    """
+    text -> embedding memo for one embedding model.
+
+    Lookups go LRU (process memory) -> memory-mapped store on disk -> `encode`.
+    Newly encoded vectors are kept in memory and written to the store on flush():
+    prefill() encodes everything missing in one batch and flushes, get() schedules a
+    flush within `flush_interval` seconds. The store is keyed on the model name, so
+    switching models starts a fresh store.
+
+    On disk, index.json names the vectors file it belongs to; every flush writes a new
+    vectors-<generation>.npy and then swaps index.json, so a reader (another worker)
+    never pairs an index with the wrong vectors. Workers share the directory: flushes
+    hold an exclusive flock on .lock for read-index -> write -> swap -> cleanup, and
+    opening the store holds it shared.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], "np.ndarray"],
+        model_name: str,
+        directory: Optional[str] = None,
+        max_entries: int = 2048,
+        flush_interval: float = 30.0,
+    ):
+        self._encode = encode
+        self.model_name = model_name
+        self.directory = directory
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk_index: dict = {}
+        self._disk: Optional[np.ndarray] = None
+        self._vectors_file: Optional[str] = None
+        self._lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.encoded = 0
+        self._open()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _read_index(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.directory, "index.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def _store_lock(self, exclusive: bool):
+        """Inter-process lock on the store directory (flock on its .lock file)."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open(self) -> None:
+        if not self.directory or not os.path.exists(os.path.join(self.directory, "index.json")):
+            return
+        try:
+            with self._store_lock(exclusive=False):
+                self._load(self._read_index())
+        except OSError as e:
+            print(f"  Could not open embedding store at {self.directory}: {e}")
+
+    def _load(self, index: Optional[dict]) -> None:
+        """Map the vectors file `index` names; the caller holds the store lock."""
+        if index is None:
+            return
+        try:
+            if index.get("schema_version") != STORE_SCHEMA_VERSION or index.get("model") != self.model_name:
+                print(f"  Embedding store at {self.directory} is for another model — ignoring it")
+                return
+            vectors_file = index.get("vectors", "vectors.npy")
+            disk = np.load(os.path.join(self.directory, vectors_file), mmap_mode="r")
+            if disk.shape[0] != len(index["keys"]):
+                print(f"  Embedding store at {self.directory} is inconsistent — ignoring it")
+                return
+            self._disk, self._vectors_file = disk, vectors_file
+            self._disk_index = {key: row for row, key in enumerate(index["keys"])}
+        except Exception as e:
+            print(f"  Could not open embedding store at {self.directory}: {e}")
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+        row = self._disk_index.get(key)
+        if row is not None:
+            vector = np.array(self._disk[row], dtype=np.float32)
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+        return None
+
+    def get(self, text: str) -> np.ndarray:
+        """Embedding of `text` (a copy; callers may modify it)."""
+        key = self._key(text)
+        with self._lock:
+            vector = self._lookup(key)
+        if vector is None:
+            vector = np.asarray(self._encode([text])[0], dtype=np.float32)
+            with self._lock:
+                self.encoded += 1
+                self._remember(key, vector)
+                self._pending[key] = vector
+                self._schedule_flush()
+        return vector.copy()
+
+    def _schedule_flush(self) -> None:
+        """Flush get()'s new vectors off the request path, at most once per flush_interval."""
+        if not self.directory or (self._flush_timer is not None and self._flush_timer.is_alive()):
+            return
+        self._flush_timer = threading.Timer(self.flush_interval, self._background_flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _background_flush(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"  Embedding store flush failed: {e}")
+
+    def prefill(self, texts: Iterable[str], batch_size: int = 32) -> int:
+        """Encode every text not yet memoized (one batched call), then flush. Returns the number encoded."""
+        with self._lock:
+            missing = {
+                self._key(t): t for t in texts
+                if self._key(t) not in self._lru and self._key(t) not in self._disk_index
+                and self._key(t) not in self._pending
+            }
+        if missing:
+            vectors = np.asarray(self._encode(list(missing.values()), batch_size=batch_size), dtype=np.float32)
+            with self._lock:
+                self.encoded += len(missing)
+                for key, vector in zip(missing, vectors):
+                    self._remember(key, vector)
+                    self._pending[key] = vector
+        self.flush()
+        return len(missing)
+
+    def flush(self) -> None:
+        """
+        Append pending vectors to the on-disk store: a new generation of the vectors file,
+        then index.json swapped in atomically (the one commit point), then re-mapped.
+        """
+        if not self.directory:
+            return
+        with self._lock:
+            if not self._pending:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with self._store_lock(exclusive=True):
+                self._commit()
+
+    def _commit(self) -> None:
+        """flush() under the store lock: merge with the current generation, write the next one."""
+        # Another worker may have flushed since we opened: start from its generation
+        index = self._read_index()
+        if index is not None and index.get("vectors", "vectors.npy") != self._vectors_file:
+            self._load(index)
+        pending = {k: v for k, v in self._pending.items() if k not in self._disk_index}
+        keys = list(self._disk_index) + list(pending)
+        rows = [np.asarray(self._disk)] if self._disk is not None and len(self._disk_index) else []
+        if pending:
+            rows.append(np.stack(list(pending.values())))
+        vectors = np.concatenate(rows).astype(np.float32, copy=False)
+
+        vectors_file = f"vectors-{time.time_ns()}-{os.getpid()}.npy"
+        with open(os.path.join(self.directory, vectors_file), "wb") as f:
+            np.save(f, vectors)
+        index_path = os.path.join(self.directory, "index.json")
+        with open(index_path + f".{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"schema_version": STORE_SCHEMA_VERSION, "model": self.model_name,
+                       "dim": int(vectors.shape[1]), "vectors": vectors_file, "keys": keys}, f)
+        os.replace(index_path + f".{os.getpid()}.tmp", index_path)
+
+        self._disk = np.load(os.path.join(self.directory, vectors_file), mmap_mode="r")
+        self._vectors_file = vectors_file
+        self._disk_index = {key: row for row, key in enumerate(keys)}
+        self._pending.clear()
+        self._remove_old_generations(keep=vectors_file)
+
+    def _remove_old_generations(self, keep: str) -> None:
+        """
+        Drop the vectors files index.json no longer names. Runs under the exclusive store
+        lock, so no worker is between reading the index and mapping its file; workers that
+        mapped an older generation keep reading it (an unlinked file stays mapped).
+        """
+        for path in glob.glob(os.path.join(self.directory, "vectors*.npy")):
+            if os.path.basename(path) != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.encoded
+        return {
+            "memory_entries": len(self._lru),
+            "disk_entries": len(self._disk_index),
+            "pending": len(self._pending),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "encoded": self.encoded,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "directory": self.directory,
+        }
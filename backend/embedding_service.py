@@ -0,0 +1,297 @@
+# embedding_service.py
+# Shared embedding process: holds the one SentenceTransformer for every uvicorn
+# worker and answers encode requests over a Unix socket. Concurrent requests are
+# collected into micro-batches (up to EMBEDDING_MAX_BATCH texts, waiting at most
+# EMBEDDING_BATCH_WINDOW_MS for company) and encoded in one model call.
+#
+#   python embedding_service.py --socket /tmp/cds-embed.sock
+#
+# llm_service uses EmbeddingClient instead of loading the model when
+# EMBEDDING_SERVICE_SOCKET is set.
+#
+# Wire format: every message is a 4-byte big-endian length + body. Requests are JSON
+# ({"op": "encode", "texts": [...]}, {"op": "stats"}, {"op": "ping"}); replies are a
+# JSON header frame, followed for encode by one frame of little-endian float32 rows.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import struct
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+_LENGTH = struct.Struct(">I")
+
+
+# =============================================================
+# FRAMING
+# =============================================================
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+def _frame(body: bytes) -> bytes:
+    return _LENGTH.pack(len(body)) + body
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            raise ConnectionError("embedding service closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, length)
+
+
+# =============================================================
+# SERVER
+# =============================================================
+
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))], 3)
+
+
+class MicroBatcher:
+    """Collects concurrent submit() calls into batches for one `encode(texts)` call at a time."""
+
+    def __init__(self, encode, max_batch: int = 32, window_ms: float = 5.0, history: int = 1000):
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.failures = 0
+        self._batch_sizes = deque(maxlen=history)
+        self._queue_ms = deque(maxlen=history)
+        self._encode_ms = deque(maxlen=history)
+
+    async def submit(self, texts: List[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self._queue.put((texts, future, time.perf_counter()))
+        return await future
+
+    async def run(self) -> None:
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(item)
+                size += len(item[0])
+
+            started = time.perf_counter()
+            self._queue_ms.extend((started - enqueued) * 1000 for _, _, enqueued in batch)
+            texts = [text for item_texts, _, _ in batch for text in item_texts]
+            try:
+                vectors = await asyncio.to_thread(self._encode, texts)
+            except Exception as e:
+                self.failures += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self._encode_ms.append((time.perf_counter() - started) * 1000)
+            self.batches += 1
+            self.texts += len(texts)
+            self._batch_sizes.append(len(texts))
+
+            offset = 0
+            for item_texts, future, _ in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def stats(self) -> dict:
+        sizes = list(self._batch_sizes)
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "failures": self.failures,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch": self.max_batch,
+            "window_ms": self.window * 1000,
+            "batch_size_mean": round(statistics.fmean(sizes), 2) if sizes else None,
+            "batch_size_p95": _percentile(sizes, 95),
+            "batch_size_max": max(sizes) if sizes else None,
+            "queue_ms_p50": _percentile(self._queue_ms, 50),
+            "queue_ms_p95": _percentile(self._queue_ms, 95),
+            "encode_ms_p50": _percentile(self._encode_ms, 50),
+            "encode_ms_p95": _percentile(self._encode_ms, 95),
+        }
+
+
+async def _handle(batcher: MicroBatcher, model_name: str, runtime: str, reader, writer) -> None:
+    try:
+        while True:
+            try:
+                request = json.loads(await _read_frame(reader))
+            except asyncio.IncompleteReadError:
+                return
+            op = request.get("op")
+            if op == "encode":
+                try:
+                    vectors = await batcher.submit([str(t) for t in request.get("texts", [])])
+                except Exception as e:
+                    writer.write(_frame(json.dumps({"error": str(e)}).encode("utf-8")))
+                else:
+                    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+                    writer.write(_frame(json.dumps({"shape": list(vectors.shape)}).encode("utf-8")))
+                    writer.write(_frame(vectors.tobytes()))
+            elif op == "stats":
+                writer.write(_frame(json.dumps({"model": model_name, "runtime": runtime, **batcher.stats()}).encode("utf-8")))
+            else:
+                writer.write(_frame(json.dumps({"ok": True, "model": model_name, "runtime": runtime}).encode("utf-8")))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: str, max_batch: int, window_ms: float) -> None:
+    from llm_service import EMBEDDING_MODEL, embedder_runtime, load_local_embedder
+
+    runtime = embedder_runtime()
+    print(f"Loading {EMBEDDING_MODEL} ({runtime})...")
+    model = load_local_embedder()
+    batcher = MicroBatcher(
+        lambda texts: np.asarray(model.encode(texts, batch_size=max_batch), dtype=np.float32),
+        max_batch=max_batch,
+        window_ms=window_ms,
+    )
+    batcher_task = asyncio.create_task(batcher.run())
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = await asyncio.start_unix_server(
+        lambda r, w: _handle(batcher, EMBEDDING_MODEL, runtime, r, w), path=socket_path
+    )
+    os.chmod(socket_path, 0o660)
+    print(f"✓ Embedding service listening on {socket_path} (max batch {max_batch}, window {window_ms} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# =============================================================
+# CLIENT
+# =============================================================
+
+class EmbeddingClient:
+    """
+    Blocking client with SentenceTransformer's encode() signature, so llm_service can use
+    it wherever it used the local model. One connection per thread, reconnected on error.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, request: dict, with_body: bool = False):
+        for attempt in (1, 2):  # one reconnect (service restarted, stale connection)
+            try:
+                sock = self._connection()
+                sock.sendall(_frame(json.dumps(request).encode("utf-8")))
+                header = json.loads(_recv_frame(sock))
+                body = _recv_frame(sock) if with_body and "error" not in header else None
+                break
+            except (OSError, ConnectionError):
+                self._drop()
+                if attempt == 2:
+                    raise
+        if "error" in header:
+            raise RuntimeError(f"embedding service: {header['error']}")
+        return header, body
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        header, body = self._call({"op": "encode", "texts": texts}, with_body=True)
+        vectors = np.frombuffer(body, dtype="<f4").reshape(header["shape"])
+        return vectors[0] if single else vectors
+
+    def ping(self) -> dict:
+        return self._call({"op": "ping"})[0]
+
+    def stats(self) -> dict:
+        return self._call({"op": "stats"})[0]
+
+    def wait_until_ready(self, timeout: float) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.ping()
+            except (OSError, ConnectionError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared micro-batching embedding service")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVICE_SOCKET", "/tmp/cds-embed.sock"))
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("EMBEDDING_MAX_BATCH", 32)))
+    parser.add_argument("--window-ms", type=float, default=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5)))
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket, args.max_batch, args.window_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# lexical_index.py
+# BM25 inverted index over the RAG corpus chunks, for the exact terms dense retrieval
+# tends to miss: drug names ("Amlodipine"), lab abbreviations ("HbA1c") and
+# thresholds ("eGFR <30"). Written by scripts/index_corpus.py next to the vector
+# indexes with the same row ids (chunk i = Qdrant point i = local index row i), so
+# llm_service can fuse both rankings by reciprocal rank.
+#
+# On disk: the vocabulary (terms.json, sorted) and CSR postings — offsets.npy into
+# doc_ids.npy / tfs.npy — plus per-chunk lengths and the retrieval payloads, written as
+# one generation swapped in atomically (local_index.write_generation()).
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from local_index import PAYLOAD_FIELDS, LocalHit, index_generation, write_generation
+
+INDEX_SCHEMA_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal-rank fusion constant (the usual 60: damps the head of each ranking)
+RRF_K = 60
+
+_ARRAY_NAMES = ("offsets", "doc_ids", "tfs", "doc_lengths")
+# Comparator + number stays one token ("<30", ">=140") besides the bare number
+_TOKEN = re.compile(r"(?:[<>]=?|[≤≥])\s*\d+(?:\.\d+)?|[a-z0-9]+(?:\.\d+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if token[0] in "<>≤≥":
+            token = token.replace("≤", "<=").replace("≥", ">=").replace(" ", "")
+            tokens.append(token)
+            tokens.append(token.lstrip("<>="))
+        elif token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class LexicalHit(LocalHit):
+    """A BM25 hit; `coverage` is the share of the query's IDF weight the chunk matches."""
+
+    __slots__ = ("coverage",)
+
+    def __init__(self, id: int, score: float, payload: dict, coverage: float):
+        super().__init__(id, score, payload)
+        self.coverage = coverage
+
+    @property
+    def label(self) -> str:
+        return f"lexical, bm25 {self.score:.1f}"
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """(id, fused score) over several rankings of ids, best first; ties keep first-seen order."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, 1):
+            fused[id] = fused.get(id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+class LexicalIndex:
+    """Read-only BM25 index loaded from the current generation of `directory`; see build() for the writer."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.generation = index_generation(directory)
+        if self.generation is None:
+            raise FileNotFoundError(f"no lexical index at {directory}")
+        with open(os.path.join(self.generation, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("schema_version") != INDEX_SCHEMA_VERSION:
+            raise ValueError(f"unsupported lexical index schema {self.meta.get('schema_version')}")
+        with open(os.path.join(self.generation, "terms.json"), "r", encoding="utf-8") as f:
+            self._terms = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(self.generation, "payloads.json"), "r", encoding="utf-8") as f:
+            self.payloads = json.load(f)
+        self.arrays = {
+            name: np.load(os.path.join(self.generation, f"{name}.npy"), mmap_mode="r") for name in _ARRAY_NAMES
+        }
+        if len(self.arrays["doc_lengths"]) != len(self.payloads):
+            raise ValueError(f"lexical index at {directory} has {len(self.arrays['doc_lengths'])} chunks "
+                             f"but {len(self.payloads)} payloads")
+        self._sources = np.array([p.get("source", "") for p in self.payloads], dtype=object)
+        self._length_norm = BM25_K1 * (
+            1 - BM25_B + BM25_B * np.asarray(self.arrays["doc_lengths"], dtype=np.float32) / max(self.meta["avgdl"], 1e-9)
+        )
+
+    @property
+    def corpus_version(self) -> Optional[str]:
+        return self.meta.get("corpus_version")
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._terms)
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (len(self.payloads) - df + 0.5) / (df + 0.5))
+
+    def _score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 score and matched IDF share of every chunk for `query`."""
+        scores = np.zeros(len(self.payloads), dtype=np.float32)
+        matched = np.zeros(len(self.payloads), dtype=np.float32)
+        total_idf = 0.0
+        offsets = self.arrays["offsets"]
+        for term in set(tokenize(query)):
+            position = self._terms.get(term)
+            if position is None:
+                total_idf += self._idf(0)  # a term the corpus lacks can't be matched
+                continue
+            start, end = int(offsets[position]), int(offsets[position + 1])
+            rows = np.asarray(self.arrays["doc_ids"][start:end])
+            tf = np.asarray(self.arrays["tfs"][start:end], dtype=np.float32)
+            idf = self._idf(end - start)
+            total_idf += idf
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + self._length_norm[rows])
+            matched[rows] += idf
+        return scores, matched / total_idf if total_idf else matched
+
+    def search(self, query: str, limit: int = 5, min_coverage: float = 0.0,
+               source: Optional[str] = None) -> List[LexicalHit]:
+        return self.search_many(query, [{"limit": limit, "min_coverage": min_coverage, "source": source}])[0]
+
+    def search_many(self, query: str, requests: Iterable[dict]) -> List[List[LexicalHit]]:
+        """Several searches (kwargs of search()) for one query, sharing one scoring pass."""
+        scores, coverage = self._score(query)
+        results = []
+        for r in requests:
+            keep = (scores > 0) & (coverage >= r.get("min_coverage", 0.0))
+            if r.get("source"):
+                keep &= self._sources == r["source"]
+            candidates = np.flatnonzero(keep)
+            limit = r.get("limit", 5)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            results.append([
+                LexicalHit(int(i), float(scores[i]), self.payloads[i], round(float(coverage[i]), 3))
+                for i in candidates
+            ])
+        return results
+
+    @staticmethod
+    def build(directory: str, corpus: List[dict], corpus_version: str) -> dict:
+        """Write (atomically replace) the index for `corpus`, row i = chunk i; returns its meta."""
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for row, chunk in enumerate(corpus):
+            tokens = tokenize(chunk.get("text", ""))
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, {})[row] = tf
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids, tfs = [], []
+        for i, term in enumerate(terms):
+            rows = postings[term]
+            doc_ids.extend(rows.keys())
+            tfs.extend(min(tf, np.iinfo(np.uint16).max) for tf in rows.values())
+            offsets[i + 1] = len(doc_ids)
+        arrays = {
+            "offsets": offsets,
+            "doc_ids": np.asarray(doc_ids, dtype=np.uint32),
+            "tfs": np.asarray(tfs, dtype=np.uint16),
+            "doc_lengths": np.asarray(lengths, dtype=np.uint32),
+        }
+        payloads = [{field: chunk.get(field, "" if field != "page" else 0) for field in PAYLOAD_FIELDS} for chunk in corpus]
+        meta = {
+            "schema_version": INDEX_SCHEMA_VERSION,
+            "corpus_version": corpus_version,
+            "count": len(corpus),
+            "terms": len(terms),
+            "postings": len(doc_ids),
+            "avgdl": round(sum(lengths) / max(1, len(lengths)), 3),
+            "k1": BM25_K1,
+            "b": BM25_B,
+        }
+
+        files = {f"{name}.npy": (lambda array: lambda f: np.save(f, array))(array) for name, array in arrays.items()}
+        files["terms.json"] = lambda f: f.write(json.dumps(terms, ensure_ascii=False).encode("utf-8"))
+        files["payloads.json"] = lambda f: f.write(json.dumps(payloads, ensure_ascii=False).encode("utf-8"))
+        files["meta.json"] = lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8"))
+        write_generation(directory, files)
+        return meta
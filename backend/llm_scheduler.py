@@ -0,0 +1,303 @@
+# llm_scheduler.py
+# Async admission control for Groq calls: client-side requests/tokens-per-minute
+# buckets, a priority queue (emergency decisions first), server retry-after hints
+# and jittered backoff — all waits are asyncio sleeps, never time.sleep.
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import math
+import os
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_EMERGENCY = 0
+PRIORITY_ROUTINE = 1
+
+# "Please try again in 7.66s" / "in 1m2.5s" / "in 450ms" in Groq error messages
+_RETRY_IN_PATTERN = re.compile(r"try again in\s+(?:(\d+)m)?\s*([\d.]+)(ms|s)", re.IGNORECASE)
+
+
+def estimate_tokens(*texts: str, max_tokens: int = 0) -> int:
+    """Rough prompt size (~4 characters per token) plus the completion budget."""
+    return sum(len(t or "") for t in texts) // 4 + max_tokens
+
+
+def _header(error: Exception, name: str) -> Optional[str]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    try:
+        return headers.get(name)
+    except Exception:
+        return None
+
+
+def retry_after_hint(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait (retry-after header or message), if any."""
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = _header(error, name)
+        if value:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                pass
+    match = _RETRY_IN_PATTERN.search(str(error))
+    if match:
+        minutes, amount, unit = match.groups()
+        seconds = float(amount) / 1000 if unit.lower() == "ms" else float(amount)
+        return seconds + 60 * int(minutes or 0)
+    return None
+
+
+def classify_error(error: Exception) -> str:
+    """'rate_limit', 'unavailable', 'fatal' (do not retry) or 'transient'."""
+    status = getattr(error, "status_code", None)
+    text = str(error).lower()
+    if status == 429 or "rate_limit" in text or "429" in text:
+        return "rate_limit"
+    if status in (500, 502, 503, 504) or "503" in text or "unavailable" in text:
+        return "unavailable"
+    if "decommissioned" in text or status in (400, 401, 403, 404, 422):
+        return "fatal"
+    return "transient"
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with jitter (between half and the full step)."""
+    step = min(cap, base * (2 ** (attempt - 1)))
+    return random.uniform(step / 2, step)
+
+
+def retry_delay(error: Exception, attempt: int, base: float = 2.0, cap: float = 60.0) -> Optional[float]:
+    """Seconds to wait before retrying `error`, or None when it should not be retried."""
+    kind = classify_error(error)
+    if kind == "fatal":
+        return None
+    hint = retry_after_hint(error)
+    if hint is not None:
+        # Honour the server, plus a little jitter so waiting callers do not stampede
+        return hint + random.uniform(0, min(1.0, hint * 0.1 + 0.1))
+    if kind == "rate_limit":
+        return backoff_delay(attempt, base=max(base, 5.0), cap=cap)
+    return backoff_delay(attempt, base=base, cap=cap)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; `capacity` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 when they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Correct an estimate once actual usage is known (positive = used more)."""
+        self._refill()
+        self.level = max(-self.capacity, min(self.capacity, self.level - delta))
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls in priority order (lower value first, FIFO within a priority),
+    at most `max_concurrency` at a time, within the requests/tokens-per-minute budget.
+
+    A rate-limit response pauses admission for everyone until the server's retry-after
+    has passed; the failed call is retried with jittered backoff at its original priority.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 30,
+        tokens_per_minute: float = 6000,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(1, max_retries)
+
+        self._waiters: list = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop = None
+
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.emergency_calls = 0
+        self.wait_seconds_total = 0.0
+
+    def _cond(self) -> asyncio.Condition:
+        # Bound to the running loop; recreated if a different loop uses the scheduler
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self._waiters = []
+            self._in_flight = 0
+        return self._condition
+
+    def _admission_delay(self, ticket, tokens: float) -> float:
+        if not self._waiters or self._waiters[0] != ticket or self._in_flight >= self.max_concurrency:
+            return math.inf  # not our turn yet; woken by notify
+        delay = max(0.0, self._paused_until - time.monotonic())
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.delay(1))
+        if self.token_bucket is not None:
+            delay = max(delay, self.token_bucket.delay(tokens))
+        return delay
+
+    async def _acquire(self, priority: int, tokens: float) -> None:
+        cond = self._cond()
+        ticket = (priority, next(self._sequence))
+        started = time.monotonic()
+        async with cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    delay = self._admission_delay(ticket, tokens)
+                    if delay <= 0:
+                        heapq.heappop(self._waiters)
+                        self._in_flight += 1
+                        if self.request_bucket is not None:
+                            self.request_bucket.take(1)
+                        if self.token_bucket is not None:
+                            self.token_bucket.take(tokens)
+                        cond.notify_all()  # the next waiter may be admissible too
+                        break
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=None if delay == math.inf else delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    cond.notify_all()
+                raise
+        self.wait_seconds_total += time.monotonic() - started
+
+    async def _release(self) -> None:
+        cond = self._cond()
+        async with cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            cond.notify_all()
+
+    def _pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        estimated_tokens: float = 0,
+        priority: int = PRIORITY_ROUTINE,
+    ) -> Any:
+        """Run `call()` when admitted; retries retryable errors, re-raises the last one."""
+        if priority == PRIORITY_EMERGENCY:
+            self.emergency_calls += 1
+        for attempt in range(1, self.max_retries + 1):
+            await self._acquire(priority, estimated_tokens)
+            self.calls += 1
+            try:
+                # finally: a cancelled call (wait_for timeout, client gone) frees its slot too
+                try:
+                    result = await call()
+                finally:
+                    await self._release()
+            except Exception as e:
+                wait = retry_delay(e, attempt)
+                if classify_error(e) == "rate_limit":
+                    self.rate_limited += 1
+                    self._pause(retry_after_hint(e) or wait or 0.0)
+                if wait is None or attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                logger.warning("Groq %s — retrying in %.1fs (attempt %s/%s)",
+                               classify_error(e), wait, attempt, self.max_retries)
+                await asyncio.sleep(wait)
+                continue
+
+            usage = getattr(getattr(result, "usage", None), "total_tokens", None)
+            if usage and self.token_bucket is not None:
+                self.token_bucket.adjust(usage - estimated_tokens)
+            return result
+
+    @contextlib.asynccontextmanager
+    async def slot(self, estimated_tokens: float = 0, priority: int = PRIORITY_ROUTINE):
+        """
+        Admission for one call whose lifetime the caller manages (a token stream): held
+        until the block exits. No retries here; a rate-limit error still pauses admission.
+        """
+        if priority == PRIORITY_EMERGENCY:
+            self.emergency_calls += 1
+        await self._acquire(priority, estimated_tokens)
+        self.calls += 1
+        try:
+            yield
+        except Exception as e:
+            if classify_error(e) == "rate_limit":
+                self.rate_limited += 1
+                self._pause(retry_after_hint(e) or retry_delay(e, 1) or 0.0)
+            raise
+        finally:
+            await self._release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "requests_available": round(self.request_bucket.level, 1) if self.request_bucket else None,
+            "tokens_available": round(self.token_bucket.level) if self.token_bucket else None,
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "emergency_calls": self.emergency_calls,
+            "avg_wait_s": round(self.wait_seconds_total / self.calls, 3) if self.calls else None,
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler configured from GROQ_RPM_LIMIT / GROQ_TPM_LIMIT / LLM_MAX_CONCURRENCY."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            requests_per_minute=float(os.getenv("GROQ_RPM_LIMIT", 30)),
+            tokens_per_minute=float(os.getenv("GROQ_TPM_LIMIT", 6000)),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+        )
+    return _scheduler
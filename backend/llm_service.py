@@ -1,10 +1,24 @@
 import os
 import time
-from groq import Groq
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+import hashlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from context_packs import ContextPacks
+import embedding_codec
+from local_index import LocalVectorIndex, index_generation
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+import onnx_embedder
+from embedding_memo import EmbeddingMemo, rule_diagnosis_stages, rule_files
+from llm_scheduler import (
+    PRIORITY_EMERGENCY,
+    PRIORITY_ROUTINE,
+    classify_error,
+    estimate_tokens,
+    get_scheduler,
+    retry_delay,
+)
 
 load_dotenv()
 
@@ -19,23 +33,351 @@ QDRANT_PORT     = int(os.getenv("QDRANT_PORT", 6333))
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "rag_corpus")
 ENABLE_AI       = os.getenv("ENABLE_AI_EXPLANATION", "true").lower() == "true"
 MIN_RAG_SCORE   = float(os.getenv("MIN_RAG_SCORE", 0.65))
+EMBEDDING_MODEL = "nomic-ai/nomic-embed-text-v1.5"
+# "qdrant" (default; falls back to the local index when unreachable) or "local"
+RAG_BACKEND     = os.getenv("RAG_BACKEND", "qdrant").strip().lower()
+# Matryoshka size and quantization expected of the Qdrant collection. Queries use what
+# the collection was actually built with once the corpus check has read it (a mismatch
+# is logged); these only apply until then. The local index records its own settings.
+EMBEDDING_DIM, EMBEDDING_QUANTIZATION = embedding_codec.validate(
+    os.getenv("EMBEDDING_DIM", embedding_codec.FULL_DIM), os.getenv("EMBEDDING_QUANTIZATION", "none")
+)
+# Unix socket of the shared embedding process (embedding_service.py); unset = load
+# the model in this process
+EMBEDDING_SERVICE_SOCKET = os.getenv("EMBEDDING_SERVICE_SOCKET", "").strip()
+# Embedder runtime: auto (the int8 ONNX export when present and parity-checked, else
+# PyTorch), onnx (require the export) or torch — see scripts/export_onnx_embedder.py
+EMBEDDER_RUNTIME = os.getenv("EMBEDDER_RUNTIME", "auto").strip().lower()
+# Hybrid retrieval: the BM25 index scripts/index_corpus.py writes is fused with the
+# vector hits (reciprocal rank); lexical hits must match this share of the query's IDF
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").strip().lower() == "true"
+LEXICAL_MIN_COVERAGE = float(os.getenv("LEXICAL_MIN_COVERAGE", 0.6))
+ONNX_EMBEDDER_DIR = os.getenv(
+    "ONNX_EMBEDDER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "onnx_embedder")
+)
 
 # =============================================================
-# CLIENTS — initialised once at module load
+# CLIENTS — built lazily; warm_up() loads them in the background
+# at app startup so no request pays for model loading
 # =============================================================
 
-groq_client = Groq(api_key=GROQ_API_KEY)
+class LazyResource:
+    """
+    A client or model built on first get() (or by warm_up()), with its load state.
+    After a failed load, get() fails fast until the backoff (doubling, capped) expires.
+    """
 
-qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    RETRY_BASE_SECONDS = 5.0
+    RETRY_MAX_SECONDS = 300.0
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+        self.error = None
+        self.load_seconds = None
+        self.failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until a failed load may be retried (0 when it may be tried now)."""
+        return 0.0 if self.ready else max(0.0, self._retry_at - time.monotonic())
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    if self.retry_in > 0:
+                        raise RuntimeError(f"{self.name} unavailable ({self.error}); retry in {self.retry_in:.0f}s")
+                    started = time.monotonic()
+                    try:
+                        self._value = self._factory()
+                    except Exception as e:
+                        self.error = str(e)
+                        self.failures += 1
+                        self._retry_at = time.monotonic() + min(
+                            self.RETRY_MAX_SECONDS, self.RETRY_BASE_SECONDS * 2 ** (self.failures - 1)
+                        )
+                        raise
+                    self.error = None
+                    self.load_seconds = round(time.monotonic() - started, 2)
+        return self._value
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "load_seconds": self.load_seconds, "error": self.error,
+                "failures": self.failures, "retry_in_s": round(self.retry_in, 1) if self.error else None}
+
+
+def _load_groq():
+    from groq import Groq
+    return Groq(api_key=GROQ_API_KEY)
+
+
+def _load_async_groq():
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=GROQ_API_KEY)
+
+
+def _load_qdrant():
+    from qdrant_client import QdrantClient
+    return QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+
+
+def embedder_runtime(runtime: str = None) -> str:
+    """"onnx-int8" or "torch": what load_local_embedder() loads for `runtime` (default EMBEDDER_RUNTIME)."""
+    runtime = (runtime or EMBEDDER_RUNTIME).strip().lower()
+    if runtime not in ("auto", "onnx", "torch"):
+        raise ValueError(f"EMBEDDER_RUNTIME {runtime!r} not supported (auto, onnx, torch)")
+    if runtime != "torch" and onnx_embedder.usable(ONNX_EMBEDDER_DIR, EMBEDDING_MODEL):
+        return "onnx-int8"
+    if runtime == "onnx":
+        raise RuntimeError(f"no parity-checked ONNX export of {EMBEDDING_MODEL} in {ONNX_EMBEDDER_DIR}")
+    return "torch"
+
+
+def load_local_embedder(runtime: str = None):
+    """The embedding model in this process, on the runtime embedder_runtime() picks."""
+    if embedder_runtime(runtime) == "onnx-int8":
+        model = onnx_embedder.OnnxEmbedder(ONNX_EMBEDDER_DIR)
+        model.encode("warm-up")
+        return model
+    return load_sentence_transformer()
+
+
+def load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    # Embedder runs on CPU — GPU reserved for other workloads
+    model = SentenceTransformer(
+        EMBEDDING_MODEL,
+        trust_remote_code=True,
+        device="cpu"
+    )
+    model.encode("warm-up")  # first encode allocates the inference buffers
+    return model
+
+
+def _load_embedder():
+    if not EMBEDDING_SERVICE_SOCKET:
+        return load_local_embedder()
+    # Same encode() interface, one model shared by every worker; the service may
+    # still be loading it when this process starts
+    from embedding_service import EmbeddingClient
+    client = EmbeddingClient(EMBEDDING_SERVICE_SOCKET)
+    try:
+        info = client.wait_until_ready(float(os.getenv("EMBEDDING_SERVICE_WAIT_SECONDS", 180)))
+    except (OSError, ConnectionError) as e:
+        print(f"  ✗ embedding service at {EMBEDDING_SERVICE_SOCKET} not reachable ({e}) — loading the model in this process")
+        return load_local_embedder()
+    if info.get("model") != EMBEDDING_MODEL:
+        raise RuntimeError(f"embedding service at {EMBEDDING_SERVICE_SOCKET} serves {info.get('model')}, expected {EMBEDDING_MODEL}")
+    return client
+
+
+_resources = {
+    "groq":       LazyResource("groq", _load_groq),
+    "async_groq": LazyResource("async_groq", _load_async_groq),
+    "qdrant":     LazyResource("qdrant", _load_qdrant),
+    "embedder":   LazyResource("embedder", _load_embedder),
+}
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+_embedding_memo = None
+_embedding_memo_lock = threading.Lock()
+_context_packs = None
+_local_index = None
+_local_index_stamp = None
+_local_index_lock = threading.Lock()
+_lexical_index = None
+_lexical_index_stamp = None
+_lexical_index_lock = threading.Lock()
+_lexical_only_queries = {}
+_known_corpus_version = None
+_qdrant_settings = None
+_corpus_checked_at = 0.0
+_corpus_check_lock = threading.Lock()
+
+
+def get_groq_client():
+    return _resources["groq"].get()
+
+
+def get_async_groq_client():
+    return _resources["async_groq"].get()
+
+
+def get_qdrant_client():
+    return _resources["qdrant"].get()
+
+
+def get_embedder():
+    return _resources["embedder"].get()
+
+
+def get_embedding_memo():
+    """Process-wide query-embedding memo (None when EMBEDDING_MEMO_ENABLED is false)."""
+    global _embedding_memo
+    if os.getenv("EMBEDDING_MEMO_ENABLED", "true").strip().lower() != "true":
+        return None
+    with _embedding_memo_lock:
+        if _embedding_memo is None:
+            backend_dir = os.path.dirname(os.path.abspath(__file__))
+            # ONNX int8 vectors differ slightly from PyTorch ones: separate entries
+            runtime = embedder_runtime()
+            _embedding_memo = EmbeddingMemo(
+                encode=lambda texts, **kwargs: get_embedder().encode(texts, **kwargs),
+                model_name=EMBEDDING_MODEL if runtime == "torch" else f"{EMBEDDING_MODEL}+{runtime}",
+                directory=os.getenv("EMBEDDING_MEMO_DIR", os.path.join(backend_dir, ".cache", "embeddings")),
+                max_entries=int(os.getenv("EMBEDDING_MEMO_SIZE", 2048)),
+            )
+    return _embedding_memo
+
+
+def rag_query(diagnosis: str, stage: str = "") -> str:
+    """The retrieval query for a decision; also what the embedding memo is prefilled with."""
+    return f"{diagnosis} {stage} management treatment Rwanda guidelines".strip()
+
+
+def embed_query(text: str) -> list:
+    memo = get_embedding_memo()
+    if memo is None:
+        return get_embedder().encode(text).tolist()
+    return memo.get(text).tolist()
+
+
+def prefill_query_embeddings() -> int:
+    """Embed the query of every diagnosis/stage pair the DRL rules can emit; returns how many were new."""
+    memo = get_embedding_memo()
+    if memo is None:
+        return 0
+    pairs = rule_diagnosis_stages(rule_files())
+    encoded = memo.prefill(sorted({rag_query(d, s) for d, s in pairs}))
+    print(f"  ✓ query embeddings: {len(pairs)} rule diagnosis/stage pairs, {encoded} newly encoded")
+    return encoded
+
+
+def __getattr__(name):
+    # groq_client / async_groq_client / qdrant_client / embedder as module attributes
+    if name.endswith("_client") and name[:-len("_client")] in _resources:
+        return _resources[name[:-len("_client")]].get()
+    if name == "embedder":
+        return get_embedder()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def resources_ready() -> bool:
+    """True once every client and the embedder are loaded."""
+    return all(resource.ready for resource in _resources.values())
+
+
+def llm_ready() -> bool:
+    """True once the Groq clients are loaded; until then AI degrades to disabled. RAG degrades on its own."""
+    return _resources["groq"].ready and _resources["async_groq"].ready
+
+
+def resource_status() -> dict:
+    status = {name: resource.status() for name, resource in _resources.items()}
+    return {
+        "ai_enabled": ENABLE_AI,
+        "ready": resources_ready(),
+        "llm_ready": llm_ready(),
+        "warming_up": _warm_up_thread is not None and _warm_up_thread.is_alive(),
+        "resources": status,
+        "embedding_memo": _embedding_memo.stats() if _embedding_memo is not None else None,
+        "context_packs": _context_packs.stats() if _context_packs is not None else None,
+        "embedder_runtime": None if EMBEDDING_SERVICE_SOCKET else _safe_embedder_runtime(),
+        "embedding_service": _embedding_service_stats(),
+        "rag_backend": RAG_BACKEND,
+        "qdrant_vectors": dict(zip(("dim", "quantization"), qdrant_query_settings())),
+        "local_index": (
+            {"chunks": len(_local_index), "corpus_version": _local_index.corpus_version, "directory": _local_index.directory}
+            if _local_index is not None else None
+        ),
+        "lexical_index": (
+            {"chunks": len(_lexical_index), "terms": _lexical_index.vocabulary_size,
+             "corpus_version": _lexical_index.corpus_version, "directory": _lexical_index.directory,
+             "lexical_only_queries": len(_lexical_only_queries)}
+            if _lexical_index is not None else None
+        ),
+    }
+
+
+def _safe_embedder_runtime():
+    try:
+        return embedder_runtime()
+    except Exception as e:
+        return f"unavailable: {e}"
+
+
+def _embedding_service_stats():
+    """Batch-size / queue-latency metrics of the shared embedding process, when one is used."""
+    if not EMBEDDING_SERVICE_SOCKET:
+        return None
+    if not _resources["embedder"].ready:
+        return {"socket": EMBEDDING_SERVICE_SOCKET, "connected": False}
+    try:
+        return {"socket": EMBEDDING_SERVICE_SOCKET, "connected": True, **get_embedder().stats()}
+    except Exception as e:
+        return {"socket": EMBEDDING_SERVICE_SOCKET, "connected": False, "error": str(e)}
+
+
+def warm_up() -> dict:
+    """Load every resource not loaded yet (blocking); failures are recorded, not raised."""
+    loaded = []
+    for name, resource in _resources.items():
+        if resource.ready:
+            continue
+        try:
+            resource.get()
+            loaded.append(name)
+            print(f"  ✓ {name} ready ({resource.load_seconds}s)")
+        except Exception as e:
+            print(f"  ✗ {name} failed to load: {e}")
+    if "embedder" in loaded:
+        try:
+            prefill_query_embeddings()
+        except Exception as e:
+            print(f"  ✗ query embedding prefill failed: {e}")
+    if loaded and resources_ready():
+        try:
+            ensure_context_packs()
+        except Exception as e:
+            print(f"  ✗ context pack build failed: {e}")
+    print(f"✓ llm_service warm-up finished (ready: {resources_ready()})")
+    return resource_status()
+
+
+def _warm_up_until_ready() -> None:
+    warm_up()
+    while not resources_ready():
+        time.sleep(max(1.0, min(r.retry_in for r in _resources.values() if not r.ready)))
+        warm_up()
 
-# Embedder runs on CPU — GPU reserved for other workloads
-embedder = SentenceTransformer(
-    "nomic-ai/nomic-embed-text-v1.5",
-    trust_remote_code=True,
-    device="cpu"
-)
 
-print(f"✓ llm_service initialised")
+def start_warm_up() -> None:
+    """
+    Run warm_up() on a daemon thread, retrying failed resources with their backoff until
+    everything is loaded. Idempotent while that thread runs; called at startup and by
+    requests that find resources missing (AI_WARMUP_ON_STARTUP=false, earlier failures).
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if resources_ready() or (_warm_up_thread is not None and _warm_up_thread.is_alive()):
+            return
+        _warm_up_thread = threading.Thread(target=_warm_up_until_ready, name="llm-warm-up", daemon=True)
+        _warm_up_thread.start()
+
+
+# Runs the patient branch of generate_explanation() beside retrieval + clinician
+_explanation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="explanation")
+
+print(f"✓ llm_service imported (clients load in the background)")
 print(f"  Model:      {GROQ_MODEL}")
 print(f"  Qdrant:     {QDRANT_HOST}:{QDRANT_PORT}")
 print(f"  Collection: {COLLECTION_NAME}")
@@ -58,7 +400,8 @@ MANDATORY OUTPUT STRUCTURE — You MUST use these exact section headers in every
 
 CLINICAL FINDING:
 State the patient's specific measurements and exactly which guideline threshold they meet or exceed.
-Always include the exact numerical value and the threshold it crosses.
+Always include the numerical value exactly as given in PATIENT CONTEXT (a range when the context
+gives a range) and the threshold it crosses. Never state a more precise reading than the one given.
 
 REASONING:
 Explain why this classification was made. You MUST quote or closely paraphrase the specific Rwanda
@@ -119,6 +462,7 @@ Tell the patient what was found in plain language.
 IMPORTANT: Blood pressure is measured in mmHg (e.g. 168/102 mmHg).
 Blood sugar is measured in mg/dL or mmol/L — never in mmHg.
 Never confuse these two measurements. State each clearly and separately.
+Give the blood pressure and age exactly as written in the case (a range stays a range).
 
 WHY IT MATTERS:
 Explain what happens to the body over time if untreated. Include one reassurance sentence.
@@ -182,6 +526,50 @@ def strip_leakage(text: str) -> str:
     return text
 
 
+class LeakageFilter:
+    """
+    Incremental strip_leakage() for streamed output.
+
+    feed() returns only text that can no longer turn out to be the start of a leakage
+    phrase (the tail is held back until enough characters arrive); once a phrase
+    appears the stream is cut there and `stopped` is set. The concatenation of all
+    feed()/finish() output equals strip_leakage() of the whole text.
+    """
+
+    HOLDBACK = max(len(phrase) for phrase in LEAKAGE_PHRASES) - 1
+
+    def __init__(self):
+        self._raw = ""
+        self._emitted = 0
+        self.stopped = False
+
+    def _emit(self, safe: str) -> str:
+        if len(safe) <= self._emitted:
+            return ""
+        delta = safe[self._emitted:]
+        self._emitted = len(safe)
+        return delta
+
+    def feed(self, delta: str) -> str:
+        if self.stopped or not delta:
+            return ""
+        self._raw += delta
+        text = self._raw.lstrip()
+        cut = min((text.index(p) for p in LEAKAGE_PHRASES if p in text), default=None)
+        if cut is not None:
+            self.stopped = True
+            return self._emit(text[:cut].rstrip())
+        # Hold back a possible partial phrase and trailing whitespace (strip() would drop it)
+        return self._emit(text[:max(0, len(text) - self.HOLDBACK)].rstrip())
+
+    def finish(self) -> str:
+        return self._emit(strip_leakage(self._raw.strip()))
+
+    @property
+    def text(self) -> str:
+        return strip_leakage(self._raw.strip())
+
+
 # =============================================================
 # ACUTE MEDICATION DETECTOR
 # Fix 3: Identify one-time/emergency medications
@@ -269,11 +657,21 @@ def calculate_max_tokens(decision: dict, output_type: str) -> int:
 # Fix 10: Dose escalation context
 # =============================================================
 
-def build_clinician_user_message(decision: dict, patient: dict, guideline_ctx: str) -> str:
+def exact_vitals(patient: dict) -> dict:
+    """The age and blood pressure as the prompts render them: the patient's own readings."""
+    return {
+        "age": f"{patient['age']} years",
+        "blood_pressure": f"{patient['systolic']}/{patient['diastolic']} mmHg",
+    }
+
+
+def build_clinician_user_message(decision: dict, patient: dict, guideline_ctx: str, vitals: dict = None) -> str:
     """
     Build the user message for the clinician explanation.
-    Includes clinical context flags that guide model reasoning.
+    Includes clinical context flags that guide model reasoning. `vitals` overrides how
+    age and blood pressure are written (default: exact_vitals(patient)).
     """
+    vitals = vitals or exact_vitals(patient)
     guideline_text = guideline_ctx.strip() if guideline_ctx.strip() else "NO GUIDELINE CONTEXT PROVIDED."
 
     is_emergency = (
@@ -313,8 +711,8 @@ Referral required: {'YES — arrange immediately' if decision.get('needsReferral
 {metformin_flag}{insulin_flag}{escalation_flag}
 
 PATIENT CONTEXT (anonymized):
-Age: {patient['age']} years  |  Sex: {patient['gender']}
-Blood pressure: {patient['systolic']}/{patient['diastolic']} mmHg
+Age: {vitals['age']}  |  Sex: {patient['gender']}
+Blood pressure: {vitals['blood_pressure']}
 
 GUIDELINE CONTEXT — cite ONLY this source in your explanation, no other guidelines:
 {guideline_text}
@@ -323,12 +721,13 @@ Write the complete clinical explanation using all 6 mandatory sections.
 Label each section exactly as specified. Minimum 250 words."""
 
 
-def build_patient_user_message(decision: dict, patient: dict) -> str:
+def build_patient_user_message(decision: dict, patient: dict, vitals: dict = None) -> str:
     """
     Build the user message for the patient explanation.
     Fix 7: Explicit BP/blood sugar separation.
     Fix 3: Acute medication type signalling.
     """
+    vitals = vitals or exact_vitals(patient)
     referral_text = (
         "Yes — patient must go to district hospital soon, must not go alone"
         if decision.get("needsReferral")
@@ -350,7 +749,7 @@ def build_patient_user_message(decision: dict, patient: dict) -> str:
     if "diabetes" in diagnosis_lower:
         measurement_note = f"""
 MEASUREMENT CLARIFICATION FOR THIS CASE:
-- Blood pressure (BP): {patient['systolic']}/{patient['diastolic']} mmHg — this is measured in mmHg
+- Blood pressure (BP): {vitals['blood_pressure']} — this is measured in mmHg
 - Blood sugar: measured in mg/dL or mmol/L — NOT in mmHg
   Do not write the BP reading as the blood sugar level.
   If you mention blood sugar, say 'your blood sugar was found to be high' without giving mmHg numbers."""
@@ -358,8 +757,8 @@ MEASUREMENT CLARIFICATION FOR THIS CASE:
     return f"""Write a patient explanation for this person. Speak directly to them.
 
 Condition found: {decision['diagnosis']} ({decision.get('stage', '')})
-Blood pressure reading: {patient['systolic']}/{patient['diastolic']} mmHg
-Age: {patient['age']} years  |  Sex: {patient['gender']}
+Blood pressure reading: {vitals['blood_pressure']}
+Age: {vitals['age']}  |  Sex: {patient['gender']}
 Medication(s): {med_text}{acute_note}
 Hospital referral needed: {referral_text}
 {measurement_note}
@@ -394,7 +793,7 @@ def call_llm(
 
     for attempt in range(1, max_retries + 1):
         try:
-            response = groq_client.chat.completions.create(
+            response = get_groq_client().chat.completions.create(
                 model=GROQ_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -411,35 +810,151 @@ def call_llm(
             return clean_text
 
         except Exception as e:
-            error_str = str(e)
-
-            if "rate_limit" in error_str.lower() or "429" in error_str:
-                wait = 60
-                print(f"  Rate limited — waiting {wait}s (attempt {attempt}/{max_retries})")
-                time.sleep(wait)
-                continue
-
-            elif "503" in error_str or "unavailable" in error_str.lower():
-                wait = 20
-                print(f"  Service unavailable — waiting {wait}s (attempt {attempt}/{max_retries})")
-                time.sleep(wait)
-                continue
-
-            elif "decommissioned" in error_str.lower():
-                print(f"  Model decommissioned — update GROQ_MODEL in .env")
-                print(f"  Recommended: llama-3.1-8b-instant")
+            wait = _retry_wait(e, attempt, max_retries)
+            if wait is None:
                 return ""
-
-            else:
-                print(f"  Groq error on attempt {attempt}: {e}")
-                if attempt < max_retries:
-                    time.sleep(5)
-                continue
+            time.sleep(wait)
 
     print("  All retries exhausted — returning empty string")
     return ""
 
 
+async def acall_llm(
+    system_prompt: str,
+    user_message: str,
+    max_tokens: int = 600,
+    temperature: float = 0.1,
+    priority: int = PRIORITY_ROUTINE
+) -> str:
+    """
+    Async twin of call_llm() on the AsyncGroq client, admitted through the shared
+    LLMScheduler: requests/tokens-per-minute budget, retry-after hints and jittered
+    backoff are all awaited, so a 429 never blocks the event loop. Emergency
+    priority calls are admitted ahead of routine ones.
+    """
+    async def call():
+        return await get_async_groq_client().chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user",   "content": user_message}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+
+    try:
+        response = await get_scheduler().run(
+            call,
+            estimated_tokens=estimate_tokens(system_prompt, user_message, max_tokens=max_tokens),
+            priority=priority,
+        )
+    except Exception as e:
+        if "decommissioned" in str(e).lower():
+            print(f"  Model decommissioned — update GROQ_MODEL in .env")
+            print(f"  Recommended: llama-3.1-8b-instant")
+        else:
+            print(f"  Groq call failed after retries: {e}")
+        return ""
+    return strip_leakage(response.choices[0].message.content.strip())
+
+
+async def astream_llm(
+    system_prompt: str,
+    user_message: str,
+    max_tokens: int = 600,
+    temperature: float = 0.1,
+    priority: int = PRIORITY_ROUTINE
+):
+    """
+    Streaming acall_llm(): yields leakage-filtered text deltas as Groq produces them.
+    The scheduler slot is held for the whole stream. Retries (same policy as the
+    scheduler) only happen while nothing has been yielded yet; a failure after that
+    ends the stream with the text received so far.
+    """
+    scheduler = get_scheduler()
+    estimated = estimate_tokens(system_prompt, user_message, max_tokens=max_tokens)
+
+    for attempt in range(1, scheduler.max_retries + 1):
+        leakage = LeakageFilter()
+        started = False
+        try:
+            async with scheduler.slot(estimated, priority):
+                stream = await get_async_groq_client().chat.completions.create(
+                    model=GROQ_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user",   "content": user_message}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True
+                )
+                try:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        text = leakage.feed(delta or "")
+                        if text:
+                            started = True
+                            yield text
+                        if leakage.stopped:
+                            break
+                finally:
+                    await stream.close()
+            tail = leakage.finish()
+            if tail:
+                yield tail
+            return
+        except Exception as e:
+            wait = retry_delay(e, attempt)
+            if started or wait is None or attempt == scheduler.max_retries:
+                print(f"  Groq stream failed: {e}")
+                if started:
+                    tail = leakage.finish()
+                    if tail:
+                        yield tail
+                return
+            scheduler.retries += 1
+            print(f"  Groq {classify_error(e)} — retrying stream in {wait:.1f}s (attempt {attempt}/{scheduler.max_retries})")
+            await asyncio.sleep(wait)
+
+
+def _retry_wait(error: Exception, attempt: int, max_retries: int):
+    """
+    Seconds to wait before retrying a failed Groq call (0 = retry now),
+    or None when the call should give up with an empty result.
+    Honours the server's retry-after hint; otherwise jittered exponential backoff.
+    """
+    kind = classify_error(error)
+    wait = retry_delay(error, attempt)
+
+    if kind == "fatal":
+        if "decommissioned" in str(error).lower():
+            print(f"  Model decommissioned — update GROQ_MODEL in .env")
+            print(f"  Recommended: llama-3.1-8b-instant")
+        else:
+            print(f"  Groq error (not retried): {error}")
+        return None
+
+    if attempt >= max_retries:
+        print(f"  Groq error on attempt {attempt}: {error}")
+        return 0
+
+    label = {"rate_limit": "Rate limited", "unavailable": "Service unavailable"}.get(kind, "Groq error")
+    print(f"  {label} — waiting {wait:.1f}s (attempt {attempt}/{max_retries})")
+    return wait
+
+
+def decision_priority(decision: dict) -> int:
+    """Emergency decisions (referral, DKA, urgency/emergency) are scheduled ahead of routine ones."""
+    diagnosis_lower = (decision.get("diagnosis") or "").lower()
+    if decision.get("needsReferral") or any(
+        kw in diagnosis_lower for kw in ["urgency", "emergency", "ketoacidosis", "dka"]
+    ):
+        return PRIORITY_EMERGENCY
+    return PRIORITY_ROUTINE
+
+
 # =============================================================
 # RAG RETRIEVAL
 # Fix 1: Deduplicate by source+page
@@ -450,6 +965,34 @@ def retrieve_guideline_chunks(
     stage: str = "",
     min_score: float = MIN_RAG_SCORE,
     limit: int = 3
+) -> tuple[list[str], list[str]]:
+    """
+    Guideline chunks for a diagnosis/stage: served from the precomputed context packs
+    when they were built against the live corpus with the same parameters, otherwise
+    searched live in Qdrant (search_guideline_chunks()).
+    """
+    query = rag_query(diagnosis, stage)
+    _maybe_recheck_corpus()
+    packs = get_context_packs()
+    if packs is not None:
+        if _known_corpus_version is not None and packs.corpus_version == _known_corpus_version:
+            packed = packs.lookup(query, _pack_params(min_score, limit))
+            if packed is not None:
+                return packed
+    return search_guideline_chunks(query, min_score=min_score, limit=limit)
+
+
+PRIMARY_GUIDELINE_SOURCE = "Final_NCDs_Management_Guidelines"
+
+# Only the payload fields retrieval reads; the rest (conditions, content_type, ...) stay on the server
+RETRIEVAL_PAYLOAD_FIELDS = ["text", "source", "page"]
+
+
+def search_guideline_chunks(
+    query: str,
+    min_score: float = MIN_RAG_SCORE,
+    limit: int = 3,
+    strict: bool = False
 ) -> tuple[list[str], list[str]]:
     """
     Retrieve relevant guideline chunks from Qdrant.
@@ -460,12 +1003,215 @@ def retrieve_guideline_chunks(
     3. Filter by minimum cosine similarity score
     4. Deduplicate by source+page — never return same page twice
 
+    Both searches go to Qdrant as one query_batch_points() round trip, with the score
+    threshold applied server-side and only RETRIEVAL_PAYLOAD_FIELDS returned. With a
+    lexical index, its BM25 hits are fused in (_combine_hits()); queries whose vector
+    hits all fell below min_score skip embedding and vector search from then on.
+
+    With strict=True, a degraded search (no embedder, embedding or Qdrant failure) raises
+    RuntimeError instead of falling back, so its result is never persisted as a context pack.
+
     Fix 1: Deduplication prevents wasting retrieval slots on overlapping chunks.
     """
-    query = f"{diagnosis} {stage} management treatment Rwanda guidelines".strip()
-    query_vector = embedder.encode(query).tolist()
+    from qdrant_client.models import (
+        Filter, FieldCondition, MatchValue, QuantizationSearchParams, QueryRequest, SearchParams
+    )
+
+    lexical = _usable_lexical_index()
+    if lexical is not None and _lexical_only_queries.get((query, min_score)) == (lexical.corpus_version, _known_corpus_version):
+        return _combine_hits(query, [], [], min_score, limit, record_miss=False)
+
+    # Embedder still loading or failed: no vector search (never load it on the request
+    # path); lexical hits if there is an index, else no context
+    if not _resources["embedder"].ready:
+        if strict:
+            raise RuntimeError("embedder not loaded — no vector search")
+        start_warm_up()
+        return _combine_hits(query, [], [], min_score, limit, record_miss=False)
+    try:
+        query_vector = embed_query(query)
+    except Exception as e:
+        if strict:
+            raise RuntimeError(f"query embedding failed: {e}") from e
+        print(f"  Query embedding failed ({e}) — no vector search")
+        return _combine_hits(query, [], [], min_score, limit, record_miss=False)
+
+    if RAG_BACKEND == "local":
+        local = get_local_index()
+        if local is not None:
+            return _search_local(local, query, query_vector, min_score, limit, strict=strict)
+
+    # Same Matryoshka size as the collection; quantized collections rescore with the originals
+    dim, quantization = qdrant_query_settings()
+    collection_vector = embedding_codec.matryoshka(query_vector, dim).tolist()
+    search_params = None
+    if quantization != "none":
+        search_params = SearchParams(quantization=QuantizationSearchParams(
+            rescore=True, oversampling=float(embedding_codec.BINARY_RESCORE_FACTOR)
+        ))
+
+    # IMPORTANT: Qdrant may be down/unreachable. Then search the local index so
+    # explanations stay grounded; without one, return no chunks so the explanation
+    # layer can still degrade gracefully (non-blocking).
+    try:
+        primary_response, fallback_response = get_qdrant_client().query_batch_points(
+            collection_name=COLLECTION_NAME,
+            requests=[
+                QueryRequest(
+                    query=collection_vector,
+                    params=search_params,
+                    filter=Filter(
+                        must=[FieldCondition(
+                            key="source",
+                            match=MatchValue(value=PRIMARY_GUIDELINE_SOURCE)
+                        )]
+                    ),
+                    limit=limit + 2,   # Retrieve extra to account for deduplication
+                    score_threshold=min_score,
+                    with_payload=RETRIEVAL_PAYLOAD_FIELDS
+                ),
+                QueryRequest(
+                    query=collection_vector,
+                    params=search_params,
+                    limit=limit + 4,
+                    score_threshold=min_score,
+                    with_payload=RETRIEVAL_PAYLOAD_FIELDS
+                ),
+            ]
+        )
+        primary_hits, fallback_hits = primary_response.points, fallback_response.points
+    except Exception as e:
+        if strict:
+            raise RuntimeError(f"Qdrant search failed: {e}") from e
+        local = get_local_index()
+        if local is not None:
+            print(f"  Qdrant unavailable ({e}) — searching the local index")
+            return _search_local(local, query, query_vector, min_score, limit)
+        # No vector search ran: serve lexical hits, but don't remember the query as a miss
+        return _combine_hits(query, [], [], min_score, limit, record_miss=False)
+
+    return _combine_hits(query, primary_hits, fallback_hits, min_score, limit)
+
+
+def _search_local(
+    local,
+    query: str,
+    query_vector,
+    min_score: float,
+    limit: int,
+    strict: bool = False
+) -> tuple[list[str], list[str]]:
+    """
+    search_guideline_chunks() against the in-process index (same two searches, one
+    similarity pass). A failing search degrades like an unreachable Qdrant: lexical hits
+    if there is an index, else no context (strict=True raises instead).
+    """
+    try:
+        primary_hits, fallback_hits = local.search_many(query_vector, [
+            {"source": PRIMARY_GUIDELINE_SOURCE, "limit": limit + 2, "score_threshold": min_score},
+            {"limit": limit + 4, "score_threshold": min_score},
+        ])
+    except Exception as e:
+        if strict:
+            raise RuntimeError(f"local index search failed: {e}") from e
+        print(f"  Local index search failed ({e}) — no vector search")
+        return _combine_hits(query, [], [], min_score, limit, record_miss=False)
+    return _combine_hits(query, primary_hits, fallback_hits, min_score, limit)
+
+
+def _index_stamp(directory: str):
+    """Current generation of an index directory (and its meta.json mtime), None when there is none."""
+    generation = index_generation(directory)
+    if generation is None:
+        return None
+    try:
+        return generation, os.stat(os.path.join(generation, "meta.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_local_index():
+    """
+    The local vector index written by scripts/index_corpus.py (LOCAL_INDEX_DIR), or None
+    when there is none for EMBEDDING_MODEL. Re-opened when the index is rebuilt.
+    """
+    global _local_index, _local_index_stamp
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    directory = os.getenv("LOCAL_INDEX_DIR", os.path.join(backend_dir, ".cache", "local_index"))
+    stamp = _index_stamp(directory)
+    if stamp is None:
+        return None
+    with _local_index_lock:
+        if stamp != _local_index_stamp:
+            _local_index_stamp = stamp
+            try:
+                index = LocalVectorIndex(directory)
+                if index.embedding_model != EMBEDDING_MODEL:
+                    raise ValueError(f"built with {index.embedding_model}, expected {EMBEDDING_MODEL}")
+                _local_index = index
+                print(f"  Local index loaded: {len(index)} chunks (corpus {index.corpus_version})")
+            except Exception as e:
+                print(f"  Local index at {directory} unusable: {e}")
+                _local_index = None
+    return _local_index
+
+
+def get_lexical_index():
+    """
+    The BM25 index written by scripts/index_corpus.py (LEXICAL_INDEX_DIR), or None when
+    there is none. Re-opened when the index is rebuilt.
+    """
+    global _lexical_index, _lexical_index_stamp
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    directory = os.getenv("LEXICAL_INDEX_DIR", os.path.join(backend_dir, ".cache", "lexical_index"))
+    stamp = _index_stamp(directory)
+    if stamp is None:
+        return None
+    with _lexical_index_lock:
+        if stamp != _lexical_index_stamp:
+            _lexical_index_stamp = stamp
+            try:
+                _lexical_index = LexicalIndex(directory)
+                _lexical_only_queries.clear()
+                print(f"  Lexical index loaded: {len(_lexical_index)} chunks, "
+                      f"{_lexical_index.vocabulary_size} terms (corpus {_lexical_index.corpus_version})")
+            except Exception as e:
+                print(f"  Lexical index at {directory} unusable: {e}")
+                _lexical_index = None
+    return _lexical_index
+
+
+def _usable_lexical_index():
+    """The lexical index when hybrid retrieval is on and it indexed the same corpus as the vectors."""
+    if not HYBRID_RETRIEVAL:
+        return None
+    lexical = get_lexical_index()
+    if lexical is None:
+        return None
+    # Row ids only line up with the vector hits' ids when both indexed the same corpus
+    if RAG_BACKEND == "local" and _local_index is not None:
+        vector_version = _local_index.corpus_version
+    else:
+        vector_version = _known_corpus_version.rsplit(":", 1)[0] if _known_corpus_version else None
+    if vector_version is not None and vector_version != lexical.corpus_version:
+        return None
+    return lexical
+
+
+def search_guideline_chunks_sequential(
+    query: str,
+    min_score: float = MIN_RAG_SCORE,
+    limit: int = 3
+) -> tuple[list[str], list[str]]:
+    """
+    The previous two-call retrieval (filtered search, then unfiltered fallback, full
+    payloads). Kept as the baseline for scripts/benchmark_retrieval.py.
+    """
+    from qdrant_client.models import Filter, FieldCondition, MatchValue
+
+    query_vector = embedding_codec.matryoshka(embed_query(query), qdrant_query_settings()[0]).tolist()
+    qdrant_client = get_qdrant_client()
 
-    # Try primary source first
     try:
         primary_response = qdrant_client.query_points(
             collection_name=COLLECTION_NAME,
@@ -473,32 +1219,95 @@ def retrieve_guideline_chunks(
             query_filter=Filter(
                 must=[FieldCondition(
                     key="source",
-                    match=MatchValue(value="Final_NCDs_Management_Guidelines")
+                    match=MatchValue(value=PRIMARY_GUIDELINE_SOURCE)
                 )]
             ),
-            limit=limit + 2   # Retrieve extra to account for deduplication
+            limit=limit + 2
         )
-        primary_hits = [h for h in primary_response.points if h.score >= min_score]
+        primary_hits = primary_response.points
     except Exception:
         primary_hits = []
 
-    # Fill remaining slots from any source
-    # IMPORTANT: Qdrant may be down/unreachable. In that case, return no chunks
-    # so the explanation layer can still degrade gracefully (non-blocking).
     try:
-        fallback_response = qdrant_client.query_points(
+        fallback_hits = qdrant_client.query_points(
             collection_name=COLLECTION_NAME,
             query=query_vector,
             limit=limit + 4
-        )
-        fallback_hits = [
-            h for h in fallback_response.points
-            if h.score >= min_score
-            and h.id not in {p.id for p in primary_hits}
-        ]
+        ).points
     except Exception:
         fallback_hits = []
 
+    return _combine_hits(query, primary_hits, fallback_hits, min_score, limit, record_miss=False)
+
+
+def _combine_hits(
+    query: str,
+    primary_hits,
+    fallback_hits,
+    min_score: float,
+    limit: int,
+    record_miss: bool = True
+) -> tuple[list[str], list[str]]:
+    """
+    _dedupe_hits() of the vector hits, with the lexical index's hits for the same two
+    searches fused in by reciprocal rank. When no vector hit reaches min_score the
+    result is lexical-only, and (record_miss) the query is remembered so later calls
+    take that path without embedding.
+    """
+    lexical = _usable_lexical_index()
+    if lexical is None:
+        return _dedupe_hits(primary_hits, fallback_hits, min_score, limit)
+
+    lexical_primary, lexical_fallback = lexical.search_many(query, [
+        {"source": PRIMARY_GUIDELINE_SOURCE, "limit": limit + 2, "min_coverage": LEXICAL_MIN_COVERAGE},
+        {"limit": limit + 4, "min_coverage": LEXICAL_MIN_COVERAGE},
+    ])
+    primary_hits = [h for h in primary_hits if h.score >= min_score]
+    fallback_hits = [h for h in fallback_hits if h.score >= min_score]
+    if record_miss and not primary_hits and not fallback_hits:
+        _record_lexical_only(query, min_score, lexical)
+
+    primary_hits = _fuse_hits(primary_hits, lexical_primary)
+    return _dedupe_hits(primary_hits, _fuse_hits(fallback_hits, lexical_fallback), None, limit)
+
+
+def _record_lexical_only(query: str, min_score: float, lexical) -> None:
+    """
+    Remember that `query` has no vector hit, for this lexical index and vector corpus
+    version. Only when the vector side is complete: index_corpus.py writes the lexical
+    index before re-uploading Qdrant, and an empty or partial collection misses everything.
+    Uses the corpus version the background check last saw (never queries Qdrant here).
+    """
+    version = _known_corpus_version
+    if version is None:
+        return
+    stamped, count = version.rsplit(":", 1)
+    if stamped != lexical.corpus_version or int(count) == 0 or int(count) != len(lexical):
+        return
+    if len(_lexical_only_queries) >= 4096:
+        _lexical_only_queries.clear()
+    _lexical_only_queries[(query, min_score)] = (lexical.corpus_version, version)
+
+
+def _fuse_hits(vector_hits, lexical_hits) -> list:
+    """One ranking from a vector and a lexical ranking (RRF); chunks found by both keep their vector hit."""
+    by_id = {h.id: h for h in lexical_hits}
+    by_id.update({h.id: h for h in vector_hits})
+    fused = reciprocal_rank_fusion([[h.id for h in vector_hits], [h.id for h in lexical_hits]])
+    return [by_id[id] for id, _ in fused]
+
+
+def _dedupe_hits(primary_hits, fallback_hits, min_score, limit: int) -> tuple[list[str], list[str]]:
+    """
+    Primary hits first, then fallback hits not already present; at most one chunk per
+    source+page. min_score=None keeps every hit (already filtered by _combine_hits()).
+    """
+    if min_score is not None:
+        primary_hits = [h for h in primary_hits if h.score >= min_score]
+        fallback_hits = [h for h in fallback_hits if h.score >= min_score]
+    primary_ids = {p.id for p in primary_hits}
+    fallback_hits = [h for h in fallback_hits if h.id not in primary_ids]
+
     combined = primary_hits + fallback_hits
 
     # Fix 1: Deduplicate by source+page — same page can appear multiple times
@@ -516,7 +1325,7 @@ def retrieve_guideline_chunks(
     chunks  = [h.payload.get("text", "") for h in deduped_hits]
     sources = [
         f"{h.payload.get('source', 'Unknown')} p.{h.payload.get('page', '?')} "
-        f"(score: {h.score:.2f})"
+        f"({getattr(h, 'label', None) or f'score: {h.score:.2f}'})"
         for h in deduped_hits
     ]
 
@@ -524,29 +1333,139 @@ def retrieve_guideline_chunks(
 
 
 # =============================================================
-# MAIN EXPLANATION FUNCTION
-# Fix 5: _force_no_context checked BEFORE RAG runs
-# Fix 6: Dynamic token allocation
+# CONTEXT PACKS — retrieval precomputed per rule diagnosis/stage
+# Rebuilt whenever the live corpus version changes (re-indexing)
 # =============================================================
 
-def generate_explanation(decision: dict, patient: dict) -> dict:
-    """
-    Full RAG + LLM pipeline. Generates both clinician and patient
-    explanations for a Drools engine decision.
+def _pack_params(min_score: float = MIN_RAG_SCORE, limit: int = 3) -> dict:
+    lexical = _usable_lexical_index()
+    dim, quantization = qdrant_query_settings()
+    return {"collection": COLLECTION_NAME, "embedding_model": EMBEDDING_MODEL,
+            "min_score": min_score, "limit": limit,
+            "dim": dim, "quantization": quantization,
+            "lexical_index": lexical.corpus_version if lexical is not None else None,
+            "lexical_min_coverage": LEXICAL_MIN_COVERAGE}
+
+
+def get_context_packs():
+    """Process-wide context packs (None when CONTEXT_PACKS_ENABLED is false)."""
+    global _context_packs
+    if os.getenv("CONTEXT_PACKS_ENABLED", "true").strip().lower() != "true":
+        return None
+    if _context_packs is None:
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        _context_packs = ContextPacks(
+            os.getenv("CONTEXT_PACKS_PATH", os.path.join(backend_dir, ".cache", "context_packs.json"))
+        )
+    return _context_packs
 
-    Called by FastAPI /explain endpoint.
 
-    Args:
-        decision: Dict from Drools — diagnosis, stage, medications, tests, needsReferral
-        patient:  Dict — age, gender, systolic, diastolic
+def live_corpus_version() -> str:
+    """
+    Version of the indexed corpus: the corpus_version scripts/index_corpus.py stamps on
+    every point (and the local index), plus the point count (so a partial or manual
+    re-index also counts).
+    """
+    local = get_local_index() if RAG_BACKEND == "local" else None
+    if local is not None:
+        return f"{local.corpus_version or 'unversioned'}:{len(local)}"
+    client = get_qdrant_client()
+    _refresh_qdrant_settings(client)
+    count = client.count(collection_name=COLLECTION_NAME, exact=True).count
+    points, _ = client.scroll(
+        collection_name=COLLECTION_NAME, limit=1, with_payload=["corpus_version"], with_vectors=False
+    )
+    stamped = (points[0].payload or {}).get("corpus_version") if points else None
+    return f"{stamped or 'unversioned'}:{count}"
 
-    Returns:
-        Dict with clinician_explanation, patient_explanation, sources,
-        rag_grounded, chunks_used, ai_enabled
+
+def qdrant_query_settings() -> tuple[int, str]:
+    """
+    (dim, quantization) to query Qdrant with: the collection's own, as read by the last
+    corpus check, else EMBEDDING_DIM / EMBEDDING_QUANTIZATION.
+    """
+    return _qdrant_settings or (EMBEDDING_DIM, EMBEDDING_QUANTIZATION)
+
+
+def _refresh_qdrant_settings(client) -> None:
+    """Read the collection's vector size and quantization; warn when they differ from the env."""
+    global _qdrant_settings
+    config = client.get_collection(COLLECTION_NAME).config
+    quantization_config = config.quantization_config
+    if quantization_config is None:
+        quantization = "none"
+    elif getattr(quantization_config, "binary", None) is not None:
+        quantization = "binary"
+    else:
+        quantization = "int8"
+    settings = (int(config.params.vectors.size), quantization)
+    if settings != _qdrant_settings and settings != (EMBEDDING_DIM, EMBEDDING_QUANTIZATION):
+        print(f"  ⚠ Qdrant collection '{COLLECTION_NAME}' holds {settings[0]}-dim {settings[1]} vectors but "
+              f"EMBEDDING_DIM/EMBEDDING_QUANTIZATION say {EMBEDDING_DIM}-dim {EMBEDDING_QUANTIZATION} — "
+              f"querying with the collection's settings; align the env with scripts/index_corpus.py")
+    _qdrant_settings = settings
+
+
+def ensure_context_packs(force: bool = False) -> bool:
+    """
+    Refresh the known corpus version, then rebuild the packs if they were built against
+    another one; True when rebuilt.
     """
+    global _known_corpus_version, _corpus_checked_at
+    version = live_corpus_version()
+    _known_corpus_version, _corpus_checked_at = version, time.monotonic()
+    packs = get_context_packs()
+    if packs is None:
+        return False
+    if not force and packs.matches(version, _pack_params()):
+        return False
+    if not _resources["embedder"].ready:
+        return False  # retrieval would run without vector search; build once it is loaded
+
+    queries = {rag_query(d, s) for d, s in rule_diagnosis_stages(rule_files())}
+    # strict: one degraded retrieval aborts the build (raises) rather than pinning ungrounded packs
+    built = packs.build(queries, lambda query: search_guideline_chunks(query, strict=True), version, _pack_params())
+    print(f"  ✓ context packs: {built} built for corpus {version}")
+    return True
+
+
+def _maybe_recheck_corpus() -> None:
+    """Every CONTEXT_PACKS_CHECK_SECONDS, check the corpus version (and rebuild) off the request path."""
+    global _corpus_checked_at
+    interval = float(os.getenv("CONTEXT_PACKS_CHECK_SECONDS", 300))
+    if time.monotonic() - _corpus_checked_at < interval or not _corpus_check_lock.acquire(blocking=False):
+        return
+    _corpus_checked_at = time.monotonic()
+
+    def check():
+        try:
+            ensure_context_packs()
+        except Exception as e:
+            print(f"  Corpus version check failed: {e}")
+        finally:
+            _corpus_check_lock.release()
+
+    threading.Thread(target=check, name="context-pack-check", daemon=True).start()
+
+
+# =============================================================
+# MAIN EXPLANATION FUNCTION
+# Fix 5: _force_no_context checked BEFORE RAG runs
+# Fix 6: Dynamic token allocation
+# =============================================================
 
-    # Feature flag check
-    if not ENABLE_AI:
+def _early_result(decision: dict):
+    """
+    Result for cases that never reach RAG/LLM (AI disabled, forced no-context),
+    or None when the full pipeline should run.
+    """
+    # Feature flag check; also degrade while the Groq clients are still loading rather
+    # than blocking the request (a missing embedder/Qdrant only drops the RAG context)
+    if ENABLE_AI and not resources_ready():
+        start_warm_up()
+    if not ENABLE_AI or not llm_ready():
+        if ENABLE_AI:
+            print(f"  LLM client still loading — explanation skipped")
         return {
             "clinician_explanation": "",
             "clinician_summary":     "",
@@ -575,49 +1494,25 @@ def generate_explanation(decision: dict, patient: dict) -> dict:
             "chunks_used":           0,
             "ai_enabled":            True
         }
+    return None
 
-    # ── Step 1: Retrieve guideline chunks ──────────────────────────
+
+def _retrieve_for_decision(decision: dict) -> tuple[list[str], list[str], str]:
+    """Step 1 of the pipeline: guideline chunks, their source labels and the joined context."""
     chunks, sources = retrieve_guideline_chunks(
         diagnosis=decision.get("diagnosis", ""),
         stage=decision.get("stage", ""),
         min_score=MIN_RAG_SCORE
     )
 
-    guideline_ctx = "\n\n".join(chunks) if chunks else ""
-
     print(f"  RAG: {len(chunks)} chunks retrieved for '{decision.get('diagnosis')}'")
     for s in sources:
         print(f"    {s}")
 
-    # ── Step 2: Calculate dynamic token limits ──────────────────────
-    # Fix 6: Prevents truncation on complex cases
-    clinician_tokens = calculate_max_tokens(decision, "clinician")
-    patient_tokens   = calculate_max_tokens(decision, "patient")
-
-    print(f"  Token budget: clinician={clinician_tokens}, patient={patient_tokens}")
-
-    # ── Step 3: Generate clinician explanation ──────────────────────
-    clinician_msg = build_clinician_user_message(decision, patient, guideline_ctx)
-    clinician_text = call_llm(
-        system_prompt=CLINICIAN_SYSTEM_PROMPT,
-        user_message=clinician_msg,
-        max_tokens=clinician_tokens,
-        temperature=0.1
-    )
-
-    # ── Step 4: Generate patient explanation ───────────────────────
-    patient_msg = build_patient_user_message(decision, patient)
-    patient_text = call_llm(
-        system_prompt=PATIENT_SYSTEM_PROMPT,
-        user_message=patient_msg,
-        max_tokens=patient_tokens,
-        temperature=0.3
-    )
+    return chunks, sources, "\n\n".join(chunks) if chunks else ""
 
-    # ── Step 5: Summarize for quick reading (default view in UI) ─────────────
-    clinician_summary = _summarize_explanation(clinician_text, "clinician")
-    patient_summary   = _summarize_explanation(patient_text, "patient")
 
+def _explanation_result(chunks, sources, clinician_text, clinician_summary, patient_text, patient_summary) -> dict:
     return {
         "clinician_explanation": clinician_text,
         "clinician_summary":     clinician_summary,
@@ -630,6 +1525,108 @@ def generate_explanation(decision: dict, patient: dict) -> dict:
     }
 
 
+def generate_explanation(decision: dict, patient: dict, vitals: dict = None) -> dict:
+    """
+    Full RAG + LLM pipeline. Generates both clinician and patient
+    explanations for a Drools engine decision.
+
+    The four Groq calls run as two independent branches:
+      patient text -> patient summary           (needs no RAG context)
+      retrieval -> clinician text -> clinician summary
+    The patient branch runs on a helper thread while this thread handles the
+    clinician branch. Use agenerate_explanation() from async code.
+
+    Args:
+        decision: Dict from Drools — diagnosis, stage, medications, tests, needsReferral
+        patient:  Dict — age, gender, systolic, diastolic
+        vitals:   How the prompts write age and blood pressure (default: the exact
+                  readings); the explanation cache passes the patient's bands so one
+                  cached text holds for every patient in its bucket
+
+    Returns:
+        Dict with clinician_explanation, patient_explanation, sources,
+        rag_grounded, chunks_used, ai_enabled
+    """
+    early = _early_result(decision)
+    if early is not None:
+        return early
+
+    # Fix 6: Dynamic token limits prevent truncation on complex cases
+    clinician_tokens = calculate_max_tokens(decision, "clinician")
+    patient_tokens   = calculate_max_tokens(decision, "patient")
+    print(f"  Token budget: clinician={clinician_tokens}, patient={patient_tokens}")
+
+    def patient_branch():
+        patient_text = call_llm(
+            system_prompt=PATIENT_SYSTEM_PROMPT,
+            user_message=build_patient_user_message(decision, patient, vitals),
+            max_tokens=patient_tokens,
+            temperature=0.3
+        )
+        return patient_text, _summarize_explanation(patient_text, "patient")
+
+    patient_future = _explanation_executor.submit(patient_branch)
+
+    chunks, sources, guideline_ctx = _retrieve_for_decision(decision)
+    clinician_text = call_llm(
+        system_prompt=CLINICIAN_SYSTEM_PROMPT,
+        user_message=build_clinician_user_message(decision, patient, guideline_ctx, vitals),
+        max_tokens=clinician_tokens,
+        temperature=0.1
+    )
+    clinician_summary = _summarize_explanation(clinician_text, "clinician")
+
+    patient_text, patient_summary = patient_future.result()
+    return _explanation_result(chunks, sources, clinician_text, clinician_summary, patient_text, patient_summary)
+
+
+async def agenerate_explanation(decision: dict, patient: dict, vitals: dict = None) -> dict:
+    """
+    Async generate_explanation() on the AsyncGroq client, run as a small dependency graph:
+
+      patient text ──────────────────────────> patient summary
+      retrieval ──> clinician text ──────────> clinician summary
+
+    Patient generation starts immediately, alongside retrieval; clinician generation starts
+    as soon as the chunks arrive; each summary starts as soon as its source text is ready.
+    Retrieval (embedding + Qdrant) is blocking and runs in a worker thread.
+    """
+    early = _early_result(decision)
+    if early is not None:
+        return early
+
+    clinician_tokens = calculate_max_tokens(decision, "clinician")
+    patient_tokens   = calculate_max_tokens(decision, "patient")
+    priority         = decision_priority(decision)
+    print(f"  Token budget: clinician={clinician_tokens}, patient={patient_tokens}")
+
+    async def patient_branch():
+        patient_text = await acall_llm(
+            system_prompt=PATIENT_SYSTEM_PROMPT,
+            user_message=build_patient_user_message(decision, patient, vitals),
+            max_tokens=patient_tokens,
+            temperature=0.3,
+            priority=priority
+        )
+        return patient_text, await _asummarize_explanation(patient_text, "patient", priority)
+
+    async def clinician_branch():
+        chunks, sources, guideline_ctx = await asyncio.to_thread(_retrieve_for_decision, decision)
+        clinician_text = await acall_llm(
+            system_prompt=CLINICIAN_SYSTEM_PROMPT,
+            user_message=build_clinician_user_message(decision, patient, guideline_ctx, vitals),
+            max_tokens=clinician_tokens,
+            temperature=0.1,
+            priority=priority
+        )
+        return chunks, sources, clinician_text, await _asummarize_explanation(clinician_text, "clinician", priority)
+
+    (patient_text, patient_summary), (chunks, sources, clinician_text, clinician_summary) = await asyncio.gather(
+        patient_branch(), clinician_branch()
+    )
+    return _explanation_result(chunks, sources, clinician_text, clinician_summary, patient_text, patient_summary)
+
+
 # =============================================================
 # SUMMARIZATION (for default concise view in UI)
 # =============================================================
@@ -661,6 +1658,135 @@ def _summarize_explanation(text: str, audience: str) -> str:
         return text.strip()
 
 
+async def _asummarize_explanation(text: str, audience: str, priority: int = PRIORITY_ROUTINE) -> str:
+    """Async _summarize_explanation(); starts as soon as its source text exists."""
+    if not text or not text.strip():
+        return ""
+    if len(text.strip()) <= 400:
+        return text.strip()
+    try:
+        summary = await acall_llm(
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            user_message=text.strip(),
+            max_tokens=350,
+            temperature=0.0,
+            priority=priority
+        )
+        return summary.strip() if summary else text.strip()
+    except Exception as e:
+        print(f"  Summarization failed ({audience}): {e}")
+        return text.strip()
+
+
+# =============================================================
+# STREAMING (server-sent events for /explain/stream)
+# =============================================================
+
+async def astream_explanation(decision: dict, patient: dict, vitals: dict = None):
+    """
+    Streaming agenerate_explanation(). Same dependency graph, but yields (event, data)
+    pairs while it runs; deltas of the two branches are interleaved:
+
+      ("delta",   {"section", "text"})   incremental text; section is one of
+                                         clinician, patient, clinician_summary, patient_summary
+      ("section", {"section", "text"})   a section is complete (full cleaned text)
+      ("sources", {"sources", "rag_grounded", "chunks_used"})
+      ("result",  dict)                  last: the generate_explanation() result
+
+    Text has already passed the incremental leakage filter.
+    """
+    early = _early_result(decision)
+    if early is not None:
+        yield "result", early
+        return
+
+    clinician_tokens = calculate_max_tokens(decision, "clinician")
+    patient_tokens   = calculate_max_tokens(decision, "patient")
+    priority         = decision_priority(decision)
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def stream_section(section: str, **llm_args) -> str:
+        parts = []
+        async for text in astream_llm(priority=priority, **llm_args):
+            parts.append(text)
+            await events.put(("delta", {"section": section, "text": text}))
+        full = "".join(parts).strip()
+        await events.put(("section", {"section": section, "text": full}))
+        return full
+
+    async def summary_section(section: str, text: str) -> str:
+        if not text or len(text.strip()) <= 400:
+            summary = (text or "").strip()
+            await events.put(("section", {"section": section, "text": summary}))
+            return summary
+        summary = await stream_section(
+            section,
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            user_message=text.strip(),
+            max_tokens=350,
+            temperature=0.0
+        )
+        if not summary:
+            # Same fallback as _asummarize_explanation(): the full text stands in
+            summary = text.strip()
+            await events.put(("section", {"section": section, "text": summary}))
+        return summary
+
+    async def patient_branch():
+        patient_text = await stream_section(
+            "patient",
+            system_prompt=PATIENT_SYSTEM_PROMPT,
+            user_message=build_patient_user_message(decision, patient, vitals),
+            max_tokens=patient_tokens,
+            temperature=0.3
+        )
+        return patient_text, await summary_section("patient_summary", patient_text)
+
+    async def clinician_branch():
+        chunks, sources, guideline_ctx = await asyncio.to_thread(_retrieve_for_decision, decision)
+        await events.put(("sources", {"sources": sources, "rag_grounded": len(chunks) > 0, "chunks_used": len(chunks)}))
+        clinician_text = await stream_section(
+            "clinician",
+            system_prompt=CLINICIAN_SYSTEM_PROMPT,
+            user_message=build_clinician_user_message(decision, patient, guideline_ctx, vitals),
+            max_tokens=clinician_tokens,
+            temperature=0.1
+        )
+        return chunks, sources, clinician_text, await summary_section("clinician_summary", clinician_text)
+
+    pipeline = asyncio.ensure_future(asyncio.gather(patient_branch(), clinician_branch()))
+    pipeline.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        (patient_text, patient_summary), (chunks, sources, clinician_text, clinician_summary) = pipeline.result()
+    finally:
+        if not pipeline.done():
+            pipeline.cancel()
+    yield "result", _explanation_result(chunks, sources, clinician_text, clinician_summary, patient_text, patient_summary)
+
+
+# =============================================================
+# PROMPT VERSION (explanation cache key)
+# Changes whenever a system prompt or the leakage filter changes; bump
+# PROMPT_REVISION by hand when the user-message builders change.
+# =============================================================
+
+PROMPT_REVISION = "2.1"
+
+def _prompt_version() -> str:
+    digest = hashlib.sha256()
+    for part in (CLINICIAN_SYSTEM_PROMPT, PATIENT_SYSTEM_PROMPT, SUMMARY_SYSTEM_PROMPT, *LEAKAGE_PHRASES):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return f"{PROMPT_REVISION}-{digest.hexdigest()[:12]}"
+
+PROMPT_VERSION = _prompt_version()
+
+
 # =============================================================
 # HEALTH CHECK
 # =============================================================
@@ -687,7 +1813,7 @@ def health_check() -> dict:
 
     # Check Qdrant
     try:
-        collections = qdrant_client.get_collections().collections
+        collections = get_qdrant_client().get_collections().collections
         collection_names = [c.name for c in collections]
         status["qdrant"] = COLLECTION_NAME in collection_names
         status["qdrant_collections"] = collection_names
@@ -696,8 +1822,8 @@ def health_check() -> dict:
 
     # Check embedder
     try:
-        test_vec = embedder.encode("test")
-        status["embedder"] = len(test_vec) == 768
+        test_vec = get_embedder().encode("test")
+        status["embedder"] = len(test_vec) == embedding_codec.FULL_DIM
     except Exception as e:
         print(f"Embedder health check failed: {e}")
 
@@ -721,6 +1847,9 @@ if __name__ == "__main__":
     print("NCD-CDS llm_service.py v2.0 — Standalone Test")
     print("="*60)
 
+    print("\n─── Warm-up ────────────────────────────────────────────")
+    warm_up()
+
     # Health check
     print("\n─── Health Check ───────────────────────────────────────")
     health = health_check()
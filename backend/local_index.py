@@ -0,0 +1,209 @@
+# local_index.py
+# In-process vector index over the RAG corpus: a memory-mapped matrix of L2-normalized
+# embeddings (vectors.npy) plus a compact payload store (payloads.json), searched with
+# one vectorized dot product. Written by scripts/index_corpus.py next to the Qdrant
+# upload; llm_service uses it as the retrieval backend (RAG_BACKEND=local) or as the
+# automatic fallback when Qdrant is unreachable.
+#
+# Vectors are stored at the index's Matryoshka dim / quantization (embedding_codec);
+# queries are prepared with the same settings from meta.json, whatever the env says.
+#
+# Each build writes a complete generation into its own subdirectory and then swaps the
+# CURRENT pointer file (the one commit point), so a process opening the index mid-rebuild
+# sees either the old files or the new ones, never a mix. lexical_index uses the same
+# layout (write_generation() / index_generation()).
+
+import glob
+import json
+import os
+import shutil
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+import embedding_codec
+
+INDEX_SCHEMA_VERSION = 2
+_ARRAY_NAMES = ("vectors", "scales", "bits")
+CURRENT_FILE = "CURRENT"
+
+# Payload fields retrieval reads; everything else stays in the corpus file
+PAYLOAD_FIELDS = ("text", "source", "page")
+
+
+def index_generation(directory: str) -> Optional[str]:
+    """
+    Directory holding the index generation CURRENT names; `directory` itself for an index
+    written before generations (flat layout), None when there is no index.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as f:
+            generation = f.read().strip()
+    except OSError:
+        return directory if os.path.exists(os.path.join(directory, "meta.json")) else None
+    return os.path.join(directory, generation) if generation else None
+
+
+def write_generation(directory: str, files: Dict[str, Callable]) -> str:
+    """
+    Write `files` (name -> write(binary file)) into a new generation of `directory`, then
+    point CURRENT at it atomically. The previous generation is kept for readers that
+    resolved it just before the swap; older ones (and flat-layout files) are removed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = index_generation(directory)
+    generation = f"gen-{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+    for name, write in files.items():
+        with open(os.path.join(path, name), "wb") as f:
+            write(f)
+
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(pointer + f".{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(pointer + f".{os.getpid()}.tmp", pointer)
+
+    keep = {path, previous}
+    for old in glob.glob(os.path.join(directory, "gen-*")):
+        if old not in keep:
+            shutil.rmtree(old, ignore_errors=True)
+    flat = [os.path.join(directory, name) for name in files] + glob.glob(os.path.join(directory, "*.npy"))
+    for old in flat:
+        if os.path.exists(old):
+            os.remove(old)
+    return path
+
+
+class LocalHit:
+    """Same shape as a Qdrant ScoredPoint as far as retrieval is concerned (id, score, payload)."""
+
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, id: int, score: float, payload: dict):
+        self.id = id
+        self.score = score
+        self.payload = payload
+
+
+class LocalVectorIndex:
+    """
+    Read-only index loaded from the current generation of `directory` (or in_memory());
+    see build() for the writer.
+    """
+
+    def __init__(self, directory: Optional[str] = None, arrays: Optional[Dict[str, np.ndarray]] = None,
+                 payloads: Optional[List[dict]] = None, meta: Optional[dict] = None):
+        self.directory = directory
+        self.generation = None
+        if directory is not None:
+            self.generation = index_generation(directory)
+            if self.generation is None:
+                raise FileNotFoundError(f"no local index at {directory}")
+            with open(os.path.join(self.generation, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("schema_version") != INDEX_SCHEMA_VERSION:
+                raise ValueError(f"unsupported local index schema {meta.get('schema_version')}")
+            with open(os.path.join(self.generation, "payloads.json"), "r", encoding="utf-8") as f:
+                payloads = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(self.generation, f"{name}.npy"), mmap_mode="r")
+                for name in _ARRAY_NAMES if os.path.exists(os.path.join(self.generation, f"{name}.npy"))
+            }
+        self.meta, self.payloads, self.arrays = meta, payloads, arrays
+        self.dim, self.quantization = embedding_codec.validate(meta.get("dim"), meta.get("quantization"))
+        # Quantized codes scored without their scales would rank silently wrong
+        required = {"none": ("vectors",), "int8": ("vectors", "scales"), "binary": _ARRAY_NAMES}[self.quantization]
+        missing = [name for name in required if name not in self.arrays]
+        if missing:
+            raise ValueError(f"local index at {directory} ({self.quantization}) is missing {', '.join(missing)}")
+        if self.arrays["vectors"].shape[0] != len(self.payloads):
+            raise ValueError(f"local index at {directory} has {self.arrays['vectors'].shape[0]} vectors "
+                             f"but {len(self.payloads)} payloads")
+        self._sources = np.array([p.get("source", "") for p in self.payloads], dtype=object)
+
+    @classmethod
+    def in_memory(cls, embeddings, corpus: List[dict], dim: int = embedding_codec.FULL_DIM,
+                  quantization: str = "none") -> "LocalVectorIndex":
+        """An index that is never written to disk (recall measurements)."""
+        arrays = embedding_codec.encode_documents(embeddings, dim, quantization)
+        return cls(arrays=arrays, payloads=_payloads(corpus), meta={"dim": dim, "quantization": quantization})
+
+    @property
+    def corpus_version(self) -> Optional[str]:
+        return self.meta.get("corpus_version")
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.meta.get("embedding_model")
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def _top(self, scores: np.ndarray, candidates: np.ndarray, limit: int, score_threshold: Optional[float]) -> List[LocalHit]:
+        """`scores` is aligned with `candidates` (row ids)."""
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [LocalHit(int(candidates[i]), float(scores[i]), self.payloads[candidates[i]]) for i in order]
+
+    def search(
+        self,
+        query_vector,
+        limit: int = 5,
+        score_threshold: Optional[float] = None,
+        source: Optional[str] = None,
+    ) -> List[LocalHit]:
+        return self.search_many(query_vector, [{"limit": limit, "score_threshold": score_threshold, "source": source}])[0]
+
+    def search_many(self, query_vector, requests: Iterable[dict]) -> List[List[LocalHit]]:
+        """
+        Several searches (kwargs of search()) for one full-size query embedding, sharing
+        one similarity pass. With binary quantization each search shortlists by Hamming
+        distance and rescores only the shortlist.
+        """
+        query = embedding_codec.matryoshka(query_vector, self.dim)
+        everything = np.arange(len(self.payloads))
+        full_scores = None if self.quantization == "binary" else embedding_codec.scores(self.arrays, query)
+        results = []
+        for r in requests:
+            candidates = np.flatnonzero(self._sources == r["source"]) if r.get("source") else everything
+            limit = r.get("limit", 5)
+            if full_scores is not None:
+                scores = full_scores[candidates]
+            else:
+                shortlist = min(len(candidates), limit * embedding_codec.BINARY_RESCORE_FACTOR)
+                if shortlist < len(candidates):
+                    distances = embedding_codec.hamming(self.arrays, query, candidates)
+                    candidates = np.sort(candidates[np.argpartition(distances, shortlist - 1)[:shortlist]])
+                scores = embedding_codec.scores(self.arrays, query, candidates)
+            results.append(self._top(scores, candidates, limit, r.get("score_threshold")))
+        return results
+
+    @staticmethod
+    def build(directory: str, embeddings, corpus: List[dict], corpus_version: str, embedding_model: str,
+              dim: int = embedding_codec.FULL_DIM, quantization: str = "none") -> None:
+        """Write (atomically replace) an index for `corpus` and its full-size embeddings, row i = chunk i."""
+        arrays = embedding_codec.encode_documents(embeddings, dim, quantization)
+        payloads = _payloads(corpus)
+        meta = {
+            "schema_version": INDEX_SCHEMA_VERSION,
+            "corpus_version": corpus_version,
+            "embedding_model": embedding_model,
+            "dim": int(dim),
+            "quantization": quantization,
+            "count": len(payloads),
+        }
+        files = {f"{name}.npy": (lambda array: lambda f: np.save(f, array))(array) for name, array in arrays.items()}
+        files["payloads.json"] = lambda f: f.write(json.dumps(payloads, ensure_ascii=False).encode("utf-8"))
+        files["meta.json"] = lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8"))
+        write_generation(directory, files)
+
+
+def _payloads(corpus: List[dict]) -> List[dict]:
+    return [{field: chunk.get(field, "" if field != "page" else 0) for field in PAYLOAD_FIELDS} for chunk in corpus]
@@ -0,0 +1,179 @@
+# onnx_embedder.py
+# nomic-embed-text-v1.5 as an ONNX Runtime graph with dynamically int8-quantized
+# weights: the same vectors as the SentenceTransformer (mean pooling, normalization)
+# without PyTorch at inference time, for query embedding and re-indexing on CPU.
+#
+# export() writes model_int8.onnx, the tokenizer and meta.json into a directory;
+# scripts/export_onnx_embedder.py runs it and records the parity check (cosine
+# agreement with the PyTorch vectors over the corpus) in meta.json. llm_service only
+# loads an export whose parity check passed (EMBEDDER_RUNTIME / ONNX_EMBEDDER_DIR).
+
+import importlib.util
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+EXPORT_SCHEMA_VERSION = 1
+MODEL_FILE = "model_int8.onnx"
+ONNX_OPSET = 17
+
+# Worst-case cosine with the PyTorch vector an export must reach to be served
+PARITY_MIN_COSINE = 0.99
+
+_INPUT_NAMES = ("input_ids", "token_type_ids", "attention_mask")
+
+
+def read_meta(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("schema_version") == EXPORT_SCHEMA_VERSION else None
+
+
+def _write_meta(directory: str, meta: dict) -> None:
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def usable(directory: str, model_name: str) -> bool:
+    """An export of `model_name` exists in `directory`, passed its parity check, and onnxruntime is installed."""
+    meta = read_meta(directory)
+    return (
+        meta is not None
+        and importlib.util.find_spec("onnxruntime") is not None
+        and meta.get("embedding_model") == model_name
+        and bool((meta.get("parity") or {}).get("passed"))
+        and os.path.exists(os.path.join(directory, MODEL_FILE))
+    )
+
+
+class OnnxEmbedder:
+    """SentenceTransformer-compatible encode() over an export() directory."""
+
+    def __init__(self, directory: str, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.directory = directory
+        self.meta = read_meta(directory)
+        if self.meta is None:
+            raise FileNotFoundError(f"no ONNX embedder export in {directory}")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(directory, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self._inputs = [i.name for i in self.session.get_inputs()]
+        self.max_seq_length = self.meta["max_seq_length"]
+        self.normalize = self.meta["normalize"]
+        self.dim = self.meta["dim"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        batch = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        hidden = self.session.run(None, {name: batch[name].astype(np.int64) for name in self._inputs})[0]
+        mask = batch["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        # Length-sorted batches pad far less than corpus order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            vectors[rows] = self._encode_batch([texts[i] for i in rows])
+        return vectors[0] if single else vectors
+
+
+def export(model, directory: str, model_name: str) -> dict:
+    """
+    Export a loaded SentenceTransformer's transformer to ONNX, quantize its weights to
+    int8 (dynamic activations) and save the tokenizer. Parity is recorded separately
+    (record_parity), so a fresh export is not served until it has been checked.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers.models import Normalize, Pooling
+
+    pooling = next((m for m in model if isinstance(m, Pooling)), None)
+    if pooling is None or pooling.get_pooling_mode_str() != "mean":
+        raise ValueError("only mean-pooled SentenceTransformers can be exported")
+
+    transformer = model[0].auto_model.eval()
+    sample = model.tokenizer(["warm-up", "a longer warm-up sentence"], padding=True, return_tensors="pt")
+    input_names = [name for name in _INPUT_NAMES if name in sample]
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)))[0]
+
+    os.makedirs(directory, exist_ok=True)
+    fp32_path = os.path.join(directory, "model_fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=ONNX_OPSET,
+        )
+    quantize_dynamic(fp32_path, os.path.join(directory, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    model.tokenizer.save_pretrained(directory)
+
+    meta = {
+        "schema_version": EXPORT_SCHEMA_VERSION,
+        "embedding_model": model_name,
+        "dim": int(model.get_sentence_embedding_dimension()),
+        "max_seq_length": int(model.max_seq_length),
+        "normalize": any(isinstance(m, Normalize) for m in model),
+        "opset": ONNX_OPSET,
+        "quantization": "dynamic-int8",
+        "parity": None,
+    }
+    _write_meta(directory, meta)
+    return meta
+
+
+def parity(reference, candidate, min_cosine: float = PARITY_MIN_COSINE) -> dict:
+    """Row-wise cosine agreement between PyTorch (`reference`) and ONNX vectors of the same texts."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosine = (reference * candidate).sum(axis=1) / np.maximum(
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1), 1e-12
+    )
+    return {
+        "samples": int(len(cosine)),
+        "min_cosine": round(float(cosine.min()), 5) if len(cosine) else None,
+        "p01_cosine": round(float(np.percentile(cosine, 1)), 5) if len(cosine) else None,
+        "mean_cosine": round(float(cosine.mean()), 5) if len(cosine) else None,
+        "threshold": min_cosine,
+        "passed": bool(len(cosine)) and float(cosine.min()) >= min_cosine,
+    }
+
+
+def record_parity(directory: str, report: dict) -> None:
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"no ONNX embedder export in {directory}")
+    meta["parity"] = report
+    _write_meta(directory, meta)
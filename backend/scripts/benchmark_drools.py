@@ -0,0 +1,218 @@
+# scripts/benchmark_drools.py
+# Rule-engine latency benchmark over synthetic patient populations.
+#
+# For each engine backend (worker / jpype / subprocess) it measures the cold first
+# evaluation, warm single-patient latency (p50/p95/p99, throughput) and batch latency
+# per batch size, and writes one JSON file per run so releases can be compared.
+#
+#   python scripts/benchmark_drools.py --engines worker,jpype --batch-sizes 1,10,100
+#   python scripts/benchmark_drools.py --baseline benchmarks/drools-v1.json --max-regression 0.2
+#
+# The decision cache is disabled unless --with-decision-cache is given (synthetic
+# populations would otherwise be served from memory after the first pass).
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic_patients import generate_population  # noqa: E402
+
+RESULT_SCHEMA_VERSION = 1
+
+
+def _percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def summarize(latencies_ms: List[float], items: int, wall_s: float, errors: int) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    return {
+        "samples": len(ordered),
+        "items": items,
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(ordered), 3) if ordered else None,
+        "p50_ms": _percentile(ordered, 50),
+        "p95_ms": _percentile(ordered, 95),
+        "p99_ms": _percentile(ordered, 99),
+        "max_ms": round(ordered[-1], 3) if ordered else None,
+        "throughput_per_s": round(items / wall_s, 2) if wall_s > 0 else None,
+    }
+
+
+async def bench_engine(engine: str, population, args) -> List[Dict[str, Any]]:
+    from app.services.drools_integration import DroolsIntegrationService
+
+    service = DroolsIntegrationService(engine_mode=engine)
+    results = []
+    iterations = args.subprocess_iterations if engine == "subprocess" else args.iterations
+    try:
+        # Cold: first evaluation pays JVM start / KieBase load
+        started = time.perf_counter()
+        response = await service.evaluate_patient_async(population[0])
+        cold_ms = (time.perf_counter() - started) * 1000
+        results.append({
+            "engine": engine, "scenario": "cold", "batch_size": 1,
+            **summarize([cold_ms], 1, cold_ms / 1000, 0 if response.success else 1),
+        })
+        print(f"  {engine:<10} cold           {cold_ms:9.1f} ms")
+
+        for _ in range(min(args.warmup, iterations)):
+            await service.evaluate_patient_async(population[0])
+
+        # Warm, one patient at a time
+        latencies, errors = [], 0
+        wall_started = time.perf_counter()
+        for index in range(iterations):
+            patient = population[index % len(population)]
+            started = time.perf_counter()
+            response = await service.evaluate_patient_async(patient)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += 0 if response.success else 1
+        summary = summarize(latencies, iterations, time.perf_counter() - wall_started, errors)
+        results.append({"engine": engine, "scenario": "warm", "batch_size": 1, **summary})
+        print(f"  {engine:<10} warm           p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+              f"p99 {summary['p99_ms']} ms  {summary['throughput_per_s']}/s  errors {errors}")
+
+        # Batches through the same path as POST /evaluate-batch
+        for batch_size in args.batch_sizes:
+            batches = max(1, min(args.batches, iterations // batch_size or 1))
+            latencies, errors, items = [], 0, 0
+            wall_started = time.perf_counter()
+            for batch_index in range(batches):
+                offset = (batch_index * batch_size) % len(population)
+                batch = (population[offset:] + population[:offset])[:batch_size]
+                started = time.perf_counter()
+                responses = await service.batch_evaluate_patients_async(batch)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += sum(1 for r in responses if not r.success)
+                items += len(batch)
+            summary = summarize(latencies, items, time.perf_counter() - wall_started, errors)
+            results.append({"engine": engine, "scenario": "batch", "batch_size": batch_size, **summary})
+            print(f"  {engine:<10} batch x{batch_size:<6} p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+                  f"{summary['throughput_per_s']} patients/s  errors {errors}")
+
+        stats = service.engine_stats()
+        results.append({"engine": engine, "scenario": "engine_stats", "batch_size": None, "stats": stats})
+    finally:
+        service.shutdown()
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> bool:
+    """Print p95 deltas against a previous run; False when any scenario regressed too far."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {
+        (r["engine"], r["scenario"], r["batch_size"]): r
+        for r in baseline.get("results", []) if r.get("p95_ms") is not None
+    }
+
+    ok = True
+    print(f"\n─── Compared with {baseline_path} (max regression {max_regression:.0%}) ───")
+    for result in results:
+        key = (result["engine"], result["scenario"], result["batch_size"])
+        if result.get("p95_ms") is None or key not in previous or result["scenario"] == "cold":
+            continue
+        before, after = previous[key]["p95_ms"], result["p95_ms"]
+        change = (after - before) / before if before else 0.0
+        regressed = change > max_regression
+        ok = ok and not regressed
+        mark = "✗" if regressed else "✓"
+        print(f"  {mark} {key[0]:<10} {key[1]:<6} x{key[2]!s:<5} p95 {before:9.2f} -> {after:9.2f} ms ({change:+.1%})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Drools rule engine backends")
+    parser.add_argument("--engines", default="worker,jpype,subprocess")
+    parser.add_argument("--batch-sizes", default="1,10,100")
+    parser.add_argument("--population", type=int, default=500, help="synthetic patients to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=300, help="warm single evaluations per engine")
+    parser.add_argument("--subprocess-iterations", type=int, default=5, help="subprocess mode starts a JVM per call")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=10, help="batches per batch size")
+    parser.add_argument("--pool-size", type=int, default=None, help="override DROOLS_WORKER_POOL_SIZE")
+    parser.add_argument("--with-decision-cache", action="store_true")
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/drools-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase vs baseline")
+    args = parser.parse_args()
+
+    args.engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    args.batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    if not args.with_decision_cache:
+        os.environ["DECISION_CACHE_ENABLED"] = "false"
+    if args.pool_size is not None:
+        os.environ["DROOLS_WORKER_POOL_SIZE"] = str(args.pool_size)
+
+    population = generate_population(args.population, seed=args.seed)
+    print(f"Generated {len(population)} synthetic patients (seed {args.seed})")
+
+    async def run_all():
+        results = []
+        for engine in args.engines:
+            try:
+                results.extend(await bench_engine(engine, population, args))
+            except Exception as e:
+                print(f"  ✗ {engine}: {e}")
+                results.append({"engine": engine, "scenario": "failed", "batch_size": None, "error": str(e)})
+        return results
+
+    results = asyncio.run(run_all())
+
+    started_at = datetime.now(timezone.utc)
+    report = {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "meta": {
+            "timestamp": started_at.isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "population": args.population,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "pool_size": os.getenv("DROOLS_WORKER_POOL_SIZE", "2"),
+            "wire_format": os.getenv("DROOLS_WIRE_FORMAT", "json"),
+            "decision_cache": args.with_decision_cache,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join("benchmarks", f"drools-{started_at:%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# scripts/benchmark_embedder.py
+# Embedder latency: PyTorch vs the int8 ONNX export (scripts/export_onnx_embedder.py).
+# Measures single-query encode latency over the rule queries (what retrieval pays on
+# a memo miss) and corpus encode throughput (what re-indexing pays), and reports the
+# cosine parity of both runtimes on the same texts.
+#
+#   python scripts/benchmark_embedder.py --rounds 5 --corpus-sample 256
+#   python scripts/benchmark_embedder.py --baseline benchmarks/embedder-v1.json --max-regression 0.2
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import onnx_embedder  # noqa: E402
+from benchmark_drools import _git_revision, compare, summarize  # noqa: E402
+from embedding_memo import rule_diagnosis_stages, rule_files  # noqa: E402
+from llm_service import EMBEDDING_MODEL, ONNX_EMBEDDER_DIR, load_sentence_transformer, rag_query  # noqa: E402
+
+RESULT_SCHEMA_VERSION = 1
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "rag_corpus_semantic.json")
+
+
+def bench(name: str, embedder, queries, chunks, rounds: int, batch_size: int) -> list:
+    embedder.encode(queries[:1])
+    latencies = []
+    wall_started = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            started = time.perf_counter()
+            embedder.encode(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+    query = summarize(latencies, len(latencies), time.perf_counter() - wall_started, 0)
+
+    started = time.perf_counter()
+    embedder.encode(chunks, batch_size=batch_size)
+    corpus_s = time.perf_counter() - started
+    corpus = summarize([corpus_s * 1000], len(chunks), corpus_s, 0)
+
+    print(f"  {name:<10} query p50 {query['p50_ms']} ms  p95 {query['p95_ms']} ms   "
+          f"corpus {corpus['throughput_per_s']} chunks/s")
+    return [
+        {"engine": name, "scenario": "query", "batch_size": 1, **query},
+        {"engine": name, "scenario": "corpus", "batch_size": batch_size, **corpus},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedder: PyTorch vs int8 ONNX")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--corpus-sample", type=int, default=256, help="chunks encoded for the throughput run (0 = all)")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the rule queries per runtime")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--onnx-dir", default=ONNX_EMBEDDER_DIR)
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/embedder-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase vs baseline")
+    args = parser.parse_args()
+
+    queries = sorted({rag_query(d, s) for d, s in rule_diagnosis_stages(rule_files())})
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        chunks = [c["text"] for c in json.load(f)]
+    if args.corpus_sample:
+        chunks = chunks[:args.corpus_sample]
+    print(f"{len(queries)} rule queries, {len(chunks)} corpus chunks")
+
+    runtimes = {"torch": load_sentence_transformer()}
+    if onnx_embedder.read_meta(args.onnx_dir) is not None:
+        runtimes["onnx-int8"] = onnx_embedder.OnnxEmbedder(args.onnx_dir)
+    else:
+        print(f"  ✗ no ONNX export in {args.onnx_dir} — run scripts/export_onnx_embedder.py")
+
+    results = []
+    for name, embedder in runtimes.items():
+        results.extend(bench(name, embedder, queries, chunks, args.rounds, args.batch_size))
+
+    parity = None
+    if "onnx-int8" in runtimes:
+        texts = queries + chunks
+        parity = onnx_embedder.parity(runtimes["torch"].encode(texts, batch_size=args.batch_size),
+                                      runtimes["onnx-int8"].encode(texts, batch_size=args.batch_size))
+        torch_query, onnx_query = results[0], results[2]
+        torch_corpus, onnx_corpus = results[1], results[3]
+        print(f"  onnx-int8 vs torch: query p50 {onnx_query['p50_ms'] / torch_query['p50_ms'] - 1:+.1%}, "
+              f"corpus throughput {onnx_corpus['throughput_per_s'] / torch_corpus['throughput_per_s']:.2f}x, "
+              f"cosine min {parity['min_cosine']} mean {parity['mean_cosine']}")
+
+    started_at = datetime.now(timezone.utc)
+    report = {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "meta": {
+            "timestamp": started_at.isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedding_model": EMBEDDING_MODEL,
+            "queries": len(queries),
+            "corpus_chunks": len(chunks),
+            "rounds": args.rounds,
+            "parity": parity,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join("benchmarks", f"embedder-{started_at:%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# scripts/benchmark_retrieval.py
+# RAG retrieval latency: the batched single round-trip search (search_guideline_chunks)
+# against the previous two sequential query_points calls, over the query of every
+# diagnosis/stage pair in the DRL rules. Query embeddings are memoized before timing,
+# so only the Qdrant path is measured. Both paths must return the same chunks.
+#
+#   python scripts/benchmark_retrieval.py --rounds 20
+#   python scripts/benchmark_retrieval.py --baseline benchmarks/retrieval-v1.json --max-regression 0.2
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import llm_service  # noqa: E402
+from benchmark_drools import _git_revision, compare, summarize  # noqa: E402
+from embedding_memo import rule_diagnosis_stages, rule_files  # noqa: E402
+
+RESULT_SCHEMA_VERSION = 1
+
+def search_batched(query: str):
+    # Forget lexical-only queries first: a remembered one skips Qdrant, and the
+    # comparison with the sequential path is only like-for-like with the round trip
+    llm_service._lexical_only_queries.clear()
+    return llm_service.search_guideline_chunks(query)
+
+
+SEARCHES = {
+    "sequential": llm_service.search_guideline_chunks_sequential,
+    "batched": search_batched,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG retrieval: batched vs sequential Qdrant search")
+    parser.add_argument("--rounds", type=int, default=10, help="passes over all rule queries per path")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/retrieval-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase vs baseline")
+    args = parser.parse_args()
+
+    queries = sorted({llm_service.rag_query(d, s) for d, s in rule_diagnosis_stages(rule_files())})
+    print(f"{len(queries)} rule queries against {llm_service.COLLECTION_NAME}")
+    llm_service.get_embedder()
+    llm_service.prefill_query_embeddings()
+    for query in queries:
+        llm_service.embed_query(query)
+
+    mismatches = [q for q in queries if SEARCHES["sequential"](q) != SEARCHES["batched"](q)]
+    if mismatches:
+        print(f"  ✗ {len(mismatches)} quer(ies) return different chunks, e.g. '{mismatches[0]}'")
+
+    results = []
+    for name, search in SEARCHES.items():
+        for _ in range(args.warmup):
+            for query in queries:
+                search(query)
+        latencies = []
+        wall_started = time.perf_counter()
+        for _ in range(args.rounds):
+            for query in queries:
+                started = time.perf_counter()
+                search(query)
+                latencies.append((time.perf_counter() - started) * 1000)
+        summary = summarize(latencies, len(latencies), time.perf_counter() - wall_started, 0)
+        results.append({"engine": "qdrant", "scenario": name, "batch_size": 1, **summary})
+        print(f"  {name:<11} p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+              f"p99 {summary['p99_ms']} ms  {summary['throughput_per_s']}/s")
+
+    sequential, batched = results[0], results[1]
+    if sequential["p50_ms"] and batched["p50_ms"]:
+        print(f"  batched vs sequential: p50 {batched['p50_ms'] / sequential['p50_ms'] - 1:+.1%}, "
+              f"p95 {batched['p95_ms'] / sequential['p95_ms'] - 1:+.1%}")
+
+    started_at = datetime.now(timezone.utc)
+    report = {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "meta": {
+            "timestamp": started_at.isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "collection": llm_service.COLLECTION_NAME,
+            "qdrant": f"{llm_service.QDRANT_HOST}:{llm_service.QDRANT_PORT}",
+            "queries": len(queries),
+            "rounds": args.rounds,
+            "mismatched_queries": mismatches,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join("benchmarks", f"retrieval-{started_at:%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# scripts/build_context_packs.py
+# Offline build of the guideline context packs: runs RAG retrieval for every
+# diagnosis/stage pair in the DRL rules against the live Qdrant collection and
+# writes the ranked chunks + source labels with the corpus version.
+#
+#   python scripts/build_context_packs.py            # rebuild only if the corpus changed
+#   python scripts/build_context_packs.py --force
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import llm_service  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build RAG context packs for every rule diagnosis/stage")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the corpus version is unchanged")
+    args = parser.parse_args()
+
+    packs = llm_service.get_context_packs()
+    if packs is None:
+        print("✗ CONTEXT_PACKS_ENABLED is false — nothing to build")
+        sys.exit(1)
+
+    llm_service.get_embedder()
+    llm_service.prefill_query_embeddings()
+    if llm_service.ensure_context_packs(force=args.force):
+        print(f"✓ Context packs written to {packs.path}")
+    else:
+        print(f"✓ Context packs already current for corpus {packs.corpus_version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# scripts/export_onnx_embedder.py
+# Exports nomic-embed-text-v1.5 to ONNX with dynamic int8 weights (onnx_embedder.py)
+# and checks parity: every corpus chunk (and rule query) is embedded by PyTorch and
+# by the export, and the worst-case cosine must reach --min-cosine. The result is
+# recorded in the export's meta.json; llm_service (EMBEDDER_RUNTIME=auto) and
+# scripts/index_corpus.py only use an export that passed.
+#
+#   python scripts/export_onnx_embedder.py --corpus scripts/rag_corpus_semantic.json
+#   python scripts/export_onnx_embedder.py --check-only      # re-run parity on an existing export
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import onnx_embedder  # noqa: E402
+from embedding_memo import rule_diagnosis_stages, rule_files  # noqa: E402
+from llm_service import EMBEDDING_MODEL, ONNX_EMBEDDER_DIR, load_sentence_transformer, rag_query  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "rag_corpus_semantic.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedder to int8 ONNX and check parity with PyTorch")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="corpus JSON whose chunks the parity check embeds")
+    parser.add_argument("--output-dir", default=ONNX_EMBEDDER_DIR, help="export directory (default: ONNX_EMBEDDER_DIR)")
+    parser.add_argument("--min-cosine", type=float, default=onnx_embedder.PARITY_MIN_COSINE)
+    parser.add_argument("--check-only", action="store_true", help="skip the export, re-check an existing one")
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        texts = [c["text"] for c in json.load(f)]
+    texts += sorted({rag_query(d, s) for d, s in rule_diagnosis_stages(rule_files())})
+
+    print(f"Loading {EMBEDDING_MODEL} (PyTorch)...")
+    model = load_sentence_transformer()
+
+    if not args.check_only:
+        started = time.perf_counter()
+        meta = onnx_embedder.export(model, args.output_dir, EMBEDDING_MODEL)
+        print(f"✓ Exported to {os.path.abspath(args.output_dir)} in {time.perf_counter() - started:.1f}s "
+              f"({meta['dim']}-dim, {meta['quantization']}, opset {meta['opset']})")
+
+    print(f"Parity check over {len(texts)} corpus chunks + rule queries...")
+    reference = model.encode(texts, batch_size=16, show_progress_bar=True)
+    candidate = onnx_embedder.OnnxEmbedder(args.output_dir).encode(texts, batch_size=16)
+    report = onnx_embedder.parity(reference, candidate, args.min_cosine)
+    onnx_embedder.record_parity(args.output_dir, report)
+
+    print(f"  cosine min {report['min_cosine']}  p01 {report['p01_cosine']}  mean {report['mean_cosine']}")
+    if report["passed"]:
+        print(f"✓ Parity passed (≥ {args.min_cosine}); EMBEDDER_RUNTIME=auto will use the export")
+    else:
+        print(f"✗ Parity failed (< {args.min_cosine}); the export will not be served")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
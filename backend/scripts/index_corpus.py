@@ -1,14 +1,81 @@
 # scripts/index_corpus.py
-# Indexes rag_corpus_semantic.json into local Docker Qdrant
+# Indexes rag_corpus_semantic.json into local Docker Qdrant, and writes the same
+# embeddings as the in-process local index (local_index.py, RAG_BACKEND=local and
+# the fallback when Qdrant is unreachable) plus the BM25 lexical index fused with
+# them at query time (lexical_index.py)
 # Run once: python scripts/index_corpus.py --corpus backend/scripts/rag_corpus_semantic.json
 
+import os
+import sys
 import json
+import hashlib
 import argparse
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    PointStruct,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
 
-def main(corpus_path: str, qdrant_host: str):
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import embedding_codec  # noqa: E402
+from embedding_memo import rule_diagnosis_stages, rule_files  # noqa: E402
+from lexical_index import LexicalIndex  # noqa: E402
+from local_index import LocalVectorIndex  # noqa: E402
+
+DEFAULT_LOCAL_INDEX_DIR = os.path.join(os.path.dirname(__file__), "..", ".cache", "local_index")
+DEFAULT_LEXICAL_INDEX_DIR = os.path.join(os.path.dirname(__file__), "..", ".cache", "lexical_index")
+
+
+def _quantization_config(quantization: str):
+    if quantization == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True))
+    if quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def recall_report(embeddings, corpus, query_vectors, k: int, chosen: tuple) -> list:
+    """
+    recall@k of every dim/quantization setting against full-precision 768-dim search,
+    over the rule diagnosis/stage queries (same search code as the local index).
+    """
+    reference = LocalVectorIndex.in_memory(embeddings, corpus)
+    expected = [{h.id for h in reference.search(q, limit=k)} for q in query_vectors]
+
+    rows = []
+    print(f"\n─── recall@{k} vs full precision ({len(query_vectors)} rule queries) ───")
+    print(f"  {'dim':>5} {'quantization':<13} {'recall':>7} {'bytes/vector':>13}")
+    for dim in sorted(embedding_codec.SUPPORTED_DIMS, reverse=True):
+        for quantization in embedding_codec.QUANTIZATIONS:
+            index = LocalVectorIndex.in_memory(embeddings, corpus, dim, quantization)
+            found = [{h.id for h in index.search(q, limit=k)} for q in query_vectors]
+            recall = sum(len(f & e) / max(1, len(e)) for f, e in zip(found, expected)) / max(1, len(expected))
+            size = embedding_codec.bytes_per_vector(dim, quantization)
+            mark = "  ← indexed" if (dim, quantization) == chosen else ""
+            print(f"  {dim:>5} {quantization:<13} {recall:>7.3f} {size:>13}{mark}")
+            rows.append({"dim": dim, "quantization": quantization, "k": k,
+                         "recall": round(recall, 4), "bytes_per_vector": size})
+    return rows
+
+
+def main(
+    corpus_path: str,
+    qdrant_host: str,
+    local_index_dir: str = DEFAULT_LOCAL_INDEX_DIR,
+    dim: int = embedding_codec.FULL_DIM,
+    quantization: str = "none",
+    recall_k: int = 5,
+    runtime: str = "auto",
+    lexical_index_dir: str = DEFAULT_LEXICAL_INDEX_DIR,
+):
+    dim, quantization = embedding_codec.validate(dim, quantization)
 
     # ── Step 1: Load corpus ─────────────────────────────────────────
     with open(corpus_path, "r", encoding="utf-8") as f:
@@ -17,18 +84,51 @@ def main(corpus_path: str, qdrant_host: str):
     texts = [c["text"] for c in corpus]
     print(f"Loaded {len(texts)} chunks from {corpus_path}")
 
+    # PyTorch, or the parity-checked int8 ONNX export (scripts/export_onnx_embedder.py)
+    from llm_service import embedder_runtime, load_local_embedder
+    runtime = embedder_runtime(runtime)
+
+    # Stamped on every point; llm_service rebuilds its context packs when it changes
+    model_key = "nomic-ai/nomic-embed-text-v1.5" + ("" if runtime == "torch" else f"+{runtime}")
+    digest = hashlib.sha256(f"{model_key}:{dim}:{quantization}".encode("utf-8"))
+    for c in corpus:
+        digest.update(json.dumps([c.get("text", ""), c.get("source", ""), c.get("page", 0)]).encode("utf-8"))
+    corpus_version = digest.hexdigest()[:16]
+    print(f"Corpus version: {corpus_version}")
+
+    # ── Step 1b: BM25 lexical index (no model needed, takes seconds) ─
+    if lexical_index_dir:
+        meta = LexicalIndex.build(lexical_index_dir, corpus, corpus_version)
+        print(f"✓ Lexical index written to {os.path.abspath(lexical_index_dir)} "
+              f"({meta['terms']} terms, {meta['postings']} postings)")
+
     # ── Step 2: Load embedding model ────────────────────────────────
-    print("Loading embedding model on CPU...")
-    embedder = SentenceTransformer(
-        "nomic-ai/nomic-embed-text-v1.5",
-        trust_remote_code=True,
-        device="cpu"
-    )
+    print(f"Loading embedding model on CPU ({runtime})...")
+    embedder = load_local_embedder(runtime)
 
-    print("Generating embeddings (5-15 minutes on CPU)...")
+    print("Generating embeddings (5-15 minutes on CPU with PyTorch, a fraction of that with ONNX)...")
     embeddings = embedder.encode(texts, batch_size=16, show_progress_bar=True)
     print(f"Embeddings shape: {embeddings.shape}")
 
+    # ── Step 2b: Recall of the cheaper settings on the rule queries ─
+    if recall_k:
+        from llm_service import rag_query
+        queries = sorted({rag_query(d, s) for d, s in rule_diagnosis_stages(rule_files())})
+        report = recall_report(embeddings, corpus, embedder.encode(queries, batch_size=16), recall_k, (dim, quantization))
+        if local_index_dir:
+            os.makedirs(local_index_dir, exist_ok=True)
+            with open(os.path.join(local_index_dir, "recall.json"), "w", encoding="utf-8") as f:
+                json.dump({"corpus_version": corpus_version, "queries": len(queries), "results": report}, f, indent=2)
+
+    # ── Step 2c: Local in-process index (written even if Qdrant is down) ──
+    if local_index_dir:
+        LocalVectorIndex.build(local_index_dir, embeddings, corpus, corpus_version, "nomic-ai/nomic-embed-text-v1.5",
+                               dim=dim, quantization=quantization)
+        print(f"✓ Local index written to {os.path.abspath(local_index_dir)} ({dim}-dim, {quantization})")
+
+    # Qdrant stores the Matryoshka-truncated vectors; it quantizes them itself
+    embeddings = embedding_codec.matryoshka(embeddings, dim)
+
     # ── Step 3: Connect to Qdrant ───────────────────────────────────
     client = QdrantClient(host=qdrant_host, port=6333)
     collection_name = "rag_corpus"
@@ -48,6 +148,9 @@ def main(corpus_path: str, qdrant_host: str):
 
     if collection_name in existing:
         print(f"Collection '{collection_name}' already exists")
+        current_size = client.get_collection(collection_name).config.params.vectors.size
+        if current_size != dim:
+            print(f"  ⚠ It holds {current_size}-dim vectors; this run produces {dim}-dim — recreate it")
         answer = input("Delete and recreate? (y/n): ").strip().lower()
         if answer == "y":
             client.delete_collection(collection_name)
@@ -61,7 +164,8 @@ def main(corpus_path: str, qdrant_host: str):
             vectors_config=VectorParams(
                 size=embeddings.shape[1],
                 distance=Distance.COSINE
-            )
+            ),
+            quantization_config=_quantization_config(quantization)
         )
         print(f"✓ Collection '{collection_name}' created")
 
@@ -76,7 +180,8 @@ def main(corpus_path: str, qdrant_host: str):
                 "page":         corpus[i].get("page", 0),
                 "conditions":   corpus[i].get("conditions", ["general"]),
                 "content_type": corpus[i].get("content_type", "general_guideline"),
-                "word_count":   corpus[i].get("word_count", 0)
+                "word_count":   corpus[i].get("word_count", 0),
+                "corpus_version": corpus_version
             }
         )
         for i in range(len(corpus))
@@ -106,7 +211,7 @@ def main(corpus_path: str, qdrant_host: str):
     # ── Step 8: Quick retrieval test ────────────────────────────────
     print(f"\n─── Quick Retrieval Test ───")
     test_query = "Stage 2 hypertension first-line treatment Rwanda"
-    query_vector = embedder.encode(test_query).tolist()
+    query_vector = embedding_codec.matryoshka(embedder.encode(test_query), dim).tolist()
 
     response = client.query_points(
         collection_name=collection_name,
@@ -121,6 +226,9 @@ def main(corpus_path: str, qdrant_host: str):
               f"{hit.payload.get('source')} p.{hit.payload.get('page')}")
         print(f"    {hit.payload.get('text', '')[:120]}...")
 
+    print(f"\nContext packs are rebuilt for corpus {corpus_version} automatically on the next backend")
+    print(f"start or version check, or now with: python scripts/build_context_packs.py")
+
     top_score = results[0].score if results else 0
     if top_score >= 0.65:
         print(f"\n✓ Retrieval working — score {top_score:.4f}")
@@ -144,5 +252,42 @@ if __name__ == "__main__":
         default="localhost",
         help="Qdrant host (default: localhost)"
     )
+    parser.add_argument(
+        "--local-index-dir",
+        type=str,
+        default=DEFAULT_LOCAL_INDEX_DIR,
+        help="Where to write the local vector index ('' to skip; default: backend/.cache/local_index)"
+    )
+    parser.add_argument(
+        "--dim",
+        type=int,
+        default=int(os.getenv("EMBEDDING_DIM", embedding_codec.FULL_DIM)),
+        help=f"Matryoshka dimensions {embedding_codec.SUPPORTED_DIMS} (default: EMBEDDING_DIM or 768)"
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=embedding_codec.QUANTIZATIONS,
+        default=os.getenv("EMBEDDING_QUANTIZATION", "none"),
+        help="Vector quantization (default: EMBEDDING_QUANTIZATION or none)"
+    )
+    parser.add_argument(
+        "--recall-k",
+        type=int,
+        default=5,
+        help="Report recall@k of every dim/quantization vs full precision (0 to skip)"
+    )
+    parser.add_argument(
+        "--runtime",
+        choices=("auto", "onnx", "torch"),
+        default=os.getenv("EMBEDDER_RUNTIME", "auto"),
+        help="Embedder runtime: the parity-checked ONNX export when present (auto), onnx or torch"
+    )
+    parser.add_argument(
+        "--lexical-index-dir",
+        type=str,
+        default=DEFAULT_LEXICAL_INDEX_DIR,
+        help="Where to write the BM25 lexical index ('' to skip; default: backend/.cache/lexical_index)"
+    )
     args = parser.parse_args()
-    main(args.corpus, args.qdrant_host)
\ No newline at end of file
+    main(args.corpus, args.qdrant_host, args.local_index_dir, args.dim, args.quantization, args.recall_k, args.runtime,
+         args.lexical_index_dir)
\ No newline at end of file
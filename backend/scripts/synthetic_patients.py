@@ -0,0 +1,223 @@
+# scripts/synthetic_patients.py
+# Reproducible synthetic PatientData populations for benchmarking the rule engine.
+# Distributions are rough adult NCD-clinic figures (not epidemiology): enough spread
+# that every hypertension/diabetes rule branch is exercised at a realistic rate.
+#
+#   from scripts.synthetic_patients import generate_population
+#   patients = generate_population(1000, seed=42)
+#
+# Run directly to dump a population as JSON:
+#   python scripts/synthetic_patients.py --count 200 --seed 7 --output patients.json
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.models.patient_models import (  # noqa: E402
+    Consultation,
+    ConsultationType,
+    DiabetesOnset,
+    Gender,
+    Investigations,
+    MedicalHistory,
+    PatientData,
+    PatientDemographics,
+    PhysicalExamination,
+    SocialHistory,
+)
+
+# Prevalence of known conditions in the simulated clinic population
+PREVALENCE = {
+    "hypertension": 0.38,
+    "diabetes": 0.18,
+    "chronic_kidney_disease": 0.05,
+    "cad": 0.04,
+    "stroke_history": 0.02,
+    "heart_failure": 0.02,
+    "hiv_positive": 0.03,
+    "asthma": 0.04,
+    "copd": 0.02,
+}
+HYPERTENSIVE_CRISIS_RATE = 0.02
+INVESTIGATIONS_RATE = 0.6        # patients with any lab results
+INVESTIGATIONS_RATE_DIABETIC = 0.9
+PREVIOUS_VISIT_RATE = 0.4
+CONSULTATION_MIX = [
+    (ConsultationType.initial, 0.6),
+    (ConsultationType.follow_up, 0.35),
+    (ConsultationType.emergency, 0.05),
+]
+CHIEF_COMPLAINTS = [
+    "Routine check-up", "Headache and dizziness", "Blurred vision", "Polyuria and thirst",
+    "Fatigue", "Chest discomfort", "Follow-up of chronic condition", "Numbness in feet",
+]
+
+
+def _clip(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+def _pick(rng: random.Random, weighted):
+    roll, total = rng.random(), 0.0
+    for value, weight in weighted:
+        total += weight
+        if roll < total:
+            return value
+    return weighted[-1][0]
+
+
+def _blood_pressure(rng: random.Random, hypertensive: bool):
+    if rng.random() < HYPERTENSIVE_CRISIS_RATE:
+        systole = rng.uniform(180, 220)
+    elif hypertensive:
+        systole = rng.gauss(150, 18)
+    else:
+        systole = rng.gauss(126, 15)
+    systole = _clip(systole, 85, 240)
+    diastole = _clip(0.55 * systole + rng.gauss(12, 7), 50, 140)
+    return round(systole), round(diastole)
+
+
+def _investigations(rng: random.Random, history: MedicalHistory) -> Optional[Investigations]:
+    rate = INVESTIGATIONS_RATE_DIABETIC if history.diabetes else INVESTIGATIONS_RATE
+    if rng.random() >= rate:
+        return None
+
+    if history.diabetes:
+        hba1c = _clip(rng.gauss(8.2, 1.6), 5.0, 15.0)
+        fasting = _clip(rng.gauss(165, 45), 70, 450)
+    else:
+        # Some undiagnosed diabetes / pre-diabetes in the background population
+        hba1c = _clip(rng.gauss(5.7, 0.7), 4.0, 12.0)
+        fasting = _clip(rng.gauss(100, 18), 60, 350)
+    egfr = _clip(rng.gauss(40, 12) if history.chronic_kidney_disease else rng.gauss(88, 18), 5, 130)
+
+    return Investigations(
+        hba1c=round(hba1c, 1) if rng.random() < 0.8 else None,
+        fasting_glucose=round(fasting) if rng.random() < 0.85 else None,
+        random_glucose=round(_clip(fasting * rng.uniform(1.1, 1.6), 70, 600)) if rng.random() < 0.3 else None,
+        egfr=round(egfr) if rng.random() < 0.6 else None,
+        ketonuria=(rng.random() < 0.15) if history.diabetes and rng.random() < 0.4 else None,
+        urine_protein=round(rng.uniform(0, 300 if history.chronic_kidney_disease else 40)) if rng.random() < 0.4 else None,
+        serum_creatinine=round(_clip(88 / egfr, 0.4, 8.0), 2) if rng.random() < 0.5 else None,
+        ldl_cholesterol=round(_clip(rng.gauss(120, 32), 40, 260)) if rng.random() < 0.4 else None,
+    )
+
+
+def generate_patient(rng: random.Random, index: int = 0) -> PatientData:
+    gender = Gender.FEMALE if rng.random() < 0.52 else Gender.MALE
+    age = int(_clip(rng.gauss(52, 14), 18, 90))
+
+    conditions = {name: rng.random() < rate for name, rate in PREVALENCE.items()}
+    # Age drives cardiometabolic risk; comorbidities cluster with diabetes
+    if age > 60 and rng.random() < 0.25:
+        conditions["hypertension"] = True
+    if conditions["diabetes"] and rng.random() < 0.3:
+        conditions["hypertension"] = True
+    if conditions["diabetes"] and rng.random() < 0.1:
+        conditions["chronic_kidney_disease"] = True
+
+    bmi = _clip(rng.gauss(26.5, 5), 15, 50)
+    smoker = rng.random() < (0.18 if gender == Gender.MALE else 0.05)
+    drinker = rng.random() < 0.2
+    diabetes_symptoms = rng.random() < (0.35 if conditions["diabetes"] else 0.05)
+    danger = conditions["diabetes"] and rng.random() < 0.03
+
+    history = MedicalHistory(
+        **conditions,
+        overweight=25 <= bmi < 30,
+        obesity=bmi >= 30,
+        undernutrition=bmi < 18.5,
+        pregnant=gender == Gender.FEMALE and 18 <= age <= 45 and rng.random() < 0.06,
+        current_smoker=smoker,
+        former_smoker=not smoker and rng.random() < 0.1,
+        current_alcohol=drinker,
+        diabetes_symptoms=diabetes_symptoms,
+        diabetes_onset=(
+            (DiabetesOnset.ACUTE if rng.random() < 0.2 else DiabetesOnset.GRADUAL) if diabetes_symptoms else None
+        ),
+        ketoacidosis_history=conditions["diabetes"] and rng.random() < 0.04,
+        family_history_diabetes=rng.random() < 0.25,
+        history_gdm=gender == Gender.FEMALE and rng.random() < 0.04,
+        renal_impairment=conditions["chronic_kidney_disease"],
+        cardiovascular_disease=conditions["cad"] or conditions["stroke_history"],
+        neuropathy_symptoms=conditions["diabetes"] and rng.random() < 0.15,
+        cardiovascular_risk_factors=smoker or bmi >= 30 or conditions["hypertension"],
+        abdominal_pain=danger and rng.random() < 0.6,
+        nausea_vomiting=danger and rng.random() < 0.6,
+        dehydration=danger,
+        rapid_breathing=danger and rng.random() < 0.5,
+        danger_signs=danger,
+        treatment_duration=rng.randint(0, 120) if conditions["hypertension"] or conditions["diabetes"] else None,
+    )
+
+    systole, diastole = _blood_pressure(rng, history.hypertension)
+    height = _clip(rng.gauss(170 if gender == Gender.MALE else 160, 7), 140, 200)
+    weight = bmi * (height / 100) ** 2
+
+    consultation_type = _pick(rng, CONSULTATION_MIX)
+    patient = PatientData(
+        demographics=PatientDemographics(
+            patient_id=f"synthetic-{index:06d}",
+            full_name=f"Synthetic Patient {index}",
+            gender=gender,
+            age=age,
+        ),
+        consultation=Consultation(
+            consultation_type=consultation_type,
+            chief_complaint=rng.choice(CHIEF_COMPLAINTS),
+        ),
+        medical_history=history,
+        social_history=SocialHistory(tobacco_use=smoker, alcohol_use=drinker),
+        physical_examination=PhysicalExamination(
+            systole=systole,
+            diastole=diastole,
+            height=round(height),
+            weight=round(weight, 1),
+            bmi=round(bmi, 1),
+            pulse=round(_clip(rng.gauss(78, 12), 40, 160)),
+            temperature=round(_clip(rng.gauss(36.8, 0.4), 35, 40), 1),
+            spO2=round(_clip(rng.gauss(97, 2), 80, 100)),
+        ),
+        investigations=_investigations(rng, history),
+    )
+
+    if consultation_type == ConsultationType.follow_up or rng.random() < PREVIOUS_VISIT_RATE / 2:
+        prev_systole, prev_diastole = _blood_pressure(rng, history.hypertension)
+        patient.previous_systole = prev_systole
+        patient.previous_diastole = prev_diastole
+        patient.previous_visit_date = datetime(2026, 1, 1) - timedelta(days=rng.randint(14, 180))
+
+    return patient
+
+
+def generate_population(count: int, seed: int = 42) -> List[PatientData]:
+    """`count` synthetic patients; the same seed always yields the same population."""
+    rng = random.Random(seed)
+    return [generate_patient(rng, index) for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic patient population")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    population = [patient.model_dump(mode="json") for patient in generate_population(args.count, args.seed)]
+    if args.output == "-":
+        json.dump(population, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(population, f, indent=2)
+        print(f"✓ Wrote {len(population)} patients to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from app.services import decision_cache
+from app.services.decision_cache import DecisionCache, make_cache_key
+
+
+def _java_input(**demographics):
+    return {
+        "demographics": {
+            "patientId": "P-001",
+            "upid": "U-001",
+            "fullName": "Test Patient",
+            "gender": "FEMALE",
+            "age": 54,
+            "province": "Kigali",
+            "district": "Gasabo",
+            **demographics,
+        },
+        "consultation": {"practitionerName": "Dr. A", "chiefComplaint": "headache"},
+        "physicalExamination": {"systole": 165, "diastole": 95},
+    }
+
+
+def _java_output(ruleset_hash="hash-v1", success=True):
+    return {
+        "success": success,
+        "rulesetHash": ruleset_hash,
+        "decisions": [{"diagnosis": "Hypertension", "stage": "Stage 2"}],
+    }
+
+
+def test_cache_key_ignores_identity_and_location_fields():
+    first = _java_input()
+    second = _java_input(patientId="P-002", upid="U-002", fullName="Someone Else", province="North", district="Musanze")
+    second["consultation"]["practitionerName"] = "Dr. B"
+
+    assert make_cache_key(first, "hash-v1") == make_cache_key(second, "hash-v1")
+
+
+def test_cache_key_depends_on_clinical_input_and_ruleset():
+    java_input = _java_input()
+
+    assert make_cache_key(java_input, "hash-v1") != make_cache_key(_java_input(age=55), "hash-v1")
+    assert make_cache_key(java_input, "hash-v1") != make_cache_key(java_input, "hash-v2")
+
+
+def test_put_then_get_returns_a_copy():
+    cache = DecisionCache()
+    java_input = _java_input()
+    cache.put(java_input, _java_output())
+
+    cached = cache.get(cache.lookup_key(_java_input(patientId="P-999")))
+    assert cached["decisions"][0]["diagnosis"] == "Hypertension"
+
+    cached["decisions"].clear()
+    assert cache.get(cache.lookup_key(java_input))["decisions"]
+    assert cache.hits == 2
+
+
+def test_new_ruleset_hash_invalidates_entries():
+    cache = DecisionCache()
+    old_input, new_input = _java_input(), _java_input(age=70)
+    cache.put(old_input, _java_output("hash-v1"))
+    old_key = cache.lookup_key(old_input)
+
+    cache.put(new_input, _java_output("hash-v2"))
+
+    assert cache.ruleset_version == "hash-v2"
+    assert cache.invalidations == 1
+    assert cache.get(old_key) is None
+    assert cache.get(cache.lookup_key(old_input)) is None
+    assert cache.get(cache.lookup_key(new_input)) is not None
+
+
+def test_failed_evaluations_are_not_cached():
+    cache = DecisionCache()
+    java_input = _java_input()
+
+    assert cache.put(java_input, _java_output(success=False)) is None
+    assert cache.ruleset_version == "hash-v1"
+    assert cache.get(cache.lookup_key(java_input)) is None
+
+
+def test_lookup_key_is_none_until_a_version_is_known():
+    cache = DecisionCache()
+
+    assert cache.lookup_key(_java_input()) is None
+
+
+def test_lookup_key_is_none_once_the_version_is_stale(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(decision_cache.time, "time", lambda: now[0])
+    cache = DecisionCache(version_recheck_seconds=30)
+    java_input = _java_input()
+    cache.put(java_input, _java_output())
+    assert cache.lookup_key(java_input) is not None
+
+    now[0] += 31
+    assert not cache.version_is_current()
+    assert cache.lookup_key(java_input) is None
+
+    # A ping reporting the same hash reconfirms it without dropping entries
+    cache.confirm_version("hash-v1")
+    assert cache.get(cache.lookup_key(java_input)) is not None
@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from app.services import explanation_orchestrator as orchestrator
+from app.services.explanation_cache import ExplanationCache
+
+DECISION = {"diagnosis": "Hypertension", "stage": "Stage 2", "medications": ["Amlodipine"], "needsReferral": False}
+
+
+def _patient(systolic=165, diastolic=95):
+    return {"age": 54, "gender": "female", "systolic": systolic, "diastolic": diastolic}
+
+
+def _explanation(vitals):
+    return {
+        "ai_enabled": True,
+        "rag_grounded": True,
+        "chunks_used": 1,
+        "sources": ["Final_NCDs_Management_Guidelines p.12 (score: 0.81)"],
+        "clinician_explanation": f"Clinician text ({vitals['blood_pressure']})",
+        "patient_explanation": "Patient text",
+        "clinician_summary": "Clinician summary",
+        "patient_summary": "Patient summary",
+    }
+
+
+class StubLLMService:
+    """The parts of llm_service the orchestrator uses; generations wait on `gate`."""
+
+    ENABLE_AI = True
+    PROMPT_VERSION = "test-prompts"
+    GROQ_MODEL = "test-model"
+
+    def __init__(self, fail_stream: bool = False):
+        self.gate = asyncio.Event()
+        self.fail_stream = fail_stream
+        self.generations = []
+        self.cancelled = 0
+
+    @staticmethod
+    def exact_vitals(patient):
+        return {"age": f"{patient['age']} years",
+                "blood_pressure": f"{patient['systolic']}/{patient['diastolic']} mmHg"}
+
+    async def agenerate_explanation(self, decision, patient, vitals=None):
+        vitals = vitals or self.exact_vitals(patient)
+        self.generations.append(vitals)
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return _explanation(vitals)
+
+    async def astream_explanation(self, decision, patient, vitals=None):
+        vitals = vitals or self.exact_vitals(patient)
+        self.generations.append(vitals)
+        raw = _explanation(vitals)
+        yield "sources", {"sources": raw["sources"], "rag_grounded": True, "chunks_used": 1}
+        await self.gate.wait()
+        if self.fail_stream:
+            raise RuntimeError("Groq stream broke")
+        yield "section", {"section": "clinician", "text": raw["clinician_explanation"]}
+        yield "result", raw
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    def configure(cache=None, **stub_options):
+        stub = StubLLMService(**stub_options)
+        monkeypatch.setattr(orchestrator, "_llm_service", lambda: stub)
+        monkeypatch.setattr(orchestrator, "get_explanation_cache", lambda: cache)
+        monkeypatch.setattr(orchestrator, "_single_flight", orchestrator.SingleFlight())
+        return stub
+    return configure
+
+
+def _cache():
+    return ExplanationCache(prompt_version="test-prompts", model="test-model", persist=False)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def _drain(stream):
+    return [event async for event in stream]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_generation(setup):
+    stub = setup(cache=_cache())
+    callers = [
+        asyncio.ensure_future(orchestrator.generate_explanation_cached(DECISION, _patient(systolic))) for systolic in (162, 168)
+    ]
+    await _settle()
+    stub.gate.set()
+    first, second = await asyncio.gather(*callers)
+
+    assert len(stub.generations) == 1
+    # Shared text is written from the bucket, never one patient's exact reading
+    assert "160-179" in first["clinician_explanation"]
+    assert first == second and first is not second
+    assert orchestrator.single_flight_stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_without_cache_exact_readings_are_quoted_and_not_shared(setup):
+    stub = setup(cache=None)
+    callers = [
+        asyncio.ensure_future(orchestrator.generate_explanation_cached(DECISION, _patient(systolic))) for systolic in (162, 162, 168)
+    ]
+    await _settle()
+    stub.gate.set()
+    same_a, same_b, other = await asyncio.gather(*callers)
+
+    assert len(stub.generations) == 2
+    assert "162/95 mmHg" in same_a["clinician_explanation"] and same_a == same_b
+    assert "168/95 mmHg" in other["clinician_explanation"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_generation(setup):
+    stub = setup(cache=_cache())
+    leader = asyncio.ensure_future(orchestrator.generate_explanation_cached(DECISION, _patient()))
+    follower = asyncio.ensure_future(orchestrator.generate_explanation_cached(DECISION, _patient()))
+    await _settle()
+
+    leader.cancel()
+    await _settle()
+    stub.gate.set()
+
+    assert (await follower)["patient_explanation"] == "Patient text"
+    assert leader.cancelled()
+    assert stub.cancelled == 0 and len(stub.generations) == 1
+
+
+@pytest.mark.asyncio
+async def test_disconnected_stream_still_caches_and_serves_joiners(setup):
+    cache = _cache()
+    stub = setup(cache=cache)
+    stream = orchestrator.stream_explanation_cached(DECISION, _patient())
+    assert (await stream.__anext__())[0] == "sources"
+
+    joiner = asyncio.ensure_future(_drain(orchestrator.stream_explanation_cached(DECISION, _patient())))
+    await _settle()
+    await stream.aclose()  # client went away mid-stream
+    stub.gate.set()
+
+    events = await joiner
+    assert [name for name, _ in events][-1] == "result"
+    await asyncio.gather(*list(orchestrator._background_streams))
+    assert cache.get(cache.key_for(DECISION, _patient())) == events[-1][1]
+    assert len(stub.generations) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_propagates_to_joiners(setup):
+    stub = setup(cache=_cache(), fail_stream=True)
+    leader = asyncio.ensure_future(_drain(orchestrator.stream_explanation_cached(DECISION, _patient())))
+    await _settle()
+    stream_joiner = asyncio.ensure_future(_drain(orchestrator.stream_explanation_cached(DECISION, _patient())))
+    joiner = asyncio.ensure_future(orchestrator.generate_explanation_cached(DECISION, _patient()))
+    await _settle()
+    stub.gate.set()
+
+    for task in (leader, stream_joiner, joiner):
+        with pytest.raises(RuntimeError, match="Groq stream broke"):
+            await task
+    assert len(stub.generations) == 1
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import PRIORITY_EMERGENCY, PRIORITY_ROUTINE, LLMScheduler, retry_after_hint
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message="rate_limit_exceeded", headers=None):
+        super().__init__(message)
+        self.response = _Response(headers or {})
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Rate limit reached. Please try again in 7.66s.", 7.66),
+    ("Please try again in 1m2.5s", 62.5),
+    ("Please try again in 450ms", 0.45),
+    ("Please TRY AGAIN IN 2m0s", 120.0),
+])
+def test_retry_after_hint_from_message(message, expected):
+    assert retry_after_hint(_RateLimitError(message)) == pytest.approx(expected)
+
+
+def test_retry_after_hint_prefers_headers():
+    assert retry_after_hint(_RateLimitError("try again in 9s", {"retry-after-ms": "1500"})) == pytest.approx(1.5)
+    assert retry_after_hint(_RateLimitError("try again in 9s", {"retry-after": "3"})) == pytest.approx(3.0)
+
+
+def test_retry_after_hint_skips_unparseable_header():
+    assert retry_after_hint(_RateLimitError("try again in 4s", {"retry-after": "soon"})) == pytest.approx(4.0)
+    assert retry_after_hint(_RateLimitError("no hint here")) is None
+
+
+async def _wait_until_queued(scheduler, count):
+    for _ in range(100):
+        if len(scheduler._waiters) >= count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"expected {count} queued calls, got {len(scheduler._waiters)}")
+
+
+@pytest.mark.asyncio
+async def test_emergency_calls_are_admitted_before_queued_routine_calls():
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def call(name):
+        order.append(name)
+        if name == "running":
+            await release.wait()
+        return name
+
+    running = asyncio.ensure_future(scheduler.run(lambda: call("running")))
+    await asyncio.sleep(0)
+    queued = []
+    for name, priority in (("routine-1", PRIORITY_ROUTINE), ("routine-2", PRIORITY_ROUTINE),
+                           ("emergency", PRIORITY_EMERGENCY)):
+        queued.append(asyncio.ensure_future(scheduler.run(lambda name=name: call(name), priority=priority)))
+        await _wait_until_queued(scheduler, len(queued))
+
+    release.set()
+    await asyncio.gather(running, *queued)
+
+    assert order == ["running", "emergency", "routine-1", "routine-2"]
+    assert scheduler.stats()["emergency_calls"] == 1
+    assert scheduler.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_call_is_retried_after_the_hint(monkeypatch):
+    monkeypatch.setattr(llm_scheduler.random, "uniform", lambda low, high: 0.0)
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_retries=2)
+    attempts = []
+
+    async def call():
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) == 1:
+            raise _RateLimitError("Please try again in 50ms")
+        return "ok"
+
+    assert await scheduler.run(call) == "ok"
+    assert attempts[1] - attempts[0] >= 0.04
+    assert scheduler.retries == 1
+    assert scheduler.rate_limited == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_releases_its_slot():
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1)
+
+    task = asyncio.ensure_future(scheduler.run(lambda: asyncio.sleep(10)))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert await asyncio.wait_for(scheduler.run(lambda: asyncio.sleep(0, result="next")), 1) == "next"
@@ -1,19 +1,51 @@
 package com.rwanda.health.cds;
 
+import com.fasterxml.jackson.core.JsonProcessingException;
 import com.fasterxml.jackson.databind.ObjectMapper;
 import com.rwanda.health.cds.models.*;
 import com.rwanda.health.cds.services.DroolsRuleService;
+import com.rwanda.health.cds.services.RuleSet;
+import com.rwanda.health.cds.services.RuleTraceListener;
 
 import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.ArrayList;
 import java.util.HashMap;
+import java.util.List;
 import java.util.Map;
 
 public class DroolsJsonRunner {
     private static final ObjectMapper objectMapper = new ObjectMapper();
+    private static volatile DroolsRuleService sharedRuleService;
 
     public static void main(String[] args) {
+        if (args.length >= 1 && "--worker".equals(args[0])) {
+            runWorker(WireCodec.formatFromArgs(args));
+            return;
+        }
+
+        if (args.length >= 1 && "--stdio".equals(args[0])) {
+            runStdio(WireCodec.formatFromArgs(args));
+            return;
+        }
+
+        if (args.length >= 3 && "--batch".equals(args[0])) {
+            runBatch(args[1], args[2]);
+            return;
+        }
+
         if (args.length < 2) {
             System.err.println("Usage: java DroolsJsonRunner <input.json> <output.json>");
+            System.err.println("       java DroolsJsonRunner --stdio [--format json|cbor]");
+            System.err.println("       java DroolsJsonRunner --batch <input.json|input.ndjson|-> <output.ndjson|->");
+            System.err.println("       java DroolsJsonRunner --worker [--format json|cbor]");
             System.exit(1);
         }
 
@@ -24,17 +56,11 @@ public class DroolsJsonRunner {
             // Read input JSON
             Map<String, Object> inputData = objectMapper.readValue(new File(inputFile), Map.class);
 
-            // Convert to Java objects
-            PatientData patientData = convertToPatientData(inputData);
-
             // Evaluate with Drools
             DroolsRuleService ruleService = new DroolsRuleService();
-            PatientData result = ruleService.evaluatePatient(patientData);
-
-            // Convert to output format
-            Map<String, Object> outputData = convertToOutputFormat(result);
+            Map<String, Object> outputData = evaluate(ruleService, inputData);
 
-            // Write output JSON
+            // Write output JSON (pretty-printed: the file mode is kept for debugging)
             objectMapper.writerWithDefaultPrettyPrinter().writeValue(new File(outputFile), outputData);
 
             System.out.println("Evaluation completed successfully");
@@ -46,6 +72,268 @@ public class DroolsJsonRunner {
         }
     }
 
+    /**
+     * One-shot pipe mode: read one framed message from stdin, write one framed result to stdout.
+     * No temporary files; rule-engine logging goes to stderr.
+     */
+    private static void runStdio(String format) {
+        OutputStream protocolOut = new FileOutputStream(FileDescriptor.out);
+        System.setOut(System.err);
+
+        try {
+            WireCodec codec = new WireCodec(format, System.in, protocolOut);
+            Map<String, Object> inputData = codec.read();
+            if (inputData == null) {
+                throw new IllegalArgumentException("No input message on stdin");
+            }
+            DroolsRuleService ruleService = new DroolsRuleService();
+            codec.write(evaluate(ruleService, inputData));
+        } catch (Exception e) {
+            System.err.println("Error: " + e.getMessage());
+            e.printStackTrace();
+            System.exit(1);
+        }
+    }
+
+    /**
+     * Long-lived worker mode: the KieContainer is built once and every message read from
+     * stdin is answered with exactly one message on stdout (framing: see WireCodec).
+     *
+     * Request:  {"id": 1, "input": {...patient JSON...}}  or  {"id": 2, "cmd": "ping" | "reload"}
+     * Response: {"id": 1, "success": true, "decisions": [...]} or {"id": 1, "success": false, "error": "..."}
+     *
+     * With CDS_RULES_DIR set, new rule-set versions are built in the background and swapped
+     * in without restarting the worker; "reload" forces an immediate re-scan.
+     *
+     * Rule-engine logging is redirected to stderr so stdout carries protocol messages only.
+     */
+    private static void runWorker(String format) {
+        OutputStream protocolOut = new FileOutputStream(FileDescriptor.out);
+        System.setOut(System.err);
+
+        DroolsRuleService ruleService;
+        try {
+            ruleService = new DroolsRuleService();
+        } catch (Exception e) {
+            System.err.println("Worker startup failed: " + e.getMessage());
+            e.printStackTrace();
+            System.exit(1);
+            return;
+        }
+
+        WireCodec codec = new WireCodec(format, System.in, protocolOut);
+        try {
+            Map<String, Object> ready = new HashMap<>();
+            ready.put("ready", true);
+            RuleSet ruleSet = ruleService.getActiveRuleSet();
+            ready.put("rulesetHash", ruleSet.getHash());
+            ready.put("rulesetVersion", ruleSet.getVersion());
+            codec.write(ready);
+            ruleService.startWatching(DroolsRuleService.pollSecondsFromEnv());
+
+            while (true) {
+                Map<String, Object> request;
+                try {
+                    request = codec.read();
+                } catch (JsonProcessingException e) {
+                    // Framing is intact, only this message is malformed
+                    codec.write(errorResult(e));
+                    continue;
+                }
+                if (request == null) {
+                    break;
+                }
+                codec.write(handleWorkerRequest(ruleService, request));
+            }
+        } catch (IOException e) {
+            System.err.println("Worker stream failed: " + e.getMessage());
+            System.exit(1);
+        }
+    }
+
+    private static Map<String, Object> handleWorkerRequest(DroolsRuleService ruleService, Map<String, Object> request) {
+        Object requestId = request.get("id");
+        try {
+            Map<String, Object> response;
+            Object cmd = request.get("cmd");
+            if ("ping".equals(cmd) || "reload".equals(cmd)) {
+                response = new HashMap<>();
+                response.put("success", true);
+                if ("reload".equals(cmd)) {
+                    response.put("swapped", ruleService.reload());
+                } else {
+                    response.put("pong", true);
+                }
+                RuleSet ruleSet = ruleService.getActiveRuleSet();
+                response.put("rulesetHash", ruleSet.getHash());
+                response.put("rulesetVersion", ruleSet.getVersion());
+            } else {
+                Map<String, Object> inputData = (Map<String, Object>) request.get("input");
+                if (inputData == null) {
+                    throw new IllegalArgumentException("Request has no 'input' object");
+                }
+                response = evaluate(ruleService, inputData);
+            }
+            response.put("id", requestId);
+            return response;
+        } catch (Exception e) {
+            System.err.println("Worker request failed: " + e.getMessage());
+            e.printStackTrace();
+            Map<String, Object> error = errorResult(e);
+            error.put("id", requestId);
+            return error;
+        }
+    }
+
+    /**
+     * Batch mode: evaluate many patients against one compiled KieBase, with a fresh
+     * KieSession per patient. Input is a JSON array or NDJSON (one patient per line).
+     * Output is NDJSON with one line per patient, written in input order as each
+     * evaluation finishes. "-" as input reads stdin; "-" as output streams to stdout.
+     * A failing patient produces an error line for its index and does not stop the batch.
+     */
+    private static void runBatch(String inputFile, String outputFile) {
+        boolean toStdout = "-".equals(outputFile);
+        PrintStream out = null;
+        try {
+            if (toStdout) {
+                out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, StandardCharsets.UTF_8);
+                System.setOut(System.err);
+            } else {
+                out = new PrintStream(new FileOutputStream(outputFile), true, StandardCharsets.UTF_8);
+            }
+
+            List<Object> items = readBatchItems(inputFile);
+            DroolsRuleService ruleService = new DroolsRuleService();
+
+            for (int index = 0; index < items.size(); index++) {
+                Map<String, Object> result;
+                try {
+                    Object item = items.get(index);
+                    Map<String, Object> inputData = item instanceof String
+                            ? objectMapper.readValue((String) item, Map.class)
+                            : (Map<String, Object>) item;
+                    result = evaluate(ruleService, inputData);
+                } catch (Exception e) {
+                    System.err.println("Batch item " + index + " failed: " + e.getMessage());
+                    result = errorResult(e);
+                }
+                result.put("index", index);
+                writeLine(out, result);
+            }
+            System.err.println("Batch evaluation completed: " + items.size() + " patient(s)");
+
+        } catch (Exception e) {
+            System.err.println("Error: " + e.getMessage());
+            e.printStackTrace();
+            System.exit(1);
+        } finally {
+            if (out != null && !toStdout) {
+                out.close();
+            }
+        }
+    }
+
+    /**
+     * JSON array input yields parsed maps; NDJSON yields raw lines so a malformed
+     * line only fails its own item.
+     */
+    private static List<Object> readBatchItems(String inputFile) throws IOException {
+        byte[] raw = "-".equals(inputFile) ? System.in.readAllBytes() : Files.readAllBytes(Paths.get(inputFile));
+        String content = new String(raw, StandardCharsets.UTF_8);
+        if (content.trim().startsWith("[")) {
+            return objectMapper.readValue(content, List.class);
+        }
+        List<Object> lines = new ArrayList<>();
+        for (String line : content.split("\\r?\\n")) {
+            if (!line.trim().isEmpty()) {
+                lines.add(line);
+            }
+        }
+        return lines;
+    }
+
+    private static Map<String, Object> errorResult(Exception e) {
+        Map<String, Object> error = new HashMap<>();
+        error.put("success", false);
+        error.put("error", e.getMessage() != null ? e.getMessage() : e.getClass().getName());
+        return error;
+    }
+
+    private static void writeLine(PrintStream out, Map<String, Object> payload) {
+        try {
+            out.println(objectMapper.writeValueAsString(payload));
+            out.flush();
+        } catch (IOException e) {
+            System.err.println("Failed to write worker response: " + e.getMessage());
+        }
+    }
+
+    private static DroolsRuleService sharedRuleService() {
+        if (sharedRuleService == null) {
+            synchronized (DroolsJsonRunner.class) {
+                if (sharedRuleService == null) {
+                    DroolsRuleService ruleService = new DroolsRuleService();
+                    ruleService.startWatching(DroolsRuleService.pollSecondsFromEnv());
+                    sharedRuleService = ruleService;
+                }
+            }
+        }
+        return sharedRuleService;
+    }
+
+    /**
+     * Build the shared KieContainer ahead of the first in-process evaluation.
+     */
+    public static void warmUp() {
+        sharedRuleService();
+    }
+
+    /**
+     * Re-scan CDS_RULES_DIR now instead of waiting for the next poll; true when a new
+     * rule set was swapped in.
+     */
+    public static boolean reloadRules() {
+        return sharedRuleService().reload();
+    }
+
+    /**
+     * Version label and hash of the rule set currently serving in-process evaluations.
+     */
+    public static String activeRuleSetJson() throws IOException {
+        RuleSet ruleSet = sharedRuleService().getActiveRuleSet();
+        Map<String, Object> info = new HashMap<>();
+        info.put("rulesetHash", ruleSet.getHash());
+        info.put("rulesetVersion", ruleSet.getVersion());
+        return objectMapper.writeValueAsString(info);
+    }
+
+    /**
+     * In-process entry point used by the Python JPype bridge: patient JSON in, output JSON out.
+     * The KieContainer is shared; each call still gets its own short-lived KieSession.
+     */
+    public static String evaluateJson(String inputJson) throws IOException {
+        Map<String, Object> inputData = objectMapper.readValue(inputJson, Map.class);
+        return objectMapper.writeValueAsString(evaluate(sharedRuleService(), inputData));
+    }
+
+    /**
+     * Evaluate one patient input map against an already initialised rule service.
+     * The output carries the rule-set version and hash that actually ran (one snapshot,
+     * even if a hot swap happens mid-evaluation) and a per-rule firing trace.
+     */
+    public static Map<String, Object> evaluate(DroolsRuleService ruleService, Map<String, Object> inputData) {
+        PatientData patientData = convertToPatientData(inputData);
+        RuleTraceListener trace = new RuleTraceListener();
+        RuleSet ruleSet = ruleService.getActiveRuleSet();
+        PatientData result = ruleService.evaluatePatient(ruleSet, patientData, trace);
+        Map<String, Object> output = convertToOutputFormat(result);
+        output.put("rulesetHash", ruleSet.getHash());
+        output.put("rulesetVersion", ruleSet.getVersion());
+        output.put("ruleTrace", trace.toMap());
+        return output;
+    }
+
     private static PatientData convertToPatientData(Map<String, Object> inputData) {
         PatientData patientData = new PatientData();
 
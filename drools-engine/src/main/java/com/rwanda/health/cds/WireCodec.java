@@ -0,0 +1,105 @@
+package com.rwanda.health.cds;
+
+import com.fasterxml.jackson.databind.ObjectMapper;
+import com.fasterxml.jackson.dataformat.cbor.databind.CBORMapper;
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.util.Map;
+
+/**
+ * Framed message codec for the stdin/stdout protocol shared with the Python backend.
+ *
+ * json: compact JSON, one message per line (NDJSON)
+ * cbor: CBOR payload prefixed with its length as a 4-byte big-endian int
+ */
+public class WireCodec {
+    public static final String JSON = "json";
+    public static final String CBOR = "cbor";
+
+    private final String format;
+    private final ObjectMapper mapper;
+    private final DataInputStream in;
+    private final DataOutputStream out;
+
+    public WireCodec(String format, InputStream in, OutputStream out) {
+        if (!JSON.equals(format) && !CBOR.equals(format)) {
+            throw new IllegalArgumentException("Unknown wire format: " + format);
+        }
+        this.format = format;
+        this.mapper = CBOR.equals(format) ? new CBORMapper() : new ObjectMapper();
+        this.in = new DataInputStream(new BufferedInputStream(in));
+        this.out = new DataOutputStream(new BufferedOutputStream(out));
+    }
+
+    /**
+     * Value of "--format <json|cbor>" in the argument list, defaulting to json.
+     */
+    public static String formatFromArgs(String[] args) {
+        for (int i = 0; i < args.length - 1; i++) {
+            if ("--format".equals(args[i])) {
+                return args[i + 1];
+            }
+        }
+        return JSON;
+    }
+
+    /**
+     * Next message, or null at end of stream.
+     */
+    public Map<String, Object> read() throws IOException {
+        byte[] payload = CBOR.equals(format) ? readFrame() : readLine();
+        if (payload == null) {
+            return null;
+        }
+        return mapper.readValue(payload, Map.class);
+    }
+
+    public void write(Map<String, Object> message) throws IOException {
+        byte[] payload = mapper.writeValueAsBytes(message);
+        if (CBOR.equals(format)) {
+            out.writeInt(payload.length);
+            out.write(payload);
+        } else {
+            out.write(payload);
+            out.write('\n');
+        }
+        out.flush();
+    }
+
+    private byte[] readFrame() throws IOException {
+        int length;
+        try {
+            length = in.readInt();
+        } catch (EOFException e) {
+            return null;
+        }
+        byte[] payload = new byte[length];
+        in.readFully(payload);
+        return payload;
+    }
+
+    private byte[] readLine() throws IOException {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != -1) {
+            if (b == '\n') {
+                if (line.size() == 0) {
+                    continue;  // skip blank lines
+                }
+                return line.toByteArray();
+            }
+            if (b != '\r') {
+                line.write(b);
+            }
+        }
+        return line.size() > 0 ? line.toByteArray() : null;
+    }
+}
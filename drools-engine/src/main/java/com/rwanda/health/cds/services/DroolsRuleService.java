@@ -1,5 +1,6 @@
 package com.rwanda.health.cds.services;
 
+import org.kie.api.KieBase;
 import org.kie.api.KieServices;
 import org.kie.api.builder.KieBuilder;
 import org.kie.api.builder.KieFileSystem;
@@ -7,68 +8,348 @@ import org.kie.api.builder.Message;
 import org.kie.api.runtime.KieContainer;
 import org.kie.api.runtime.KieSession;
 import com.rwanda.health.cds.models.PatientData;
+import org.slf4j.Logger;
+import org.slf4j.LoggerFactory;
 
+import java.io.IOException;
 import java.io.InputStream;
 import java.nio.charset.StandardCharsets;
-import java.util.ArrayList;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.util.Arrays;
+import java.util.Comparator;
+import java.util.LinkedHashMap;
 import java.util.List;
+import java.util.Map;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.atomic.AtomicReference;
+import java.util.stream.Collectors;
+import java.util.stream.Stream;
 
 public class DroolsRuleService {
-    private KieContainer kieContainer;
+    private static final Logger log = LoggerFactory.getLogger(DroolsRuleService.class);
+
+    public static final List<String> DRL_FILES = Arrays.asList("HypertensionRules.drl", "DiabetesRules.drl");
+    public static final String ARTIFACT_RESOURCE = "com/rwanda/health/cds/rules/cds-rules.kbase";
+
+    public static final String RULES_DIR_ENV = "CDS_RULES_DIR";
+    public static final String CURRENT_FILE = "CURRENT";
+    public static final String VERSION_ARTIFACT = "cds-rules.kbase";
+
+    // Swapped atomically by reload(); evaluations take one snapshot and keep it
+    private final AtomicReference<RuleSet> active = new AtomicReference<>();
+    private final Path rulesDir;
+    private ScheduledExecutorService watcher;
+    // Last version/hash that failed to build, so the poller does not retry it every tick
+    private String failedVersionKey;
 
     public DroolsRuleService() {
         System.out.println("Initializing DroolsRuleService...");
 
+        String configuredDir = System.getenv(RULES_DIR_ENV);
+        this.rulesDir = configuredDir != null && !configuredDir.trim().isEmpty() ? Paths.get(configuredDir.trim()) : null;
+
         try {
-            KieServices kieServices = KieServices.Factory.get();
-            KieFileSystem kfs = kieServices.newKieFileSystem();
-
-            // Load both hypertension and diabetes DRL content
-            List<String> drlFiles = new ArrayList<>();
-            drlFiles.add("HypertensionRules.drl");
-            drlFiles.add("DiabetesRules.drl");
-
-            boolean rulesLoaded = false;
-
-            for (String drlFile : drlFiles) {
-                String drlContent = loadDrlFromClasspath(drlFile);
-                if (drlContent != null && !drlContent.trim().isEmpty()) {
-                    kfs.write("src/main/resources/" + drlFile, drlContent);
-                    System.out.println("Loaded " + drlFile + " (" + drlContent.length() + " characters)");
-                    rulesLoaded = true;
-                } else {
-                    System.err.println("Failed to load: " + drlFile);
+            RuleSet ruleSet = rulesDir != null ? loadLatestVersion(rulesDir) : null;
+            if (ruleSet == null) {
+                ruleSet = loadBundled();
+            }
+            active.set(ruleSet);
+            System.out.println("Active rule set: " + ruleSet.getVersion() + " (" + ruleSet.getHash().substring(0, 12) + ")");
+
+        } catch (Exception e) {
+            System.err.println("Drools initialization failed: " + e.getMessage());
+            e.printStackTrace();
+            throw new IllegalStateException("Failed to initialize Drools engine", e);
+        }
+    }
+
+    /**
+     * Rule set packaged with the jar: precompiled artifact when fresh, otherwise the classpath DRL.
+     */
+    private static RuleSet loadBundled() {
+        // Load both hypertension and diabetes DRL content
+        Map<String, String> drlSources = loadDrlSources();
+        String rulesetHash = RuleArtifact.contentHash(drlSources);
+
+        // Prefer the precompiled artifact; compile the DRL only when it is missing or stale
+        KieBase kieBase = loadArtifact(rulesetHash);
+        if (kieBase == null) {
+            kieBase = compileKieBase(drlSources);
+        }
+        return new RuleSet(RuleSet.BUNDLED_VERSION, rulesetHash, kieBase);
+    }
+
+    public RuleSet getActiveRuleSet() {
+        return active.get();
+    }
+
+    /**
+     * SHA-256 of the DRL sources of the active rule set.
+     */
+    public String getRulesetHash() {
+        return active.get().getHash();
+    }
+
+    public String getRulesetVersion() {
+        return active.get().getVersion();
+    }
+
+    public KieBase getKieBase() {
+        return active.get().getKieBase();
+    }
+
+    /**
+     * Poll CDS_RULES_DIR every pollSeconds and hot-swap newer versions in the background.
+     * No-op when no rules directory is configured or polling is disabled (pollSeconds <= 0).
+     */
+    public synchronized void startWatching(long pollSeconds) {
+        if (rulesDir == null || pollSeconds <= 0 || watcher != null) {
+            return;
+        }
+        watcher = Executors.newSingleThreadScheduledExecutor(runnable -> {
+            Thread thread = new Thread(runnable, "cds-rules-watcher");
+            thread.setDaemon(true);
+            return thread;
+        });
+        watcher.scheduleWithFixedDelay(() -> {
+            try {
+                reload();
+            } catch (Exception e) {
+                System.err.println("Rule set reload failed: " + e.getMessage());
+            }
+        }, pollSeconds, pollSeconds, TimeUnit.SECONDS);
+        System.out.println("Watching " + rulesDir + " for rule set versions every " + pollSeconds + "s");
+    }
+
+    /**
+     * Poll interval from CDS_RULES_POLL_SECONDS (default 30).
+     */
+    public static long pollSecondsFromEnv() {
+        String value = System.getenv("CDS_RULES_POLL_SECONDS");
+        if (value == null || value.trim().isEmpty()) {
+            return 30;
+        }
+        return Long.parseLong(value.trim());
+    }
+
+    /**
+     * Build the currently selected version of CDS_RULES_DIR if it differs from the active
+     * one and swap it in. The old KieBase keeps serving until the new one is fully built;
+     * a version that fails to build is logged and the active rule set is kept.
+     *
+     * @return true when a new rule set was swapped in
+     */
+    public synchronized boolean reload() {
+        if (rulesDir == null) {
+            return false;
+        }
+        String version = selectVersion(rulesDir);
+        if (version == null) {
+            return false;
+        }
+        Path versionDir = rulesDir.resolve(version);
+        String hash;
+        try {
+            hash = versionHash(versionDir);
+        } catch (IOException e) {
+            System.err.println("Cannot read rule set version " + version + ": " + e.getMessage());
+            return false;
+        }
+
+        RuleSet current = active.get();
+        String versionKey = version + "@" + hash;
+        if (hash == null || (version.equals(current.getVersion()) && hash.equals(current.getHash()))
+                || versionKey.equals(failedVersionKey)) {
+            return false;
+        }
+
+        try {
+            RuleSet next = loadVersion(versionDir, version);
+            active.set(next);
+            failedVersionKey = null;
+            System.out.println("Swapped rule set " + current.getVersion() + " (" + current.getHash().substring(0, 12)
+                    + ") -> " + next.getVersion() + " (" + next.getHash().substring(0, 12) + ")");
+            return true;
+        } catch (Exception e) {
+            failedVersionKey = versionKey;
+            System.err.println("Rule set version " + version + " failed to build, keeping "
+                    + current.getVersion() + ": " + e.getMessage());
+            return false;
+        }
+    }
+
+    /**
+     * Version named in &lt;dir&gt;/CURRENT, otherwise the last version subdirectory in name order.
+     */
+    static String selectVersion(Path rulesDir) {
+        try {
+            Path currentFile = rulesDir.resolve(CURRENT_FILE);
+            if (Files.isRegularFile(currentFile)) {
+                String pinned = Files.readString(currentFile, StandardCharsets.UTF_8).trim();
+                if (!pinned.isEmpty() && Files.isDirectory(rulesDir.resolve(pinned))) {
+                    return pinned;
                 }
+                System.err.println("CURRENT names missing rule set version '" + pinned + "' - using latest");
             }
+            try (Stream<Path> entries = Files.list(rulesDir)) {
+                return entries.filter(Files::isDirectory)
+                        .map(path -> path.getFileName().toString())
+                        .filter(name -> !name.startsWith("."))
+                        .max(Comparator.naturalOrder())
+                        .orElse(null);
+            }
+        } catch (IOException e) {
+            System.err.println("Cannot list rule set versions in " + rulesDir + ": " + e.getMessage());
+            return null;
+        }
+    }
 
-            if (!rulesLoaded) {
-                throw new IllegalStateException("Failed to load any DRL rules from classpath");
+    private static RuleSet loadLatestVersion(Path rulesDir) {
+        String version = selectVersion(rulesDir);
+        if (version == null) {
+            System.err.println("No rule set versions in " + rulesDir + " - using bundled rules");
+            return null;
+        }
+        try {
+            return loadVersion(rulesDir.resolve(version), version);
+        } catch (Exception e) {
+            System.err.println("Rule set version " + version + " failed to load, using bundled rules: " + e.getMessage());
+            return null;
+        }
+    }
+
+    /**
+     * DRL files of a version directory, in name order.
+     */
+    static Map<String, String> readVersionDrl(Path versionDir) throws IOException {
+        Map<String, String> drlSources = new LinkedHashMap<>();
+        try (Stream<Path> entries = Files.list(versionDir)) {
+            List<Path> drlFiles = entries.filter(path -> path.getFileName().toString().endsWith(".drl"))
+                    .sorted()
+                    .collect(Collectors.toList());
+            for (Path drlFile : drlFiles) {
+                drlSources.put(drlFile.getFileName().toString(), Files.readString(drlFile, StandardCharsets.UTF_8));
             }
+        }
+        return drlSources;
+    }
 
-            // Build the KieBase
-            KieBuilder kieBuilder = kieServices.newKieBuilder(kfs);
-            kieBuilder.buildAll();
+    /**
+     * Content hash of a version: from its DRL when present, else from the artifact header.
+     */
+    static String versionHash(Path versionDir) throws IOException {
+        Map<String, String> drlSources = readVersionDrl(versionDir);
+        if (!drlSources.isEmpty()) {
+            return RuleArtifact.contentHash(drlSources);
+        }
+        Path artifact = versionDir.resolve(VERSION_ARTIFACT);
+        return Files.isRegularFile(artifact) ? RuleArtifact.readHash(artifact) : null;
+    }
 
-            // Check for compilation errors
-            if (kieBuilder.getResults().hasMessages(Message.Level.ERROR)) {
-                System.err.println("DRL Compilation Errors:");
-                for (Message message : kieBuilder.getResults().getMessages()) {
-                    System.err.println("  - " + message.getText());
+    /**
+     * Load one version directory: its cds-rules.kbase when it matches the DRL (or there is
+     * no DRL), otherwise compile the DRL.
+     */
+    static RuleSet loadVersion(Path versionDir, String version) throws IOException, ClassNotFoundException {
+        Map<String, String> drlSources = readVersionDrl(versionDir);
+        Path artifact = versionDir.resolve(VERSION_ARTIFACT);
+        String hash = drlSources.isEmpty() ? null : RuleArtifact.contentHash(drlSources);
+
+        if (Files.isRegularFile(artifact)) {
+            String expectedHash = hash != null ? hash : RuleArtifact.readHash(artifact);
+            try (InputStream is = Files.newInputStream(artifact)) {
+                KieBase kieBase = RuleArtifact.readIfFresh(is, expectedHash, DroolsRuleService.class.getClassLoader());
+                if (kieBase != null) {
+                    return new RuleSet(version, expectedHash, kieBase);
                 }
-                throw new IllegalStateException("DRL compilation failed");
             }
+        }
+        if (drlSources.isEmpty()) {
+            throw new IllegalStateException("Rule set version " + version + " has no DRL files or usable artifact");
+        }
+        System.out.println("Compiling rule set version " + version + " (" + drlSources.size() + " DRL file(s))");
+        return new RuleSet(version, hash, compileKieBase(drlSources));
+    }
+
+    public static Map<String, String> loadDrlSources() {
+        Map<String, String> drlSources = new LinkedHashMap<>();
+        for (String drlFile : DRL_FILES) {
+            String drlContent = loadDrlFromClasspath(drlFile);
+            if (drlContent != null && !drlContent.trim().isEmpty()) {
+                drlSources.put(drlFile, drlContent);
+                System.out.println("Loaded " + drlFile + " (" + drlContent.length() + " characters)");
+            } else {
+                System.err.println("Failed to load: " + drlFile);
+            }
+        }
 
-            this.kieContainer = kieServices.newKieContainer(kieServices.getRepository().getDefaultReleaseId());
-            System.out.println("KieContainer created successfully with both hypertension and diabetes rules");
+        if (drlSources.isEmpty()) {
+            throw new IllegalStateException("Failed to load any DRL rules from classpath");
+        }
+        return drlSources;
+    }
+
+    public static KieBase compileKieBase(Map<String, String> drlSources) {
+        KieServices kieServices = KieServices.Factory.get();
+        KieFileSystem kfs = kieServices.newKieFileSystem();
+        for (Map.Entry<String, String> source : drlSources.entrySet()) {
+            kfs.write("src/main/resources/" + source.getKey(), source.getValue());
+        }
+
+        // Build the KieBase
+        KieBuilder kieBuilder = kieServices.newKieBuilder(kfs);
+        kieBuilder.buildAll();
 
+        // Check for compilation errors
+        if (kieBuilder.getResults().hasMessages(Message.Level.ERROR)) {
+            System.err.println("DRL Compilation Errors:");
+            for (Message message : kieBuilder.getResults().getMessages()) {
+                System.err.println("  - " + message.getText());
+            }
+            throw new IllegalStateException("DRL compilation failed");
+        }
+
+        KieContainer kieContainer = kieServices.newKieContainer(kieServices.getRepository().getDefaultReleaseId());
+        System.out.println("KieContainer created successfully with both hypertension and diabetes rules");
+        return kieContainer.getKieBase();
+    }
+
+    /**
+     * Load the precompiled KieBase from CDS_RULES_ARTIFACT (file path) or the classpath.
+     * Returns null when the artifact is missing, unreadable or built from different DRL content.
+     */
+    private static KieBase loadArtifact(String expectedHash) {
+        String artifactPath = System.getenv("CDS_RULES_ARTIFACT");
+        try {
+            if (artifactPath != null && !artifactPath.trim().isEmpty()) {
+                Path path = Paths.get(artifactPath);
+                if (!Files.exists(path)) {
+                    System.out.println("Rule artifact not found at " + path + " - compiling DRL");
+                    return null;
+                }
+                try (InputStream is = Files.newInputStream(path)) {
+                    return RuleArtifact.readIfFresh(is, expectedHash, DroolsRuleService.class.getClassLoader());
+                }
+            }
+
+            try (InputStream is = DroolsRuleService.class.getClassLoader().getResourceAsStream(ARTIFACT_RESOURCE)) {
+                if (is == null) {
+                    System.out.println("No precompiled rule artifact on classpath - compiling DRL");
+                    return null;
+                }
+                return RuleArtifact.readIfFresh(is, expectedHash, DroolsRuleService.class.getClassLoader());
+            }
         } catch (Exception e) {
-            System.err.println("Drools initialization failed: " + e.getMessage());
-            e.printStackTrace();
-            throw new IllegalStateException("Failed to initialize Drools engine", e);
+            System.err.println("Could not load rule artifact, falling back to DRL compilation: " + e.getMessage());
+            return null;
         }
     }
 
-    private String loadDrlFromClasspath(String drlFileName) {
+    private static String loadDrlFromClasspath(String drlFileName) {
         try {
             // Try multiple classpath locations
             String[] possiblePaths = {
@@ -80,7 +361,7 @@ public class DroolsRuleService {
             };
 
             for (String path : possiblePaths) {
-                try (InputStream is = getClass().getClassLoader().getResourceAsStream(path)) {
+                try (InputStream is = DroolsRuleService.class.getClassLoader().getResourceAsStream(path)) {
                     if (is != null) {
                         System.out.println("Found " + drlFileName + " at: " + path);
                         String content = new String(is.readAllBytes(), StandardCharsets.UTF_8);
@@ -120,68 +401,81 @@ public class DroolsRuleService {
     }
 
     public PatientData evaluatePatient(PatientData patientData) {
-        System.out.println("Evaluating patient data:");
-        System.out.println("  BP: " + patientData.getPhysicalExamination().getSystole() +
-                "/" + patientData.getPhysicalExamination().getDiastole());
+        return evaluatePatient(patientData, null);
+    }
 
-        if (patientData.getMedicalHistory() != null) {
-            System.out.println("  Diabetes: " + patientData.getMedicalHistory().isDiabetes());
-            System.out.println("  Hypertension: " + patientData.getMedicalHistory().isHypertension());
-        }
+    /**
+     * Evaluate one patient; when a trace listener is given it records which rules fired
+     * and how long their consequences took.
+     */
+    public PatientData evaluatePatient(PatientData patientData, RuleTraceListener trace) {
+        return evaluatePatient(active.get(), patientData, trace);
+    }
 
-        if (patientData.getInvestigations() != null) {
-            System.out.println("  HbA1c: " + patientData.getInvestigations().getHba1c());
-            System.out.println("  Fasting Glucose: " + patientData.getInvestigations().getFastingGlucose());
+    /**
+     * Evaluate against a specific rule-set snapshot (callers that report the version
+     * take the snapshot first so the version they report is the one that ran).
+     */
+    public PatientData evaluatePatient(RuleSet ruleSet, PatientData patientData, RuleTraceListener trace) {
+        if (log.isDebugEnabled()) {
+            log.debug("Evaluating patient data (rule set {}): BP {}/{}", ruleSet.getVersion(),
+                    patientData.getPhysicalExamination().getSystole(),
+                    patientData.getPhysicalExamination().getDiastole());
+            if (patientData.getMedicalHistory() != null) {
+                log.debug("  Diabetes: {}, Hypertension: {}", patientData.getMedicalHistory().isDiabetes(),
+                        patientData.getMedicalHistory().isHypertension());
+            }
+            if (patientData.getInvestigations() != null) {
+                log.debug("  HbA1c: {}, Fasting Glucose: {}", patientData.getInvestigations().getHba1c(),
+                        patientData.getInvestigations().getFastingGlucose());
+            }
         }
 
         KieSession kieSession = null;
         try {
-            kieSession = kieContainer.newKieSession();
-            System.out.println("KieSession created for both hypertension and diabetes rules");
+            kieSession = ruleSet.getKieBase().newKieSession();
+            if (trace != null) {
+                kieSession.addEventListener(trace);
+            }
 
             // Insert patient data
             kieSession.insert(patientData);
-            System.out.println("PatientData inserted into session");
 
             // Fire all rules
+            long firingStarted = System.nanoTime();
             int rulesFired = kieSession.fireAllRules();
-            System.out.println("Total rules fired: " + rulesFired);
+            if (trace != null) {
+                trace.setFireAllRulesNanos(System.nanoTime() - firingStarted);
+            }
+            log.debug("Total rules fired: {}", rulesFired);
 
             // Log detailed information about decisions
-            if (patientData.getDecisions() != null) {
-                System.out.println("Clinical decisions made: " + patientData.getDecisions().size());
+            if (log.isDebugEnabled() && patientData.getDecisions() != null) {
+                log.debug("Clinical decisions made: {}", patientData.getDecisions().size());
                 for (int i = 0; i < patientData.getDecisions().size(); i++) {
                     var decision = patientData.getDecisions().get(i);
-                    System.out.println("  Decision " + (i + 1) + ": " +
-                            decision.getDiagnosis() + " (" + decision.getStage() + ")");
+                    log.debug("  Decision {}: {} ({})", i + 1, decision.getDiagnosis(), decision.getStage());
                     if (decision.getSubClassification() != null) {
-                        System.out.println("    Type: " + decision.getSubClassification());
+                        log.debug("    Type: {}", decision.getSubClassification());
                     }
                 }
             }
 
             if (rulesFired == 0) {
-                System.err.println("WARNING: No rules fired! Check rule conditions and patient data");
-                System.err.println("Patient data summary:");
-                System.err.println("  Has diabetes: " + (patientData.getMedicalHistory() != null && patientData.getMedicalHistory().isDiabetes()));
-                System.err.println("  Has hypertension: " + (patientData.getMedicalHistory() != null && patientData.getMedicalHistory().isHypertension()));
-                System.err.println("  Has investigations: " + (patientData.getInvestigations() != null));
-                if (patientData.getInvestigations() != null) {
-                    System.err.println("  HbA1c: " + patientData.getInvestigations().getHba1c());
-                    System.err.println("  Fasting glucose: " + patientData.getInvestigations().getFastingGlucose());
-                }
+                log.warn("No rules fired! Check rule conditions and patient data (diabetes: {}, hypertension: {}, investigations: {})",
+                        patientData.getMedicalHistory() != null && patientData.getMedicalHistory().isDiabetes(),
+                        patientData.getMedicalHistory() != null && patientData.getMedicalHistory().isHypertension(),
+                        patientData.getInvestigations() != null);
             }
 
             return patientData;
 
         } catch (Exception e) {
-            System.err.println("Error in evaluatePatient: " + e.getMessage());
-            e.printStackTrace();
+            log.error("Error in evaluatePatient: {}", e.getMessage(), e);
             throw new IllegalStateException("Failed to evaluate patient: " + e.getMessage(), e);
         } finally {
             if (kieSession != null) {
                 kieSession.dispose();
-                System.out.println("KieSession disposed");
             }
         }
     }
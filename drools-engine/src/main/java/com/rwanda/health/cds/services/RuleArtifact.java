@@ -0,0 +1,125 @@
+package com.rwanda.health.cds.services;
+
+import org.drools.core.util.DroolsStreamUtils;
+import org.kie.api.KieBase;
+import org.slf4j.Logger;
+import org.slf4j.LoggerFactory;
+
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.security.MessageDigest;
+import java.security.NoSuchAlgorithmException;
+import java.util.Map;
+
+/**
+ * Precompiled rule artifact: a serialized KieBase prefixed with the SHA-256 of the
+ * DRL sources it was compiled from, so the runtime can skip KieBuilder.buildAll()
+ * and detect a stale artifact.
+ *
+ * Build-time usage (bound to prepare-package in pom.xml):
+ *   java -cp ... com.rwanda.health.cds.services.RuleArtifact <output.kbase>
+ * Precompiling a hot-swappable version directory:
+ *   java -cp ... com.rwanda.health.cds.services.RuleArtifact $CDS_RULES_DIR/v2/cds-rules.kbase $CDS_RULES_DIR/v2
+ */
+public class RuleArtifact {
+    private static final Logger log = LoggerFactory.getLogger(RuleArtifact.class);
+    private static final String MAGIC = "CDS-KBASE-1";
+
+    public static String contentHash(Map<String, String> drlSources) {
+        try {
+            MessageDigest digest = MessageDigest.getInstance("SHA-256");
+            for (Map.Entry<String, String> source : drlSources.entrySet()) {
+                digest.update(source.getKey().getBytes(StandardCharsets.UTF_8));
+                digest.update((byte) 0);
+                digest.update(source.getValue().getBytes(StandardCharsets.UTF_8));
+                digest.update((byte) 0);
+            }
+            StringBuilder hex = new StringBuilder();
+            for (byte b : digest.digest()) {
+                hex.append(String.format("%02x", b));
+            }
+            return hex.toString();
+        } catch (NoSuchAlgorithmException e) {
+            throw new IllegalStateException("SHA-256 not available", e);
+        }
+    }
+
+    public static void write(OutputStream out, String rulesetHash, KieBase kieBase) throws IOException {
+        byte[] payload = DroolsStreamUtils.streamOut(kieBase);
+        DataOutputStream data = new DataOutputStream(out);
+        data.writeUTF(MAGIC);
+        data.writeUTF(rulesetHash);
+        data.writeInt(payload.length);
+        data.write(payload);
+        data.flush();
+    }
+
+    /**
+     * Hash recorded in an artifact's header (for version directories shipped without DRL).
+     */
+    public static String readHash(Path artifact) throws IOException {
+        try (DataInputStream data = new DataInputStream(Files.newInputStream(artifact))) {
+            if (!MAGIC.equals(data.readUTF())) {
+                throw new IOException("Unknown rule artifact format: " + artifact);
+            }
+            return data.readUTF();
+        }
+    }
+
+    /**
+     * Returns the deserialized KieBase, or null when the artifact was built from different DRL content.
+     */
+    public static KieBase readIfFresh(InputStream in, String expectedHash, ClassLoader classLoader)
+            throws IOException, ClassNotFoundException {
+        DataInputStream data = new DataInputStream(in);
+        if (!MAGIC.equals(data.readUTF())) {
+            log.warn("Rule artifact has an unknown format - compiling DRL");
+            return null;
+        }
+        String artifactHash = data.readUTF();
+        if (!artifactHash.equals(expectedHash)) {
+            log.info("Rule artifact is stale ({} != {}) - compiling DRL",
+                    artifactHash.substring(0, 12), expectedHash.substring(0, 12));
+            return null;
+        }
+        byte[] payload = new byte[data.readInt()];
+        data.readFully(payload);
+        KieBase kieBase = (KieBase) DroolsStreamUtils.streamIn(payload, classLoader);
+        log.info("Loaded precompiled rule artifact {}", artifactHash.substring(0, 12));
+        return kieBase;
+    }
+
+    public static void main(String[] args) throws Exception {
+        if (args.length < 1) {
+            System.err.println("Usage: java RuleArtifact <output.kbase> [rule-set-version-dir]");
+            System.exit(1);
+        }
+
+        // With a version directory, precompile its DRL (for CDS_RULES_DIR hot-swap)
+        Map<String, String> drlSources = args.length >= 2
+                ? DroolsRuleService.readVersionDrl(Paths.get(args[1]))
+                : DroolsRuleService.loadDrlSources();
+        if (drlSources.isEmpty()) {
+            System.err.println("No DRL files found in " + args[1]);
+            System.exit(1);
+        }
+        String rulesetHash = contentHash(drlSources);
+        KieBase kieBase = DroolsRuleService.compileKieBase(drlSources);
+
+        Path output = Paths.get(args[0]);
+        if (output.getParent() != null) {
+            Files.createDirectories(output.getParent());
+        }
+        try (OutputStream out = Files.newOutputStream(output)) {
+            write(out, rulesetHash, kieBase);
+        }
+        System.out.println("Wrote rule artifact " + output + " (" + Files.size(output) + " bytes, hash " + rulesetHash + ")");
+    }
+}
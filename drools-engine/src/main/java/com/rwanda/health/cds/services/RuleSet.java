@@ -0,0 +1,45 @@
+package com.rwanda.health.cds.services;
+
+import org.kie.api.KieBase;
+
+/**
+ * Immutable snapshot of one loaded rule-set version. DroolsRuleService swaps the
+ * active snapshot atomically, so an evaluation always sees a single consistent version.
+ */
+public class RuleSet {
+    public static final String BUNDLED_VERSION = "bundled";
+
+    private final String version;
+    private final String hash;
+    private final KieBase kieBase;
+    private final long loadedAt;
+
+    public RuleSet(String version, String hash, KieBase kieBase) {
+        this.version = version;
+        this.hash = hash;
+        this.kieBase = kieBase;
+        this.loadedAt = System.currentTimeMillis();
+    }
+
+    /**
+     * Directory name of the version (or "bundled" for the DRL packaged in the jar).
+     */
+    public String getVersion() {
+        return version;
+    }
+
+    /**
+     * SHA-256 of the DRL sources this version was built from.
+     */
+    public String getHash() {
+        return hash;
+    }
+
+    public KieBase getKieBase() {
+        return kieBase;
+    }
+
+    public long getLoadedAt() {
+        return loadedAt;
+    }
+}
@@ -0,0 +1,101 @@
+package com.rwanda.health.cds.services;
+
+import org.kie.api.definition.rule.Rule;
+import org.kie.api.event.rule.AfterMatchFiredEvent;
+import org.kie.api.event.rule.BeforeMatchFiredEvent;
+import org.kie.api.event.rule.DefaultAgendaEventListener;
+import org.kie.api.event.rule.MatchCancelledEvent;
+import org.kie.api.event.rule.MatchCreatedEvent;
+
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+
+/**
+ * Agenda listener recording, per rule, how many activations were created, how many
+ * fired and how long the consequences took. One listener is attached per KieSession.
+ */
+public class RuleTraceListener extends DefaultAgendaEventListener {
+
+    private static class RuleStats {
+        final String packageName;
+        int activations;
+        int cancelled;
+        int fired;
+        long nanos;
+
+        RuleStats(String packageName) {
+            this.packageName = packageName;
+        }
+    }
+
+    private final Map<String, RuleStats> rules = new LinkedHashMap<>();
+    private long firingStartedAt;
+    private long fireAllRulesNanos;
+    private int totalFired;
+
+    private RuleStats stats(Rule rule) {
+        return rules.computeIfAbsent(rule.getName(), name -> new RuleStats(rule.getPackageName()));
+    }
+
+    @Override
+    public void matchCreated(MatchCreatedEvent event) {
+        stats(event.getMatch().getRule()).activations++;
+    }
+
+    @Override
+    public void matchCancelled(MatchCancelledEvent event) {
+        stats(event.getMatch().getRule()).cancelled++;
+    }
+
+    @Override
+    public void beforeMatchFired(BeforeMatchFiredEvent event) {
+        firingStartedAt = System.nanoTime();
+    }
+
+    @Override
+    public void afterMatchFired(AfterMatchFiredEvent event) {
+        RuleStats stats = stats(event.getMatch().getRule());
+        stats.fired++;
+        stats.nanos += System.nanoTime() - firingStartedAt;
+        totalFired++;
+    }
+
+    /**
+     * Wall time of the whole fireAllRules() call (includes lazy LHS evaluation).
+     */
+    public void setFireAllRulesNanos(long nanos) {
+        this.fireAllRulesNanos = nanos;
+    }
+
+    public int getTotalFired() {
+        return totalFired;
+    }
+
+    /**
+     * JSON-ready trace: {"rulesFired", "fireAllRulesMs", "rules": [{"rule", "package",
+     * "activations", "cancelled", "fired", "timeMs"}]} in first-activation order.
+     */
+    public Map<String, Object> toMap() {
+        List<Map<String, Object>> ruleList = new ArrayList<>();
+        for (Map.Entry<String, RuleStats> entry : rules.entrySet()) {
+            RuleStats stats = entry.getValue();
+            Map<String, Object> rule = new HashMap<>();
+            rule.put("rule", entry.getKey());
+            rule.put("package", stats.packageName);
+            rule.put("activations", stats.activations);
+            rule.put("cancelled", stats.cancelled);
+            rule.put("fired", stats.fired);
+            rule.put("timeMs", stats.nanos / 1_000_000.0);
+            ruleList.add(rule);
+        }
+
+        Map<String, Object> trace = new HashMap<>();
+        trace.put("rulesFired", totalFired);
+        trace.put("fireAllRulesMs", fireAllRulesNanos / 1_000_000.0);
+        trace.put("rules", ruleList);
+        return trace;
+    }
+}